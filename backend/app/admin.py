@@ -0,0 +1,17 @@
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.config import ADMIN_TOKEN
+
+
+def authorized(token):
+    """True if token is ADMIN_TOKEN; always False while no token is configured"""
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Route dependency for admin-only routes: 403 unless X-Admin-Token is ADMIN_TOKEN"""
+    if not authorized(x_admin_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
@@ -0,0 +1,181 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from app.profiling import profiler
+from app.config import (
+    ADMISSION_DEGRADE_AT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT_SEC,
+    ADMISSION_SLOTS,
+)
+
+# Lower number = more important. Overload sheds and degrades from the bottom up.
+PRIORITIES = {
+    "live": 0,
+    "image": 1,
+    "video": 2,
+    "batch": 3,
+}
+
+# Degradation steps for streams, in the order they kick in
+DEGRADE_RESOLUTION = 1
+DEGRADE_SKIP_OCR = 2
+DEGRADE_FPS = 3
+DEGRADE_NAMES = {0: "none", DEGRADE_RESOLUTION: "resolution", DEGRADE_SKIP_OCR: "skip_ocr", DEGRADE_FPS: "fps"}
+
+
+class Overloaded(Exception):
+    """Request was not admitted; status_code is 429 (queue full) or 503 (waited too long)"""
+
+    def __init__(self, status_code, reason, retry_after):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def headers(self):
+        return {"Retry-After": str(self.retry_after)}
+
+
+class AdmissionController:
+    """
+    Global limit on concurrent inference work.
+
+    At most `slots` jobs run at once. Others wait in a priority queue for
+    at most `max_wait` seconds. When the queue is full, a new request
+    evicts the least important waiter if it outranks it, and is shed
+    itself otherwise. Streams ask degradation() before each frame so they
+    can get cheaper instead of queueing.
+
+    Must be used from the event loop.
+    """
+
+    def __init__(self, slots=ADMISSION_SLOTS, max_queue=ADMISSION_MAX_QUEUE, max_wait=ADMISSION_MAX_WAIT_SEC):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters = []  # heap of (priority, seq, future, kind)
+        self._seq = itertools.count()
+        self._service_sec = 0.1  # EWMA of slot hold time
+        self._wait_sec = 0.0  # EWMA of queue wait
+
+        self.admitted = defaultdict(int)
+        self.shed = defaultdict(int)
+        self.degraded = defaultdict(lambda: defaultdict(int))
+
+    # ---------- admission ----------
+    def _waiting(self):
+        return sum(1 for *_, future, _ in self._waiters if not future.done())
+
+    def retry_after(self):
+        backlog = self.in_flight + self._waiting()
+        return max(1, math.ceil(self._service_sec * backlog / self.slots))
+
+    def reject(self, kind, status_code, reason):
+        """Count a shed request and build the error to return for it"""
+        self.shed[kind] += 1
+        return Overloaded(status_code, reason, self.retry_after())
+
+    async def acquire(self, kind):
+        priority = PRIORITIES.get(kind, max(PRIORITIES.values()))
+
+        if self.in_flight < self.slots and not self._waiting():
+            self.in_flight += 1
+            self.admitted[kind] += 1
+            self._wait_sec *= 0.9
+            return
+
+        if self._waiting() >= self.max_queue:
+            victim = self._lowest_waiter()
+            if victim is None or victim[0] <= priority:
+                raise self.reject(kind, 429, "inference queue full")
+            # Make room by shedding a less important waiter
+            _, _, victim_future, victim_kind = victim
+            victim_future.set_exception(self.reject(victim_kind, 429, "displaced by higher priority work"))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future, kind))
+        start = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if future.done() and not future.exception():
+                # Granted at the same moment the wait ran out; keep the slot
+                pass
+            else:
+                future.cancel()
+                raise self.reject(kind, 503, "timed out waiting for an inference slot")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and not future.exception():
+                self.release()  # granted, but the caller went away
+            future.cancel()
+            raise
+
+        self._wait_sec = 0.9 * self._wait_sec + 0.1 * (time.perf_counter() - start)
+        self.admitted[kind] += 1
+
+    def _lowest_waiter(self):
+        live = [w for w in self._waiters if not w[2].done()]
+        return max(live, key=lambda w: (w[0], w[1])) if live else None
+
+    def release(self, held_sec=None):
+        if held_sec is not None:
+            self._service_sec = 0.9 * self._service_sec + 0.1 * held_sec
+
+        while self._waiters:
+            _, _, future, _ = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter; in_flight is unchanged
+                future.set_result(True)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, kind):
+        await self.acquire(kind)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+            profiler.tick()
+
+    # ---------- degradation ----------
+    def pressure(self):
+        """1.0 means every slot is busy; above that, work is queueing"""
+        load = (self.in_flight + self._waiting()) / self.slots
+        return max(load, self._wait_sec / self.max_wait if self.max_wait else 0.0)
+
+    def degradation(self, kind):
+        """How many degradation steps a stream of this kind should apply to its next frame"""
+        priority = PRIORITIES.get(kind, max(PRIORITIES.values()))
+        scale = 1.0 - 0.1 * priority  # less important streams degrade earlier
+        pressure = self.pressure()
+        return sum(1 for threshold in ADMISSION_DEGRADE_AT if pressure >= threshold * scale)
+
+    def record_degraded(self, kind, level):
+        if level:
+            self.degraded[kind][DEGRADE_NAMES[level]] += 1
+
+    def stats(self):
+        return {
+            "slots": self.slots,
+            "in_flight": self.in_flight,
+            "waiting": self._waiting(),
+            "pressure": round(self.pressure(), 2),
+            "avg_service_ms": round(self._service_sec * 1000, 1),
+            "avg_wait_ms": round(self._wait_sec * 1000, 1),
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+            "degraded": {kind: dict(steps) for kind, steps in self.degraded.items()},
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,339 @@
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from threading import Event, Lock, Thread
+
+import cv2
+
+from app.config import CAMERA_INFERENCE_SLOTS, CAMERA_RECONNECT_SEC
+from app.database import SessionLocal, run_db
+from app.detector.video_pipeline import process_frame
+from app.models import Camera, Detection
+from app.events import event_bus
+from app.watchlist import watchlist
+from app.profiling import profiler
+from app.plate_filter import CONF_THRESHOLD, should_save_plate
+
+VIEWER_QUEUE_SIZE = 2
+
+
+def save_camera_detection(camera_id, plate, confidence):
+    db = SessionLocal()
+    try:
+        record = Detection(
+            plate_number=plate,
+            confidence=confidence,
+            source="camera",
+            camera_id=camera_id,
+            timestamp=datetime.utcnow(),
+            video_timestamp=None,
+            image_path=None
+        )
+        db.add(record)
+        db.flush()
+        event = record.to_dict()
+        db.commit()
+        event_bus.publish("detection", event)
+    finally:
+        db.close()
+
+
+# ===========================
+# INGESTION WORKER
+# ===========================
+class CameraWorker:
+    """
+    Reads one camera on its own thread and keeps only the newest frame.
+
+    Live sources are drained as fast as they produce frames so the
+    scheduler always gets a fresh one; local files are paced to their own
+    fps and looped, which makes them usable as stand-ins for cameras.
+    """
+
+    def __init__(self, camera_id, source, priority=1.0, max_fps=5.0):
+        self.camera_id = camera_id
+        self.source = source
+        self.priority = max(float(priority or 1.0), 0.01)
+        self.max_fps = max(float(max_fps or 5.0), 0.1)
+
+        # Scheduler bookkeeping (only touched from the event loop)
+        self.pass_value = 0.0
+        self.last_dispatch = 0.0
+
+        self.status = "stopped"
+        self.stats = defaultdict(int)  # updated through count(): camera thread and event loop both write
+        self._stats_lock = Lock()
+
+        self._lock = Lock()
+        self._frame = None
+        self._frame_ts = 0.0
+        self._fresh = False
+        # Set by the scheduler; called from this thread when a frame becomes available
+        self.on_fresh = None
+        self._stop = Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name=f"camera-{self.camera_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.status = "stopped"
+
+    def ready(self, now):
+        return self._fresh and now - self.last_dispatch >= 1.0 / self.max_fps
+
+    def ready_in(self, now):
+        """Seconds until the pending frame may be dispatched (fps cap), None without one"""
+        if not self._fresh:
+            return None
+        return max(0.0, self.last_dispatch + 1.0 / self.max_fps - now)
+
+    def take(self):
+        with self._lock:
+            self._fresh = False
+            return self._frame, self._frame_ts
+
+    def _open(self):
+        source = int(self.source) if str(self.source).isdigit() else self.source
+        return cv2.VideoCapture(source)
+
+    def _run(self):
+        is_file = os.path.isfile(str(self.source))
+
+        while not self._stop.is_set():
+            cap = self._open()
+            if not cap.isOpened():
+                self.status = "error"
+                self.count("reconnects")
+                self._stop.wait(CAMERA_RECONNECT_SEC)
+                continue
+
+            self.status = "running"
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            frame_interval = 1.0 / fps if is_file else 0.0
+            rewound = False
+
+            while not self._stop.is_set():
+                ok, frame = cap.read()
+                if not ok:
+                    # Loop local files; a file that fails right after rewinding is broken
+                    if is_file and not rewound:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        rewound = True
+                        continue
+                    break
+                rewound = False
+
+                with self._lock:
+                    was_fresh = self._fresh
+                    if was_fresh:
+                        self.count("frames_skipped")
+                    self._frame = frame
+                    self._frame_ts = time.time()
+                    self._fresh = True
+                self.count("frames_read")
+                # Only the first frame after a take() can make the camera newly ready
+                if not was_fresh and self.on_fresh is not None:
+                    self.on_fresh()
+
+                if frame_interval:
+                    self._stop.wait(frame_interval)
+
+            cap.release()
+            if not self._stop.is_set():
+                self.status = "reconnecting"
+                self.count("reconnects")
+                self._stop.wait(CAMERA_RECONNECT_SEC)
+
+    def count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {
+            "camera_id": self.camera_id,
+            "status": self.status,
+            "priority": self.priority,
+            "max_fps": self.max_fps,
+            **stats,
+        }
+
+
+# ===========================
+# SCHEDULER
+# ===========================
+class CameraScheduler:
+    """
+    Shares a fixed number of inference slots across cameras.
+
+    Uses stride scheduling: each dispatch advances a camera's pass value
+    by 1/priority and the ready camera with the lowest pass goes next, so
+    over time each camera gets inference in proportion to its priority,
+    capped by its own max_fps.
+
+    The dispatcher sleeps until a worker reports a new frame or the fps cap
+    of a camera with a pending frame runs out; it never polls.
+    """
+
+    def __init__(self, slots=CAMERA_INFERENCE_SLOTS):
+        self.slots = slots
+        self.workers = {}
+        self.viewers = defaultdict(set)
+        self._virtual_time = 0.0
+        self._task = None
+        self._slots = None
+        self._frame_ready = None
+
+    def add(self, worker: CameraWorker):
+        self.start()
+        self.remove(worker.camera_id)
+        worker.pass_value = self._virtual_time
+        loop = asyncio.get_running_loop()
+        worker.on_fresh = lambda: loop.call_soon_threadsafe(self._frame_ready.set)
+        self.workers[worker.camera_id] = worker
+        worker.start()
+
+    def remove(self, camera_id):
+        worker = self.workers.pop(camera_id, None)
+        if worker:
+            worker.stop()
+
+    def start(self):
+        if self._task is None:
+            self._slots = asyncio.Semaphore(self.slots)
+            self._frame_ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        for camera_id in list(self.workers):
+            self.remove(camera_id)
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _pick(self):
+        now = time.time()
+        ready = [w for w in self.workers.values() if w.ready(now)]
+        if not ready:
+            return None
+
+        worker = min(ready, key=lambda w: w.pass_value)
+        # A camera that sat idle (fps cap, outage) must not bank credit and then burst
+        self._virtual_time = max(self._virtual_time, worker.pass_value)
+        worker.pass_value = self._virtual_time + 1.0 / worker.priority
+        worker.last_dispatch = now
+        return worker
+
+    def _next_ready_in(self):
+        now = time.time()
+        waits = [w for w in (w.ready_in(now) for w in self.workers.values()) if w is not None]
+        return min(waits) if waits else None
+
+    async def _next_worker(self):
+        while True:
+            # Clear before picking so a frame arriving in between still wakes us
+            self._frame_ready.clear()
+            worker = self._pick()
+            if worker is not None:
+                return worker
+            try:
+                await asyncio.wait_for(self._frame_ready.wait(), self._next_ready_in())
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            worker = await self._next_worker()
+            frame, frame_ts = worker.take()
+            loop.create_task(self._process(worker, frame, frame_ts))
+
+    async def _process(self, worker, frame, frame_ts):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(None, process_frame, frame)
+            worker.count("frames_processed")
+
+            # Every confident plate in the frame, best first
+            plates = []
+            for p in result["plates"]:
+                text = (p.get("text") or "").strip()
+                if not text or p["confidence"] < CONF_THRESHOLD:
+                    continue
+                watchlist.check(text, p["confidence"], "camera", camera_id=worker.camera_id)
+                if await should_save_plate(f"{worker.camera_id}:{text}"):
+                    await run_db(save_camera_detection, worker.camera_id, text, p["confidence"])
+                    worker.count("detections")
+                plates.append({"plate": text, "confidence": p["confidence"], "bbox": list(p["bbox"])})
+
+            # Viewers encode their own preview size/quality (see camera_view_ws);
+            # nothing is encoded when nobody is watching
+            viewers = self.viewers.get(worker.camera_id)
+            if viewers:
+                best = result["plates"][0]["confidence"] if result["plates"] else 0.0
+                self._broadcast(viewers, {
+                    "camera_id": worker.camera_id,
+                    "plate": plates[0]["plate"] if plates else None,
+                    "confidence": plates[0]["confidence"] if plates else best,
+                    "plates": plates,
+                    "timestamp": frame_ts
+                }, result["annotated"])
+
+        except Exception as e:
+            worker.count("errors")
+            print(f"[ERROR] Camera {worker.camera_id} frame failed:", e)
+
+        finally:
+            self._slots.release()
+            profiler.tick()
+
+    def _broadcast(self, viewers, message, annotated):
+        # One dict of encoded previews per frame, shared by viewers with equal settings
+        previews = {}
+        for queue in viewers:
+            if queue.full():
+                # Slow viewer: drop its oldest pending frame rather than block
+                queue.get_nowait()
+            queue.put_nowait((message, annotated, previews))
+
+    def subscribe(self, camera_id):
+        queue = asyncio.Queue(maxsize=VIEWER_QUEUE_SIZE)
+        self.viewers[camera_id].add(queue)
+        return queue
+
+    def unsubscribe(self, camera_id, queue):
+        self.viewers[camera_id].discard(queue)
+        if not self.viewers[camera_id]:
+            del self.viewers[camera_id]
+
+
+camera_scheduler = CameraScheduler()
+
+
+def worker_from_camera(camera: Camera) -> CameraWorker:
+    return CameraWorker(
+        camera_id=camera.id,
+        source=camera.source,
+        priority=camera.priority,
+        max_fps=camera.max_fps
+    )
+
+
+def start_enabled_cameras():
+    """Start a worker for every enabled camera in the registry"""
+    db = SessionLocal()
+    try:
+        for camera in db.query(Camera).filter(Camera.enabled.is_(True)).all():
+            camera_scheduler.add(worker_from_camera(camera))
+    finally:
+        db.close()
@@ -0,0 +1,85 @@
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Detection, TableChange
+
+# Change token for the detections table (and its rollups), read from the
+# database itself so every process that writes it agrees: server workers,
+# tools.ingest, tools.rebuild_rollups, retention.
+#
+#   max(detections.id)         advances with every insert, whoever commits it
+#   table_changes "detections" revision, bumped in the same transaction as
+#                              every delete, in-place update or rollup
+#                              rebuild (the ORM hook below, or bump() for
+#                              core statements and rebuilds). Inserts leave
+#                              it alone so the row is not a write hot spot.
+TABLE = "detections"
+
+_changes = TableChange.__table__
+TOKEN_QUERY = select(
+    select(func.max(Detection.id)).scalar_subquery(),
+    _changes.c.revision,
+).where(_changes.c.name == TABLE)
+
+_listeners = []
+
+
+def on_change(fn):
+    """Register fn() to run in this process after it commits a change (cache invalidation)"""
+    _listeners.append(fn)
+    return fn
+
+
+def seed(db):
+    """Called at startup: make sure the revision row exists"""
+    if db.get(TableChange, TABLE) is None:
+        db.add(TableChange(name=TABLE, revision=0))
+        db.commit()
+
+
+def bump(db: Session):
+    """
+    Advance the token inside db's open transaction. The ORM hook does this
+    for deleted or modified Detection objects; core DELETE/UPDATE and rollup
+    rebuilds call it themselves before committing. Inserts need no bump.
+    """
+    conn = db.connection()
+    result = conn.execute(
+        update(_changes).where(_changes.c.name == TABLE).values(revision=_changes.c.revision + 1)
+    )
+    if not result.rowcount:
+        conn.execute(insert(_changes).values(name=TABLE, revision=1))
+    db.info["detections_changed"] = True
+
+
+async def token(db):
+    """ETag for the current table contents: one indexed query on an AsyncSession"""
+    row = (await db.execute(TOKEN_QUERY)).first()
+    if row is None:  # seed() runs at startup, so only before the first request
+        return 'W/"0-0"'
+    max_id, revision = row
+    return f'W/"{max_id or 0}-{revision or 0}"'
+
+
+# ---------- ORM writes ----------
+@event.listens_for(Session, "after_flush")
+def _count_changes(session, flush_context):
+    # New rows move max(id) on their own
+    changed = any(
+        isinstance(o, Detection)
+        for o in (*session.deleted, *(o for o in session.dirty if session.is_modified(o)))
+    )
+    if changed:
+        bump(session)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_changes(session):
+    if session.info.pop("detections_changed", False):
+        for fn in _listeners:
+            fn()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changes(session):
+    session.info.pop("detections_changed", None)
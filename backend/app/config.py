@@ -1,17 +1,197 @@
-from threading import Lock
+import json
+import os
+import time
+
+# ---------- PREPROCESSING ----------
+# Named profile from app.detector.preprocess.PROFILES used for OCR crops
+PREPROCESS_PROFILE = os.getenv("PREPROCESS_PROFILE", "default")
+# Optional JSON file with extra/overriding profiles: {"name": [["stage", {params}], ...]}
+PREPROCESS_PROFILES_FILE = os.getenv("PREPROCESS_PROFILES_FILE")
+
+# ---------- OCR CASCADE ----------
+# A reading is accepted at the first cascade level where it fits the plate
+# syntax with at least this confidence; otherwise the crop escalates
+OCR_ACCEPT_CONF = float(os.getenv("OCR_ACCEPT_CONF", "0.5"))
+# Levels of app.detector.ocr.CASCADE tried before voting (1 = single pass)
+OCR_CASCADE_LEVELS = int(os.getenv("OCR_CASCADE_LEVELS", "3"))
+
+# ---------- BATCH DETECTION ----------
+# Images per detector call on /detect/batch
+DETECT_BATCH_SIZE = int(os.getenv("DETECT_BATCH_SIZE", "8"))
+# Upper bound on images accepted in a single /detect/batch request
+DETECT_BATCH_MAX_IMAGES = int(os.getenv("DETECT_BATCH_MAX_IMAGES", "5000"))
+
+# ---------- IMAGE STORAGE ----------
+IMAGE_STORE_WORKERS = int(os.getenv("IMAGE_STORE_WORKERS", "2"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "90"))
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "320"))
+# /detect/image results remembered per uploaded file (LRU); repeat uploads skip inference. 0 disables
+UPLOAD_CACHE_ENTRIES = int(os.getenv("UPLOAD_CACHE_ENTRIES", "10000"))
+
+# ---------- CAMERAS ----------
+# Concurrent detector calls shared by all server-side cameras
+CAMERA_INFERENCE_SLOTS = int(os.getenv("CAMERA_INFERENCE_SLOTS", "2"))
+CAMERA_RECONNECT_SEC = float(os.getenv("CAMERA_RECONNECT_SEC", "5"))
+CAMERAS_AUTOSTART = os.getenv("CAMERAS_AUTOSTART", "1") == "1"
+
+# ---------- EVENTS ----------
+# Recent events kept for Last-Event-ID resume
+EVENT_REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", "500"))
+# Per-subscriber backlog before the oldest events are dropped
+EVENT_SUBSCRIBER_QUEUE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE", "256"))
+EVENT_HEARTBEAT_SEC = float(os.getenv("EVENT_HEARTBEAT_SEC", "15"))
+# How often events published by other workers are picked up (shared state backends only)
+EVENT_SYNC_SEC = float(os.getenv("EVENT_SYNC_SEC", "0.5"))
+
+# ---------- WATCHLIST ----------
+# Directory of <list_name>.csv files (rows: plate[,reason]); reloaded on change
+WATCHLIST_DIR = os.getenv(
+    "WATCHLIST_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "watchlists")
+)
+WATCHLIST_POLL_SEC = float(os.getenv("WATCHLIST_POLL_SEC", "10"))
+# 0: exact + OCR-confusion matches only; 1: also tolerate one other substituted character
+WATCHLIST_MAX_EDITS = int(os.getenv("WATCHLIST_MAX_EDITS", "0"))
+# Repeat hits for the same plate/list/camera within this window publish one alert
+WATCHLIST_ALERT_WINDOW_SEC = float(os.getenv("WATCHLIST_ALERT_WINDOW_SEC", "30"))
+
+# ---------- RETENTION ----------
+# Off by default: every retention action rewrites or removes evidence
+RETENTION_ENABLED = os.getenv("RETENTION_ENABLED", "0") == "1"
+RETENTION_INTERVAL_SEC = float(os.getenv("RETENTION_INTERVAL_SEC", "3600"))
+# Per-source policies, JSON: {"video": {"delete_after_days": 30}, "default": {...}}
+# Keys: compress_after_days (annotated JPEG -> downscaled WebP), delete_after_days,
+# archive (write rows to Parquet before deleting). Nothing is compressed or
+# deleted unless configured.
+RETENTION_POLICIES = json.loads(os.getenv("RETENTION_POLICIES", "{}"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+# Pause between batches so request handlers can get the write lock
+RETENTION_BATCH_PAUSE_SEC = float(os.getenv("RETENTION_BATCH_PAUSE_SEC", "0.2"))
+RETENTION_WEBP_QUALITY = int(os.getenv("RETENTION_WEBP_QUALITY", "60"))
+RETENTION_MAX_WIDTH = int(os.getenv("RETENTION_MAX_WIDTH", "960"))
+ARCHIVE_DIR = os.getenv(
+    "ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "archive")
+)
+
+# ---------- ADMISSION CONTROL ----------
+# Concurrent inference jobs for uploads and websocket streams (cameras have their own slots)
+ADMISSION_SLOTS = int(os.getenv("ADMISSION_SLOTS", "4"))
+# Waiting requests beyond this are shed with 429
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+# Requests waiting longer than this are shed with 503
+ADMISSION_MAX_WAIT_SEC = float(os.getenv("ADMISSION_MAX_WAIT_SEC", "2"))
+# Pressure levels at which streams lower resolution, skip OCR, then halve fps
+ADMISSION_DEGRADE_AT = [float(x) for x in os.getenv("ADMISSION_DEGRADE_AT", "0.8,1.0,1.5").split(",")]
+# Frame width used by streams at the lower-resolution step
+ADMISSION_DEGRADED_WIDTH = int(os.getenv("ADMISSION_DEGRADED_WIDTH", "960"))
+# A streaming /detect/batch stops once one chunk has backed off this long under load
+ADMISSION_BATCH_MAX_BACKOFF_SEC = float(os.getenv("ADMISSION_BATCH_MAX_BACKOFF_SEC", "60"))
+
+# ---------- DATABASE ----------
+# Async engine used by the read routes (history, stats); kept apart from
+# the inference executor so browsing never takes frame-processing threads
+DB_ASYNC_POOL_SIZE = int(os.getenv("DB_ASYNC_POOL_SIZE", "5"))
+DB_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_ASYNC_MAX_OVERFLOW", "5"))
+# Threads for blocking detection writes from websocket and camera handlers
+DB_WRITE_WORKERS = int(os.getenv("DB_WRITE_WORKERS", "2"))
+# Serialized history/stats responses kept per worker (keyed by path + query)
+HTTP_CACHE_ENTRIES = int(os.getenv("HTTP_CACHE_ENTRIES", "256"))
+
+# ---------- PREVIEW ----------
+# Threads encoding annotated preview frames for websocket viewers
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "2"))
+# Upper bounds a client starts at (and may lower with ?preview_width= / ?preview_quality=)
+PREVIEW_MAX_WIDTH = int(os.getenv("PREVIEW_MAX_WIDTH", "1280"))
+PREVIEW_QUALITY = int(os.getenv("PREVIEW_QUALITY", "80"))
+# Floors the adaptation will not go below
+PREVIEW_MIN_WIDTH = int(os.getenv("PREVIEW_MIN_WIDTH", "320"))
+PREVIEW_MIN_QUALITY = int(os.getenv("PREVIEW_MIN_QUALITY", "40"))
+# Encode + send time per preview frame the adaptation aims for
+PREVIEW_TARGET_MS = float(os.getenv("PREVIEW_TARGET_MS", "60"))
+
+# ---------- MODEL LIFECYCLE ----------
+# Models (YOLO, EasyOCR) unused this long are unloaded and reloaded on the next request; 0 keeps them resident
+MODEL_IDLE_UNLOAD_SEC = int(os.getenv("MODEL_IDLE_UNLOAD_SEC", "0"))
+# Least recently used models are unloaded before a load would exceed this (estimated) size; 0 = no limit
+MODEL_MEMORY_BUDGET_MB = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))
+# "onnx": export YOLO weights to ONNX on the first unload and reload from it
+# (only when onnx and onnxruntime are installed, the .pt is used otherwise);
+# empty disables
+MODEL_CACHE_FORMAT = os.getenv("MODEL_CACHE_FORMAT", "onnx")
+
+# ---------- SESSION RECORDING ----------
+# Record incoming /ws/video and /ws/webcam frames for tools.replay:
+# off, requested (sessions opened with ?record=1) or all
+RECORD_SESSIONS = os.getenv("RECORD_SESSIONS", "off")
+RECORD_DIR = os.getenv(
+    "RECORD_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+)
+# Per-session cap; frames beyond it are not recorded
+RECORD_MAX_MB = int(os.getenv("RECORD_MAX_MB", "1024"))
+# Cap on everything in RECORD_DIR: new sessions are refused and running ones
+# stop recording once it is reached (checked per worker process)
+RECORD_DIR_MAX_MB = int(os.getenv("RECORD_DIR_MAX_MB", "10240"))
+# Frames waiting for the recorder thread; beyond it frames are dropped
+# (counted in the session header) instead of piling up in memory
+RECORD_QUEUE_FRAMES = int(os.getenv("RECORD_QUEUE_FRAMES", "256"))
+
+# ---------- DEBUG ----------
+# Required in the X-Admin-Token header by /debug, by the watchlist write
+# routes and POST /retention/run, and for ?record=1 on websockets (header or
+# admin_token query param); unset disables all of them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# ---------- SHARED STATE ----------
+# Where dedup windows, runtime config and the event replay buffer live:
+#   memory://                              one process (default)
+#   sqlite:////dev/shm/roadeye-state.db    all workers on one host
+#   redis://localhost:6379/0               all workers on all hosts
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "memory://")
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "roadeye:")
+
 
 class CountryConfig:
-    def __init__(self):
-        self._lock = Lock()
-        self._country = "IN"
+    """
+    Selected country, kept in the shared state backend so every worker sees
+    changes. Reads are cached for TTL seconds: other workers pick up a
+    change within that time, this one immediately.
+    """
+
+    KEY = "config:country"
+    TTL = 5.0
+
+    def __init__(self, default="IN"):
+        self._default = default
+        self._cached = None
+        self._expires = 0.0
 
     def set(self, code: str):
-        with self._lock:
-            self._country = code.upper()
+        from app.shared_state import get_shared_state
+        get_shared_state().set(self.KEY, code.upper())
+        self._cache(code.upper())
+
+    def _stale(self):
+        return self._cached is None or time.monotonic() >= self._expires
+
+    def _cache(self, code):
+        self._cached, self._expires = code or self._default, time.monotonic() + self.TTL
+        return self._cached
 
     def get(self) -> str:
-        with self._lock:
-            return self._country
+        """For threads (sync routes, the detection engine); may block on the backend"""
+        if self._stale():
+            from app.shared_state import get_shared_state
+            return self._cache(get_shared_state().get(self.KEY))
+        return self._cached
+
+    async def get_async(self) -> str:
+        """For the event loop: a cache miss reads the backend on the state executor"""
+        if self._stale():
+            from app.shared_state import get_shared_state, run_state
+            return self._cache(await run_state(get_shared_state().get, self.KEY))
+        return self._cached
 
 
 COUNTRY_CONFIG = CountryConfig()
@@ -1,8 +1,15 @@
+import asyncio
 import os
-from sqlalchemy import create_engine
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
+from app.config import DB_ASYNC_MAX_OVERFLOW, DB_ASYNC_POOL_SIZE, DB_WRITE_WORKERS
+
 load_dotenv()
 
 # Read DB URL from environment
@@ -20,4 +27,70 @@ engine = create_engine(
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+
+# ---------- async engine (read routes) ----------
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    """Same database through its async driver: aiosqlite locally, asyncpg for Postgres"""
+    scheme, rest = url.split("://", 1)
+    driver = ASYNC_DRIVERS.get(scheme.split("+")[0])
+    return f"{driver}://{rest}" if driver else url
+
+
+ASYNC_DATABASE_URL = async_url(DATABASE_URL)
+
+# An explicit queue pool: aiosqlite would otherwise default to NullPool
+# (a new connection, and thread, per request) with no size limit
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_ASYNC_POOL_SIZE,
+    max_overflow=DB_ASYNC_MAX_OVERFLOW,
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    """FastAPI dependency: one AsyncSession per request"""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+# ---------- blocking writes ----------
+# Detection saves from websocket/camera handlers run here instead of on the
+# event loop or the default executor that inference uses.
+db_executor = ThreadPoolExecutor(max_workers=DB_WRITE_WORKERS, thread_name_prefix="db-write")
+
+
+async def run_db(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(fn, *args, **kwargs))
+
+
+def ensure_columns(table: str, columns: dict):
+    """Add nullable columns that create_all() won't add to an existing table"""
+    inspector = inspect(engine)
+    if table not in inspector.get_table_names():
+        return
+
+    existing = {c["name"] for c in inspector.get_columns(table)}
+    with engine.begin() as conn:
+        for name, ddl in columns.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{name} ON {table} ({name})"))
+
+
+def ensure_index(name: str, table: str, columns: list):
+    """Create an index on an existing table if it is missing"""
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
@@ -1,85 +1,54 @@
-import cv2
-from ultralytics import YOLO
-from collections import defaultdict
-from app.detector.ocr import PlateOCR
+from app.detector.engine import MODEL_PATH, get_detection_pipeline, get_model
 
-_ocr_engine = None
-
-def get_ocr_engine():
-    global _ocr_engine
-    if _ocr_engine is None:
-        _ocr_engine = PlateOCR()
-    return _ocr_engine
-
-plate_buffer = defaultdict(int)
+# Upload-route entry points. The stages themselves live in app.detector.engine
+# (profile "image"); these keep the original return shapes.
 
 
 class PlateDetector:
-    def __init__(self, model_path: str):
-        self.model = YOLO(model_path)
-
-    def detect(self, image, conf_thresh=0.25):
-        results = self.model.predict(image, imgsz=640, conf=conf_thresh, verbose=False)
-        detections = []
-
-        if not results:
-            return detections
-
-        for r in results:
-            for box in r.boxes:
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                conf = float(box.conf[0])
-
-                if conf < conf_thresh:
-                    continue
-
-                if x2 <= x1 or y2 <= y1:
-                    continue
+    """Handle on a YOLO model (the shared one unless model_path says otherwise); kept for callers that pass a detector around"""
 
-                crop = image[y1:y2, x1:x2]
-                if crop.size == 0:
-                    continue
+    def __init__(self, model_path: str = None):
+        self.model_path = model_path
 
-                detections.append({
-                    "bbox": (x1, y1, x2, y2),
-                    "det_conf": conf,
-                    "crop": crop
-                })
+    @property
+    def model(self):
+        return get_model(self.model_path or MODEL_PATH)
 
-        return detections
-
-
-def process_license_plate(image, detector: PlateDetector):
-    detections = detector.detect(image)
-    results = []
-    ocr_engine = get_ocr_engine()
-
-    for det in detections:
-        x1, y1, x2, y2 = det["bbox"]
-        plate_img = det["crop"]
-
-        text, ocr_conf = ocr_engine.read_plate(plate_img)
-        if not text or ocr_conf < 0.1:
-            continue
-
-        final_conf = 0.6 * det["det_conf"] + 0.4 * ocr_conf
+    def detect(self, image, conf_thresh=0.25):
+        return self.detect_batch([image], conf_thresh)[0]
 
-        cv2.rectangle(image, (x1,y1),(x2,y2),(0,255,0),2)
-        cv2.putText(
-            image,
-            f"{text} ({final_conf:.2f})",
-            (x1, y1-8),
-            cv2.FONT_HERSHEY_SIMPLEX,
-            0.6,
-            (0,255,0),
-            2
+    def detect_batch(self, images, conf_thresh=0.25):
+        """Boxes only; one list of {"bbox", "det_conf", "crop"} per image"""
+        frames = get_detection_pipeline("image_detect").run_images(
+            images, overrides={"detect": {"conf": conf_thresh, "model": self.model_path}}
         )
-
-        results.append({
-            "plate": text,
-            "det_conf": det["det_conf"],
-            "ocr_conf": final_conf,
-            "bbox": det["bbox"]
-        })
-
-    return image, results
+        return [
+            [{"bbox": p["bbox"], "det_conf": p["det_conf"], "crop": p["crop"]} for p in f["plates"]]
+            for f in frames
+        ]
+
+
+def _legacy(frame):
+    return frame["annotated"], [
+        {
+            "plate": p["text"],
+            "det_conf": p["det_conf"],
+            "ocr_conf": p["confidence"],  # fused 0.6 * det + 0.4 * ocr
+            "bbox": p["bbox"],
+        }
+        for p in frame["plates"]
+    ]
+
+
+def process_license_plate(image, detector: PlateDetector = None):
+    return process_license_plates([image], detector)[0]
+
+
+def process_license_plates(images, detector: PlateDetector = None):
+    """
+    Detect on the whole batch in one predict() per chunk; the crops of all
+    images then go through the OCR cascade together, one reader call per
+    crop and variant (see engine._ocr).
+    """
+    overrides = {"detect": {"model": detector.model_path}} if detector is not None else None
+    return [_legacy(f) for f in get_detection_pipeline("image").run_images(images, overrides)]
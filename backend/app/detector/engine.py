@@ -0,0 +1,437 @@
+import importlib.util
+import os
+import time
+from functools import partial
+from threading import Lock
+
+import cv2
+
+from app.config import COUNTRY_CONFIG, MODEL_CACHE_FORMAT
+from app.jpeg import scratch_pool, decode, decode_region, jpeg_size, reduction_for
+from app.detector.lifecycle import model_manager
+from app.detector.ocr import get_easy_reader, get_plate_ocr
+from app.detector.plate_postprocess import apply_plate_syntax
+from app.detector.preprocess import get_pipeline
+from app.profiling import profiler
+
+# Prevent multiprocessing issues on Windows
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(BASE_DIR, "new_runs", "detect", "train", "weights", "best.pt")
+
+
+# Only export when both are already installed: otherwise ultralytics would
+# try to pip-install onnx at runtime
+ONNX_AVAILABLE = all(importlib.util.find_spec(m) is not None for m in ("onnx", "onnxruntime"))
+
+_exporting = set()  # .pt paths whose ONNX file is being written
+_exporting_lock = Lock()
+
+
+def _cached_path(path):
+    """Where the fast-loading export of a .pt file lives (None when caching is off or impossible)"""
+    if MODEL_CACHE_FORMAT != "onnx" or not ONNX_AVAILABLE:
+        return None
+    return os.path.splitext(path)[0] + ".onnx"
+
+
+def _cache_fresh(path):
+    cached = _cached_path(path)
+    with _exporting_lock:
+        if path in _exporting:  # half written
+            return False
+    try:
+        return bool(cached) and os.path.getmtime(cached) >= os.path.getmtime(path)
+    except OSError:
+        return False
+
+
+def _load_yolo(path):
+    import torch
+    from ultralytics import YOLO
+    torch.set_grad_enabled(False)
+    if _cache_fresh(path):
+        print(f"[INIT] Loading YOLO model from {_cached_path(path)}")
+        return YOLO(_cached_path(path), task="detect")
+    print(f"[INIT] Loading YOLO model from {path}")
+    return YOLO(path)
+
+
+def _export_yolo(path, model):
+    """
+    On unload (outside the model manager's lock): leave an ONNX export
+    (dynamic shapes) behind so the reload is quick. Loads meanwhile use the .pt.
+    """
+    if not _cached_path(path) or not os.path.exists(path) or _cache_fresh(path):
+        return
+    with _exporting_lock:
+        if path in _exporting:
+            return
+        _exporting.add(path)
+    try:
+        print(f"[MODELS] Exporting {path} to ONNX for faster reloads")
+        model.export(format="onnx", dynamic=True)
+    finally:
+        with _exporting_lock:
+            _exporting.discard(path)
+
+
+def get_model(path=MODEL_PATH):
+    """The YOLO plate detector, loaded on demand through the model manager and shared by every route"""
+    name = "yolo" if path == MODEL_PATH else f"yolo:{path}"
+    model_manager.register(name, partial(_load_yolo, path), partial(_export_yolo, path))
+    return model_manager.get(name)
+
+
+# ===========================
+# STAGES
+# ===========================
+# A frame is a dict: {"image": ndarray, "plates": [candidate, ...]}; a
+# candidate is a dict that stages fill in (bbox, det_conf, crop, prepped,
+# raw_text, text, ocr_conf, confidence). Every stage takes the whole batch
+# of frames plus its params, so each one can batch its own work.
+#
+# Frames given as encoded bytes ("data") may be decoded at reduced scale;
+# "size" is then the original (width, height) and "scale" maps image
+# coordinates back to it. Boxes are always in original coordinates.
+
+def _size(f):
+    if "size" not in f:
+        image = f.get("image")
+        f["size"] = (image.shape[1], image.shape[0]) if image is not None else (0, 0)
+    return f["size"]
+
+
+def _decode(frames, flags=cv2.IMREAD_COLOR, reduce_to=None):
+    """
+    Bytes -> image. With reduce_to, JPEGs are decoded at 1/2, 1/4 or 1/8
+    scale in the DCT domain while the long side stays >= reduce_to (the
+    detector input size), instead of decoding full size and shrinking.
+    """
+    for f in frames:
+        if f.get("image") is not None or f.get("data") is None:
+            continue
+        factor = reduction_for(f["data"], reduce_to) if reduce_to and flags == cv2.IMREAD_COLOR else 1
+        image = decode(f["data"], factor, flags)
+        f["image"] = image
+        if image is None:
+            continue
+        f["size"] = jpeg_size(f["data"]) if factor > 1 else (image.shape[1], image.shape[0])
+        f["scale"] = f["size"][0] / image.shape[1]
+
+
+def _detect(frames, conf=0.25, iou=0.7, imgsz=640, max_width=None, batch_size=8, model=None):
+    """
+    One predict() per chunk of frames; optional downscale, boxes mapped
+    back to full size. model is a weights path (default MODEL_PATH).
+    """
+    todo = [f for f in frames if f.get("image") is not None]
+    for f in frames:
+        f["plates"] = []
+
+    for i in range(0, len(todo), batch_size):
+        chunk = todo[i:i + batch_size]
+        inputs, factors, scratch = [], [], []
+        for f in chunk:
+            image = f["image"]
+            h, w = image.shape[:2]
+            factor = f.get("scale", 1.0)
+            if max_width and w > max_width:
+                ratio = max_width / w
+                dst = scratch_pool.take((int(h * ratio), max_width, image.shape[2]))
+                image = cv2.resize(image, (max_width, dst.shape[0]), dst=dst, interpolation=cv2.INTER_AREA)
+                scratch.append(dst)
+                factor /= ratio
+            factors.append(factor)
+            inputs.append(image)
+
+        results = get_model(model or MODEL_PATH).predict(
+            inputs, imgsz=imgsz, conf=conf, iou=iou, device="cpu", half=False, verbose=False
+        ) or []
+
+        for f, factor, r in zip(chunk, factors, results):
+            for box in r.boxes:
+                det_conf = float(box.conf[0])
+                if det_conf < conf:
+                    continue
+                x1, y1, x2, y2 = (int(v * factor) for v in box.xyxy[0])
+                f["plates"].append({"bbox": (x1, y1, x2, y2), "det_conf": det_conf})
+
+        del results, inputs
+        for dst in scratch:
+            scratch_pool.give(dst)
+
+
+def _filter(frames, min_width=1, min_height=1, max_plates=None):
+    """Drop degenerate/tiny boxes; keep the most confident first"""
+    for f in frames:
+        w, h = _size(f)
+        kept = []
+        for p in f["plates"]:
+            x1, y1, x2, y2 = p["bbox"]
+            x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+            if x2 - x1 < min_width or y2 - y1 < min_height:
+                continue
+            p["bbox"] = (x1, y1, x2, y2)
+            kept.append(p)
+        kept.sort(key=lambda p: p["det_conf"], reverse=True)
+        f["plates"] = kept[:max_plates] if max_plates else kept
+
+
+def _crop(frames):
+    """
+    Full-resolution crops. Frames decoded at reduced scale (or given only
+    as bytes) re-read just the boxes from the original buffer, falling back
+    to one full decode per frame that has plates.
+    """
+    for f in frames:
+        if not f["plates"]:
+            continue
+        if f.get("image") is not None and f.get("scale", 1.0) == 1.0:
+            for p in f["plates"]:
+                x1, y1, x2, y2 = p["bbox"]
+                p["crop"] = f["image"][y1:y2, x1:x2]
+            continue
+
+        full = None
+        for p in f["plates"]:
+            x1, y1, x2, y2 = p["bbox"]
+            crop = decode_region(f["data"], x1, y1, x2, y2)
+            if crop is None:
+                if full is None:
+                    full = decode(f["data"])
+                crop = full[y1:y2, x1:x2]
+            p["crop"] = crop
+
+
+def _preprocess(frames, profile=None):
+    """All crops of all frames through one preprocess run_batch"""
+    plates = [p for f in frames for p in f["plates"] if p.get("crop") is not None and p["crop"].size]
+    prepped = get_pipeline(profile).run_batch([p["crop"] for p in plates]) if plates else []
+    for p, img in zip(plates, prepped):
+        p["prepped"] = img
+
+
+def _ocr(frames, min_conf=0.0):
+    """
+    One readtext() per crop: EasyOCR's readtext_batched needs equally
+    sized inputs, and resizing plate crops to one shape costs accuracy.
+    """
+    reader = get_easy_reader()
+    for f in frames:
+        for p in f["plates"]:
+            p["raw_text"], p["ocr_conf"] = "", 0.0
+            if p.get("prepped") is None:
+                continue
+            readings = reader.readtext(p["prepped"])
+            if not readings:
+                continue
+            _, text, conf = max(readings, key=lambda r: r[2])
+            if conf >= min_conf:
+                p["raw_text"], p["ocr_conf"] = text, float(conf)
+
+
+def _read(frames, country=None, max_levels=None, profile=None):
+    """
+    Preprocess + OCR + syntax through the PlateOCR cascade: all crops of
+    all frames go through each level together, only unresolved ones escalate.
+    country defaults to the selected one (COUNTRY_CONFIG); profile replaces
+    the first level's preprocess profile.
+    """
+    country = country or COUNTRY_CONFIG.get()
+    plates = [p for f in frames for p in f["plates"] if p.get("crop") is not None and p["crop"].size]
+    for f in frames:
+        for p in f["plates"]:
+            p["raw_text"], p["text"], p["ocr_conf"] = "", "", 0.0
+    readings = get_plate_ocr().cascade([p["crop"] for p in plates], country, max_levels, profile) if plates else []
+    for p, r in zip(plates, readings):
+        p["raw_text"], p["text"], p["ocr_conf"] = r["raw_text"], r["text"], r["conf"]
+
+
+def _syntax(frames, country=None):
+    country = country or COUNTRY_CONFIG.get()
+    for f in frames:
+        for p in f["plates"]:
+            text = "".join(c for c in p.get("raw_text", "").upper() if c.isalnum())
+            p["text"] = apply_plate_syntax(text, country=country)
+
+
+def _fuse(frames, det_weight=0.6, ocr_weight=0.4, min_ocr_conf=0.1, drop_unread=True):
+    """confidence = det_weight * det_conf + ocr_weight * ocr_conf"""
+    for f in frames:
+        fused = []
+        for p in f["plates"]:
+            unread = not p.get("text") or p.get("ocr_conf", 0.0) < min_ocr_conf
+            if unread and drop_unread:
+                continue
+            p["confidence"] = det_weight * p["det_conf"] + ocr_weight * p.get("ocr_conf", 0.0)
+            fused.append(p)
+        f["plates"] = fused
+
+
+def _annotate(frames, style="label", color=(0, 255, 0)):
+    """
+    label:  box plus "TEXT (conf)" above it (upload routes)
+    stream: box plus "TEXT conf" above it, for every plate in the frame
+    boxes:  box only
+    """
+    for f in frames:
+        image = f.get("image")
+        if image is None:
+            continue
+        scale = f.get("scale", 1.0)
+        for p in f["plates"]:
+            x1, y1, x2, y2 = (int(v / scale) for v in p["bbox"])
+            cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+            if style == "label" and p.get("text"):
+                cv2.putText(image, f"{p['text']} ({p['confidence']:.2f})", (x1, y1 - 8),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            elif style == "stream":
+                label = f"{p['text']} {p['det_conf']:.2f}" if p.get("text") else f"{p['det_conf']:.2f}"
+                cv2.putText(image, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+        f["annotated"] = image
+
+
+STAGES = {
+    "decode": _decode,
+    "detect": _detect,
+    "filter": _filter,
+    "crop": _crop,
+    "preprocess": _preprocess,
+    "ocr": _ocr,
+    "read": _read,
+    "syntax": _syntax,
+    "fuse": _fuse,
+    "annotate": _annotate,
+}
+
+# ===========================
+# PROFILES
+# ===========================
+# Upload routes run the whole OCR cascade; streams stop after its first
+# level (max_levels: 1) since the next frame gives the plate another read.
+# Single-pass reading is still available to custom profiles as
+# preprocess -> ocr -> syntax
+_READ = [
+    ["crop", {}],
+    ["read", {}],
+]
+_STREAM_READ = [
+    ["crop", {}],
+    ["read", {"max_levels": 1}],
+]
+
+PROFILES = {
+    # /detect/image and /detect/batch: every plate, fused confidence, unread boxes dropped
+    "image": [
+        ["decode", {}],
+        ["detect", {"conf": 0.25, "iou": 0.7}],
+        ["filter", {}],
+        *_READ,
+        ["fuse", {"det_weight": 0.6, "ocr_weight": 0.4, "min_ocr_conf": 0.1}],
+        ["annotate", {"style": "label"}],
+    ],
+    "image_detect": [
+        ["decode", {}],
+        ["detect", {"conf": 0.25, "iou": 0.7}],
+        ["filter", {}],
+        ["crop", {}],
+    ],
+    # Websockets and cameras: recall-oriented detector settings, every plate
+    # reported, detector confidence as the plate confidence. JPEG bytes are
+    # decoded at reduced scale down to the 640px detector input.
+    "stream": [
+        ["decode", {"reduce_to": 640}],
+        ["detect", {"conf": 0.15, "iou": 0.45}],
+        ["filter", {"min_width": 20, "min_height": 10}],
+        *_STREAM_READ,
+        ["fuse", {"det_weight": 1.0, "ocr_weight": 0.0, "min_ocr_conf": 0.0, "drop_unread": False}],
+        ["annotate", {"style": "stream"}],
+    ],
+    # Streams under load (OCR skipped)
+    "stream_boxes": [
+        ["decode", {"reduce_to": 640}],
+        ["detect", {"conf": 0.15, "iou": 0.45}],
+        ["filter", {"min_width": 20, "min_height": 10}],
+        ["annotate", {"style": "stream"}],
+    ],
+    # Two-phase streaming: boxes first, then reading the boxes that were kept
+    "stream_detect": [
+        ["decode", {"reduce_to": 640}],
+        ["detect", {"conf": 0.15, "iou": 0.45}],
+        ["filter", {"min_width": 20, "min_height": 10}],
+    ],
+    "stream_read": [
+        *_STREAM_READ,
+        ["fuse", {"det_weight": 1.0, "ocr_weight": 0.0, "min_ocr_conf": 0.0, "drop_unread": False}],
+    ],
+}
+
+
+# ===========================
+# PIPELINE
+# ===========================
+class DetectionPipeline:
+    """
+    Runs a profile's stages over a batch of frames, stage by stage, and
+    records per-stage cost. `overrides` patches stage params for one call
+    (e.g. {"detect": {"max_width": 960}} when a stream is degraded).
+    """
+
+    def __init__(self, profile: str):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown detection profile '{profile}'")
+        self.profile = profile
+        self.stages = [(name, STAGES[name], dict(params)) for name, params in PROFILES[profile]]
+        self._lock = Lock()
+        self._cost = {name: [0, 0, 0.0] for name, _, _ in self.stages}  # name -> [calls, frames, seconds]
+
+    def run(self, frames, overrides=None):
+        """frames: dicts with "image" (ndarray) or "data" (encoded bytes); returned enriched in place"""
+        timings = []
+        with profiler.torch_ops():
+            for name, fn, params in self.stages:
+                if overrides and name in overrides:
+                    params = {**params, **overrides[name]}
+                start = time.perf_counter()
+                fn(frames, **params)
+                timings.append((name, time.perf_counter() - start))
+
+        with self._lock:
+            for name, elapsed in timings:
+                self._cost[name][0] += 1
+                self._cost[name][1] += len(frames)
+                self._cost[name][2] += elapsed
+        return frames
+
+    def run_images(self, images, overrides=None):
+        return self.run([{"image": image} for image in images], overrides)
+
+    def cost(self):
+        with self._lock:
+            return {
+                name: {
+                    "calls": calls,
+                    "frames": n,
+                    "ms_per_frame": (total * 1000 / n) if n else 0.0,
+                }
+                for name, (calls, n, total) in self._cost.items()
+            }
+
+
+_pipelines = {}
+_pipelines_lock = Lock()
+
+
+def get_detection_pipeline(profile: str) -> DetectionPipeline:
+    with _pipelines_lock:
+        if profile not in _pipelines:
+            _pipelines[profile] = DetectionPipeline(profile)
+        return _pipelines[profile]
+
+
+def pipeline_costs():
+    with _pipelines_lock:
+        pipelines = list(_pipelines.values())
+    return {p.profile: p.cost() for p in pipelines}
@@ -0,0 +1,195 @@
+import ctypes
+import gc
+import os
+import time
+from threading import Event, Lock, Thread
+
+from app.config import MODEL_IDLE_UNLOAD_SEC, MODEL_MEMORY_BUDGET_MB
+
+
+def resident_mb():
+    """Current resident set size of this process in MB (Linux); peak RSS elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _release_memory():
+    """Collect the dropped model and hand freed heap pages back to the OS"""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class ModelManager:
+    """
+    Owns the heavy models (YOLO weights, OCR readers, ...) behind named
+    loaders, so the lazy singletons can let go of them again.
+
+    get(name) loads on first use and stamps the model as used. A background
+    thread unloads models idle for longer than idle_sec; the next get()
+    reloads them (loaders may pick a faster cached format by then). With a
+    memory budget, least recently used models are unloaded before a load
+    that would not fit. Sizes are RSS deltas measured around each load, so
+    they are estimates. A caller still holding a model keeps it alive until
+    it is done; unloading only drops the manager's reference.
+    """
+
+    def __init__(self, idle_sec=MODEL_IDLE_UNLOAD_SEC, budget_mb=MODEL_MEMORY_BUDGET_MB):
+        self.idle_sec = idle_sec
+        self.budget_mb = budget_mb
+        self._entries = {}
+        self._lock = Lock()  # guards _entries; loads take the entry's own lock
+        self._stop = Event()
+        self._thread = None
+
+    def register(self, name, loader, before_unload=None):
+        """
+        loader() -> model. before_unload(model) runs once the manager has
+        let go of the model, outside the entry lock, so a slow hook (an
+        export) never blocks get(); a get() meanwhile simply reloads.
+        """
+        if name in self._entries:
+            return
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = {
+                    "loader": loader,
+                    "before_unload": before_unload,
+                    "model": None,
+                    "lock": Lock(),
+                    "last_used": 0.0,
+                    "size_mb": 0.0,
+                    "loads": 0,
+                    "unloads": 0,
+                    "evictions": 0,
+                    "load_sec": 0.0,
+                    "last_load_sec": 0.0,
+                }
+
+    def get(self, name):
+        entry = self._entries[name]
+        model = entry["model"]
+        if model is None:
+            # Evictions take other entries' locks, so they never run while
+            # this one is held: two loads evicting each other would deadlock
+            self._make_room(name, entry["size_mb"])
+            loaded = False
+            with entry["lock"]:
+                model = entry["model"]
+                if model is None:
+                    model = self._load(name, entry)
+                    loaded = True
+            if loaded:
+                # A first load only learns its size afterwards
+                self._make_room(name, entry["size_mb"])
+        entry["last_used"] = time.monotonic()
+        return model
+
+    def _load(self, name, entry):
+        before = resident_mb()
+        start = time.perf_counter()
+        model = entry["loader"]()
+        elapsed = time.perf_counter() - start
+
+        entry["size_mb"] = max(entry["size_mb"], resident_mb() - before)
+        entry["loads"] += 1
+        entry["load_sec"] += elapsed
+        entry["last_load_sec"] = elapsed
+        entry["last_used"] = time.monotonic()  # not the first to go when another load makes room
+        entry["model"] = model
+        print(f"[MODELS] Loaded {name} in {elapsed:.2f}s (~{entry['size_mb']:.0f} MB)")
+        return model
+
+    def _make_room(self, name, needed_mb):
+        """Unload least recently used models (never `name`) until needed_mb fits the budget"""
+        if not self.budget_mb:
+            return
+        with self._lock:
+            loaded = [(n, e) for n, e in self._entries.items() if e["model"] is not None and n != name]
+        used = sum(e["size_mb"] for _, e in loaded)
+        for other, e in sorted(loaded, key=lambda item: item[1]["last_used"]):
+            if used + needed_mb <= self.budget_mb:
+                break
+            if self.unload(other):
+                e["evictions"] += 1
+                used -= e["size_mb"]
+
+    def unload(self, name, idle_sec=None):
+        """Drop the model; with idle_sec, only if it has not been used for that long"""
+        entry = self._entries[name]
+        with entry["lock"]:
+            model = entry["model"]
+            if model is None:
+                return False
+            if idle_sec is not None and time.monotonic() - entry["last_used"] <= idle_sec:
+                return False
+            entry["model"] = None
+            entry["unloads"] += 1
+        if entry["before_unload"] is not None:
+            try:
+                entry["before_unload"](model)
+            except Exception as e:
+                print(f"[MODELS] before_unload of {name} failed:", e)
+        del model
+        _release_memory()
+        print(f"[MODELS] Unloaded {name}")
+        return True
+
+    def unload_idle(self):
+        if not self.idle_sec:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            idle = [n for n, e in self._entries.items()
+                    if e["model"] is not None and now - e["last_used"] > self.idle_sec]
+        return [n for n in idle if self.unload(n, self.idle_sec)]
+
+    # ---------- background reaper ----------
+    def start(self):
+        if self.idle_sec and self._thread is None:
+            self._thread = Thread(target=self._reap, name="model-reaper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _reap(self):
+        while not self._stop.wait(min(60.0, max(1.0, self.idle_sec / 4))):
+            try:
+                self.unload_idle()
+            except Exception as e:
+                print("[MODELS] Idle unload failed:", e)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._entries.items())
+        models = {
+            name: {
+                "loaded": e["model"] is not None,
+                "size_mb": round(e["size_mb"], 1),
+                "idle_sec": round(now - e["last_used"], 1) if e["last_used"] else None,
+                "loads": e["loads"],
+                "unloads": e["unloads"],
+                "evictions": e["evictions"],
+                "avg_load_sec": round(e["load_sec"] / e["loads"], 3) if e["loads"] else None,
+                "last_load_sec": round(e["last_load_sec"], 3),
+            }
+            for name, e in entries
+        }
+        return {
+            "resident_mb": round(resident_mb(), 1),
+            "loaded_mb": round(sum(m["size_mb"] for m in models.values() if m["loaded"]), 1),
+            "budget_mb": self.budget_mb or None,
+            "idle_unload_sec": self.idle_sec or None,
+            "models": models,
+        }
+
+
+model_manager = ModelManager()
@@ -1,60 +1,238 @@
-import cv2
+from collections import defaultdict
+from threading import Lock
+
 import numpy as np
-from app.detector.plate_postprocess import apply_plate_syntax
+from app.config import COUNTRY_CONFIG, OCR_ACCEPT_CONF, OCR_CASCADE_LEVELS
+from app.detector.lifecycle import model_manager
+from app.detector.plate_postprocess import apply_plate_syntax, matches_syntax
+from app.detector.preprocess import get_pipeline
+
+# Tesseract is an optional second engine for the last cascade level
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+ALNUM = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+
+def _load_easy_reader():
+    import easyocr
+    print("[LAZY LOAD] Initializing EasyOCR...")
+    return easyocr.Reader(['en'], gpu=False)
+
+
+model_manager.register("easyocr", _load_easy_reader)
 
-_easy_reader = None  # global singleton
 
 def get_easy_reader():
-    global _easy_reader
-    if _easy_reader is None:
-        import easyocr
-        print("[LAZY LOAD] Initializing EasyOCR...")
-        _easy_reader = easyocr.Reader(['en'], gpu=False)
-    return _easy_reader
+    """The shared EasyOCR reader; loaded on demand and unloaded when idle by the model manager"""
+    return model_manager.get("easyocr")
+
+
+# ===========================
+# ENGINES
+# ===========================
+# img -> (raw_text, conf in 0..1); ("", 0.0) when nothing was read
+
+def _easyocr(img, **params):
+    readings = get_easy_reader().readtext(img, **params)
+    if not readings:
+        return "", 0.0
+    _, text, conf = max(readings, key=lambda r: r[2])
+    return text, float(conf)
+
+
+def _tesseract(img, psm=7):
+    data = pytesseract.image_to_data(
+        img,
+        config=f"--psm {psm} -c tessedit_char_whitelist={ALNUM}",
+        output_type=pytesseract.Output.DICT,
+    )
+    words = [(w.strip(), float(c)) for w, c in zip(data["text"], data["conf"]) if w.strip() and float(c) >= 0]
+    if not words:
+        return "", 0.0
+    return "".join(w for w, _ in words), sum(c for _, c in words) / len(words) / 100
+
+
+ENGINES = {
+    "easyocr": _easyocr,
+    "tesseract": _tesseract,
+}
+
+
+def engine_available(name):
+    return name != "tesseract" or pytesseract is not None
+
+
+# ===========================
+# CASCADE
+# ===========================
+# Escalation levels, cheapest first; the multi-variant ensemble from
+# experiments/LPD_AccuracyImprove.py spread over them. A variant is
+# [preprocess_profile, engine, params]; None means the reader's own profile.
+# Variants whose engine is not installed are skipped.
+CASCADE = [
+    [
+        [None, "easyocr", {}],
+    ],
+    [
+        ["clahe", "easyocr", {"allowlist": ALNUM}],
+        ["fast_median", "easyocr", {"allowlist": ALNUM}],
+    ],
+    [
+        ["binarize", "easyocr", {"allowlist": ALNUM}],
+        ["binarize", "tesseract", {"psm": 7}],
+        ["clahe", "tesseract", {"psm": 8}],
+    ],
+]
+
+# Readings that fit the plate syntax count this much more in a vote
+SYNTAX_WEIGHT = 2.0
+
+
+def vote(candidates, country="IN"):
+    """
+    Pick one reading out of (text, conf) candidates: each distinct text
+    scores the sum of its confidences, weighted up when it fits the syntax.
+    Returns (text, best conf seen for it), or ("", 0.0).
+    """
+    scores = defaultdict(float)
+    best = {}
+    for text, conf in candidates:
+        if not text:
+            continue
+        scores[text] += conf * (SYNTAX_WEIGHT if matches_syntax(text, country) else 1.0)
+        best[text] = max(best.get(text, 0.0), conf)
+    if not scores:
+        return "", 0.0
+    text = max(scores, key=scores.get)
+    return text, best[text]
 
 
 class PlateOCR:
-    def __init__(self):
+    """
+    Early-exit OCR cascade. Every crop is read with the cheapest variant
+    first; crops whose reading fits the country syntax with at least
+    accept_conf confidence are done. The rest move on to the next level,
+    whose variants run as one batch over just those crops. Crops still
+    unresolved after the last level get a vote over all their readings.
+    """
+
+    def __init__(self, profile: str = None, country=None, accept_conf=OCR_ACCEPT_CONF, max_levels=OCR_CASCADE_LEVELS):
         # IMPORTANT: do NOTHING heavy here
         print("[INIT] PlateOCR lightweight init")
+        self.preprocess = get_pipeline(profile)
+        self.country = country  # None: the selected country (COUNTRY_CONFIG)
+        self.accept_conf = accept_conf
+        self.max_levels = max(1, min(max_levels, len(CASCADE)))
+
+        self._lock = Lock()
+        self._levels = [[0, 0, 0] for _ in CASCADE]  # [crops in, accepted, OCR calls]
+        self._voted = 0
+        self._unread = 0
 
     def read_plate(self, plate_img: np.ndarray):
-        if plate_img is None or plate_img.size == 0:
-            return "", 0.0
+        return self.read_plates([plate_img])[0]
+
+    def read_plates(self, plate_imgs, max_levels=None):
+        """[(text, conf)] per crop; ("", 0.0) for empty crops or nothing read"""
+        return [(r["text"], r["conf"]) for r in self.cascade(plate_imgs, max_levels=max_levels)]
+
+    def cascade(self, plate_imgs, country=None, max_levels=None, profile=None):
+        """
+        [{"text", "raw_text", "conf", "level"}] per crop. level is the
+        index of the accepting level, "vote" when no level accepted, or
+        None for empty crops. profile overrides the reader's own profile.
+        """
+        country = country or self.country or COUNTRY_CONFIG.get()
+        levels = min(max_levels or self.max_levels, self.max_levels)
+        results = [{"text": "", "raw_text": "", "conf": 0.0, "level": None} for _ in plate_imgs]
+        candidates = defaultdict(list)  # crop index -> [(text, conf, raw_text)]
+        todo = [i for i, img in enumerate(plate_imgs) if img is not None and img.size > 0]
+        counts = [[0, 0, 0] for _ in CASCADE]
+        own = self.preprocess if profile is None else get_pipeline(profile)
+
+        for level, variants in enumerate(CASCADE[:levels]):
+            if not todo:
+                break
+            counts[level][0] += len(todo)
+            accepted = defaultdict(list)
+
+            for variant_profile, engine, params in variants:
+                if not engine_available(engine):
+                    continue
+                pipeline = own if variant_profile is None else get_pipeline(variant_profile)
+                prepped = pipeline.run_batch([plate_imgs[i] for i in todo])
+                read = ENGINES[engine]
+                for i, img in zip(todo, prepped):
+                    raw, conf = read(img, **params)
+                    counts[level][2] += 1
+                    text = self._clean(raw, country)
+                    if not text:
+                        continue
+                    candidates[i].append((text, conf, raw))
+                    if conf >= self.accept_conf and matches_syntax(text, country):
+                        accepted[i].append((text, conf))
 
-        plate_img = self._preprocess(plate_img)
+            for i, readings in accepted.items():
+                self._decide(results[i], readings, candidates[i], country, level)
+            counts[level][1] += len(accepted)
+            todo = [i for i in todo if i not in accepted]
 
-        reader = get_easy_reader()
-        results = reader.readtext(plate_img)
+        voted = unread = 0
+        for i in todo:
+            if candidates[i]:
+                self._decide(results[i], [(t, c) for t, c, _ in candidates[i]], candidates[i], country, "vote")
+                voted += 1
+            else:
+                unread += 1
 
-        if not results:
-            return "", 0.0
+        with self._lock:
+            for total, n in zip(self._levels, counts):
+                for k in range(3):
+                    total[k] += n[k]
+            self._voted += voted
+            self._unread += unread
+        return results
 
-        results.sort(key=lambda x: x[2], reverse=True)
-        text = self._clean(results[0][1])
-        conf = float(results[0][2])
-        return text, conf
+    def _decide(self, result, readings, candidates, country, level):
+        text, conf = readings[0] if len(readings) == 1 else vote(readings, country)
+        result["text"], result["conf"], result["level"] = text, conf, level
+        result["raw_text"] = next(raw for t, _, raw in candidates if t == text)
 
-    def _clean(self, text):
+    def _clean(self, text, country="IN"):
         text = "".join(c for c in text.upper() if c.isalnum())
-        return apply_plate_syntax(text, country="IN")
+        return apply_plate_syntax(text, country=country)
 
-    def _preprocess(self, img):
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    def stats(self):
+        """How many crops each level saw and settled, and OCR calls spent per crop"""
+        with self._lock:
+            crops = self._levels[0][0]
+            calls = sum(level[2] for level in self._levels)
+            return {
+                "accept_conf": self.accept_conf,
+                "max_levels": self.max_levels,
+                "tesseract": pytesseract is not None,
+                "levels": [
+                    {"crops": n, "accepted": accepted, "ocr_calls": ocr_calls}
+                    for n, accepted, ocr_calls in self._levels[:self.max_levels]
+                ],
+                "voted": self._voted,
+                "unread": self._unread,
+                "ocr_calls_per_crop": round(calls / crops, 2) if crops else 0.0,
+            }
 
-        if gray.mean() < 70:
-            gray = cv2.adaptiveThreshold(
-                gray, 255,
-                cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                cv2.THRESH_BINARY, 11, 2
-            )
 
-        h = gray.shape[0]
-        if h < 40:
-            scale = 40 / h
-            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+_plate_ocr = None
+_plate_ocr_lock = Lock()
 
-        gray = cv2.bilateralFilter(gray, 11, 17, 17)
-        gray = cv2.equalizeHist(gray)
 
-        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+def get_plate_ocr() -> PlateOCR:
+    """The cascade shared by the detection engine"""
+    global _plate_ocr
+    if _plate_ocr is None:
+        with _plate_ocr_lock:
+            if _plate_ocr is None:
+                _plate_ocr = PlateOCR()
+    return _plate_ocr
@@ -18,18 +18,28 @@ DIGIT_TO_LETTER = {
     '8': 'B',
 }
 
+# Letter/digit layouts per country, at most one per length
 COUNTRY_SYNTAX = {
-    "IN": ["L","L","D","D","L","L","D","D","D","D"],   # KA01AB1234
-    "UK": ["L","L","D","D","L","L","L"],              # AB12CDE
-    "DE": ["L","L","L","D","D","D","D"],              # BMW1234
+    "IN": [
+        ["L","L","D","D","L","L","D","D","D","D"],    # KA01AB1234
+        ["L","L","D","D","L","D","D","D","D"],        # MH12A1234
+    ],
+    "UK": [["L","L","D","D","L","L","L"]],            # AB12CDE
+    "DE": [["L","L","L","D","D","D","D"]],            # BMW1234
 }
 
+
+def _layout(text, country):
+    """The country's layout for text's length, or None"""
+    return next((p for p in COUNTRY_SYNTAX.get(country, []) if len(p) == len(text)), None)
+
+
 def apply_plate_syntax(text: str, country="IN") -> str:
     text = re.sub(r'[^A-Z0-9]', '', text.upper())
-    pattern = COUNTRY_SYNTAX.get(country)
+    pattern = _layout(text, country)
 
     # If country unknown or length mismatch → return cleaned text
-    if not pattern or len(text) != len(pattern):
+    if not pattern:
         return text
 
     corrected = list(text)
@@ -44,3 +54,18 @@ def apply_plate_syntax(text: str, country="IN") -> str:
             corrected[i] = DIGIT_TO_LETTER.get(c, c)
 
     return "".join(corrected)
+
+
+def matches_syntax(text: str, country="IN") -> bool:
+    """
+    True if text (already passed through apply_plate_syntax) fits one of the
+    country's letter/digit layouts. Countries without layouts accept any
+    non-empty text, leaving the decision to the confidence threshold.
+    """
+    if country not in COUNTRY_SYNTAX:
+        return bool(text)
+    pattern = _layout(text, country)
+    if not pattern:
+        return False
+    return all(c.isalpha() if expected == "L" else c.isdigit()
+               for c, expected in zip(text, pattern))
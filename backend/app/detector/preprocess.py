@@ -0,0 +1,239 @@
+import json
+import os
+import time
+from threading import Lock
+
+import cv2
+import numpy as np
+
+from app.config import PREPROCESS_PROFILE, PREPROCESS_PROFILES_FILE
+
+# ===========================
+# STAGES
+# ===========================
+# Every stage takes a single image plus its params and returns an image.
+# Stages are looked up by name so profiles can be plain data (dicts/JSON).
+
+INTERPOLATION = {
+    "nearest": cv2.INTER_NEAREST,
+    "linear": cv2.INTER_LINEAR,
+    "cubic": cv2.INTER_CUBIC,
+    "area": cv2.INTER_AREA,
+}
+
+SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+
+
+def _gray(img):
+    if img.ndim == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return img
+
+
+def _adaptive_threshold(img, block=11, c=2, when_mean_below=None):
+    if when_mean_below is not None and img.mean() >= when_mean_below:
+        return img
+    return cv2.adaptiveThreshold(
+        img, 255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, block, c
+    )
+
+
+def _otsu(img):
+    _, binary = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+def _min_height(img, height=40, interpolation="cubic"):
+    h = img.shape[0]
+    if h >= height:
+        return img
+    scale = height / h
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=INTERPOLATION[interpolation])
+
+
+def _upscale(img, factor=2.0, interpolation="cubic"):
+    return cv2.resize(img, None, fx=factor, fy=factor, interpolation=INTERPOLATION[interpolation])
+
+
+def _bilateral(img, d=11, sigma_color=17, sigma_space=17):
+    return cv2.bilateralFilter(img, d, sigma_color, sigma_space)
+
+
+def _gaussian(img, ksize=3):
+    return cv2.GaussianBlur(img, (ksize, ksize), 0)
+
+
+def _median(img, ksize=3):
+    return cv2.medianBlur(img, ksize)
+
+
+def _box(img, ksize=3):
+    return cv2.blur(img, (ksize, ksize))
+
+
+def _equalize(img):
+    return cv2.equalizeHist(img)
+
+
+def _clahe(img, clip=2.0, tile=8):
+    return cv2.createCLAHE(clipLimit=clip, tileGridSize=(tile, tile)).apply(img)
+
+
+def _sharpen(img):
+    return cv2.filter2D(img, -1, SHARPEN_KERNEL)
+
+
+def _to_bgr(img):
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    return img
+
+
+def _to_rgb(img):
+    if img.ndim == 2:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2RGB)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+STAGES = {
+    "gray": _gray,
+    "adaptive_threshold": _adaptive_threshold,
+    "otsu": _otsu,
+    "min_height": _min_height,
+    "upscale": _upscale,
+    "bilateral": _bilateral,
+    "gaussian": _gaussian,
+    "median": _median,
+    "box": _box,
+    "equalize": _equalize,
+    "clahe": _clahe,
+    "sharpen": _sharpen,
+    "to_bgr": _to_bgr,
+    "to_rgb": _to_rgb,
+}
+
+# ===========================
+# PROFILES
+# ===========================
+# A profile is an ordered list of [stage_name, params] pairs.
+PROFILES = {
+    # Former PlateOCR._preprocess
+    "default": [
+        ["gray", {}],
+        ["adaptive_threshold", {"block": 11, "c": 2, "when_mean_below": 70}],
+        ["min_height", {"height": 40, "interpolation": "cubic"}],
+        ["bilateral", {"d": 11, "sigma_color": 17, "sigma_space": 17}],
+        ["equalize", {}],
+        ["to_bgr", {}],
+    ],
+    # Same shape as "default", bilateral swapped for a separable 3x3 blur
+    "fast": [
+        ["gray", {}],
+        ["adaptive_threshold", {"block": 11, "c": 2, "when_mean_below": 70}],
+        ["min_height", {"height": 40, "interpolation": "linear"}],
+        ["gaussian", {"ksize": 3}],
+        ["equalize", {}],
+        ["to_bgr", {}],
+    ],
+    # Edge-preserving but still far cheaper than bilateral
+    "fast_median": [
+        ["gray", {}],
+        ["adaptive_threshold", {"block": 11, "c": 2, "when_mean_below": 70}],
+        ["min_height", {"height": 40, "interpolation": "linear"}],
+        ["median", {"ksize": 3}],
+        ["equalize", {}],
+        ["to_bgr", {}],
+    ],
+    # Former video_pipeline.extract_text_with_easyocr
+    "clahe": [
+        ["gray", {}],
+        ["min_height", {"height": 32, "interpolation": "cubic"}],
+        ["clahe", {"clip": 2.0, "tile": 8}],
+        ["to_rgb", {}],
+    ],
+    # Former utils.preprocess_plate
+    "binarize": [
+        ["gray", {}],
+        ["upscale", {"factor": 2.0, "interpolation": "cubic"}],
+        ["sharpen", {}],
+        ["adaptive_threshold", {"block": 11, "c": 2}],
+    ],
+}
+
+
+def load_profiles(path: str):
+    """Merge extra/overriding profiles from a JSON file into PROFILES"""
+    with open(path) as f:
+        extra = json.load(f)
+    for name, stages in extra.items():
+        for stage, _ in stages:
+            if stage not in STAGES:
+                raise ValueError(f"Unknown preprocess stage '{stage}' in profile '{name}'")
+        PROFILES[name] = stages
+
+
+# ===========================
+# PIPELINE
+# ===========================
+class PreprocessPipeline:
+    def __init__(self, profile: str = "default"):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown preprocess profile '{profile}'")
+        self.profile = profile
+        self.stages = [(name, STAGES[name], dict(params)) for name, params in PROFILES[profile]]
+        self._lock = Lock()
+        self._cost = {name: [0, 0.0] for name, _, _ in self.stages}  # name -> [images, seconds]
+
+    def run(self, img):
+        return self.run_batch([img])[0]
+
+    def run_batch(self, imgs):
+        """Apply every stage to the whole batch before moving to the next one"""
+        imgs = list(imgs)
+        timings = []
+        for name, fn, params in self.stages:
+            start = time.perf_counter()
+            imgs = [fn(img, **params) for img in imgs]
+            timings.append((name, time.perf_counter() - start))
+
+        with self._lock:
+            for name, elapsed in timings:
+                self._cost[name][0] += len(imgs)
+                self._cost[name][1] += elapsed
+        return imgs
+
+    def cost(self):
+        """Measured per-stage cost in milliseconds per image"""
+        with self._lock:
+            return {
+                name: {
+                    "images": n,
+                    "ms_per_image": (total * 1000 / n) if n else 0.0,
+                }
+                for name, (n, total) in self._cost.items()
+            }
+
+    def reset_cost(self):
+        with self._lock:
+            for entry in self._cost.values():
+                entry[0], entry[1] = 0, 0.0
+
+
+_pipelines = {}
+_pipelines_lock = Lock()
+_profiles_loaded = False
+
+
+def get_pipeline(profile: str = None) -> PreprocessPipeline:
+    global _profiles_loaded
+    profile = profile or PREPROCESS_PROFILE
+    with _pipelines_lock:
+        if not _profiles_loaded:
+            if PREPROCESS_PROFILES_FILE and os.path.exists(PREPROCESS_PROFILES_FILE):
+                load_profiles(PREPROCESS_PROFILES_FILE)
+            _profiles_loaded = True
+        if profile not in _pipelines:
+            _pipelines[profile] = PreprocessPipeline(profile)
+        return _pipelines[profile]
@@ -1,110 +1,63 @@
 import cv2
-from ultralytics import YOLO
-import os
 import logging
 from collections import defaultdict
-from app.detector.ocr import PlateOCR
-import torch
-torch.set_grad_enabled(False)
+from app.detector.ocr import get_easy_reader
+from app.detector.preprocess import get_pipeline
+from app.detector.engine import get_detection_pipeline, get_model  # noqa: F401 (get_model re-exported)
 import logging
 logger = logging.getLogger("lpr")
 logger.setLevel(logging.WARNING)
 
+# Stream entry points. The stages live in app.detector.engine (profiles
+# "stream", "stream_detect", "stream_read"); these keep the original shapes.
 
-_ocr_engine = None
+plate_buffer = defaultdict(list)
 
-def get_ocr_engine():
-    global _ocr_engine
-    if _ocr_engine is None:
-        _ocr_engine = PlateOCR()
-    return _ocr_engine
 
-# Prevent multiprocessing issues on Windows
-os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
+def _frame(image):
+    """Engine frame for a decoded image or still-encoded bytes (decoded by the pipeline)"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return {"data": image}
+    return {"image": image}
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(
-    BASE_DIR,
-    "new_runs",
-    "detect",
-    "train",
-    "weights",
-    "best.pt"
-)
-# Initialize models as None
-_model = None
 
-plate_buffer = defaultdict(list)
+def process_frame(image, overrides=None, profile="stream"):
+    """Run a stream profile over one frame (ndarray or JPEG bytes); returns the engine frame dict"""
+    return get_detection_pipeline(profile).run([_frame(image)], overrides)[0]
+
+
+def find_plate_boxes(image, overrides=None):
+    """All plausible plate boxes as (x1, y1, x2, y2, confidence), best first"""
+    if image is None or len(image) == 0:
+        logger.error("[ERROR] Invalid input image")
+        return []
+    frame = process_frame(image, overrides, profile="stream_detect")
+    return [(*p["bbox"], p["det_conf"]) for p in frame["plates"]]
+
+
+def read_plate_texts(image, boxes):
+    """OCR every box in one batch; returns [(text, ocr_confidence)] aligned with boxes"""
+    if not boxes:
+        return []
+    frame = _frame(image)
+    frame["plates"] = [{"bbox": (x1, y1, x2, y2), "det_conf": conf} for x1, y1, x2, y2, conf in boxes]
+    get_detection_pipeline("stream_read").run([frame])
+    return [(p["text"], p["ocr_conf"]) for p in frame["plates"]]
 
-def get_model():
-    global _model
-    if _model is None:
-        logger.debug(f"[INIT] Loading YOLO model from {MODEL_PATH}")
-        _model = YOLO(MODEL_PATH)
-    return _model
 
 def detect_license_plate(image):
-    """Enhanced detection with debugging"""
-    model = get_model()
-    
+    """Best plate box, annotated with its detector confidence"""
     if image is None or image.size == 0:
         logger.error("[ERROR] Invalid input image")
         return None, image, 0.0
-    
-    logger.debug(f"[DEBUG] Processing image shape: {image.shape}")
-    
-    results = model.predict(
-    source=image,
-    imgsz=640,
-    conf=0.15,
-    iou=0.45,
-    device="cpu",
-    half=False,
-    verbose=False
-    )
 
-    
-    if not results or len(results) == 0:
-        logger.debug("[DEBUG] No results returned from model")
-        return None, image, 0.0
-    
-    result = results[0]
-    logger.debug(f"[DEBUG] Total detections: {len(result.boxes)}")
-    
-    if len(result.boxes) == 0:
-        logger.debug("[DEBUG] No boxes detected")
-        return None, image, 0.0
-    
-    best_plate = None
-    best_confidence = 0
-    best_box = None
-    
-    for i, box in enumerate(result.boxes):
-        confidence = float(box.conf[0])
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        
-        logger.debug(f"[DEBUG] Box {i}: conf={confidence:.3f}, coords=({x1},{y1},{x2},{y2})")
-        
-        if x2 <= x1 or y2 <= y1:
-            continue
-        
-        width = x2 - x1
-        height = y2 - y1
-        if width < 20 or height < 10:
-            continue
-        
-        if confidence > best_confidence:
-            cropped_plate = image[y1:y2, x1:x2]
-            if cropped_plate.size > 0:
-                best_plate = cropped_plate
-                best_confidence = confidence
-                best_box = (x1, y1, x2, y2)
-    
-    if best_plate is None:
+    boxes = find_plate_boxes(image)
+    if not boxes:
         logger.debug("[DEBUG] No valid plates found after filtering")
         return None, image, 0.0
     
-    x1, y1, x2, y2 = best_box
+    x1, y1, x2, y2, best_confidence = boxes[0]
+    best_plate = image[y1:y2, x1:x2]
     cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
     cv2.putText(image, f"{best_confidence:.2f}", (x1, y1-10),
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
@@ -115,39 +68,18 @@ def detect_license_plate(image):
 
 def extract_text_with_easyocr(image):
     """Extract text from license plate image using EasyOCR"""
-    ocr = get_ocr_engine()
-    
     if image is None or image.size == 0:
         logger.debug(" Invalid image for OCR")
         return []
     
     logger.debug(f"OCR input shape: {image.shape}")
     
-    # EasyOCR works better with grayscale for license plates
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    
-    # Enhance image
-    h, w = gray.shape[:2]
-    
-    # Resize if too small
-    if h < 32:
-        scale = 32 / h
-        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
-        logger.debug(f"[DEBUG] Resized to: {gray.shape}")
-    
-    # Apply CLAHE
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-    enhanced = clahe.apply(gray)
+    # Grayscale + CLAHE, returned as RGB for EasyOCR
+    enhanced_rgb = get_pipeline("clahe").run(image)
     
     try:
-        # EasyOCR expects RGB
-        enhanced_rgb = cv2.cvtColor(enhanced, cv2.COLOR_GRAY2RGB)
-        
         # Run OCR
-        results = ocr.readtext(enhanced_rgb, detail=1)
+        results = get_easy_reader().readtext(enhanced_rgb, detail=1)
         
         if not results:
             logger.debug("OCR returned no results")
@@ -170,26 +102,17 @@ def extract_text_with_easyocr(image):
 
 
 def process_license_plate(image):
-    logger.debug("[PIPELINE] Processing frame")
-    """Process single image for license plate detection and OCR"""
-    plate, detected_image, confidence = detect_license_plate(image)
-    
-    if plate is None:
-        return None, detected_image, None, 0.0
-    
-    # ocr_texts = extract_text_with_easyocr(plate)
-    
-    # if not ocr_texts:
-    #     return None, detected_image, None, confidence
-    ocr = get_ocr_engine()
-    text, conf = ocr.read_plate(plate)
-    formatted_text = text
-    
-    cv2.putText(detected_image, formatted_text, (10, 30),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2, cv2.LINE_AA)
-    
-    logger.info(f"[RESULT] Plate: {formatted_text}")
-    return plate, detected_image, formatted_text, confidence
+    """Single image: (best crop, annotated image, best text, best detector confidence)"""
+    if image is None or image.size == 0:
+        return None, image, None, 0.0
+
+    frame = process_frame(image)
+    if not frame["plates"]:
+        return None, frame["annotated"], None, 0.0
+
+    best = frame["plates"][0]
+    logger.info(f"[RESULT] Plate: {best['text']}")
+    return best["crop"], frame["annotated"], best["text"], best["det_conf"]
 
 
 def process_video(input_path, output_path):
@@ -0,0 +1,251 @@
+import asyncio
+import json
+import os
+import socket
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import EVENT_REPLAY_SIZE, EVENT_SUBSCRIBER_QUEUE, EVENT_SYNC_SEC
+from app.shared_state import get_shared_state, run_state
+
+REPLAY_KEY = "events"
+# Identifies this worker's entries in a shared replay buffer
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Event:
+    """A published event; serialized once and shared by every subscriber"""
+
+    __slots__ = ("id", "type", "data", "priority", "_json", "_sse")
+
+    def __init__(self, event_id, event_type, data, priority=False):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.priority = priority
+        self._json = None
+        self._sse = None
+
+    @property
+    def json(self):
+        if self._json is None:
+            self._json = json.dumps({"id": self.id, "type": self.type, "data": self.data})
+        return self._json
+
+    @property
+    def sse(self):
+        if self._sse is None:
+            self._sse = f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data)}\n\n"
+        return self._sse
+
+
+def _event(item):
+    return Event(item["id"], item["type"], item["data"], item.get("priority", False))
+
+
+class Subscription:
+    def __init__(self, source=None, camera_id=None, plate_prefix=None, types=None):
+        self.source = source
+        self.camera_id = camera_id
+        self.plate_prefix = plate_prefix.upper() if plate_prefix else None
+        self.types = set(types) if types else None
+        self.dropped = 0
+        self._held = None  # live events that arrive while a replay is read
+        self._replayed = frozenset()  # ids already queued by resume(); later live copies are skipped
+        self._normal = deque()
+        self._priority = deque()
+        self._ready = asyncio.Event()
+
+    def matches(self, event: Event):
+        data = event.data
+        if self.types and event.type not in self.types:
+            return False
+        if self.source and data.get("source") != self.source:
+            return False
+        if self.camera_id and data.get("camera_id") != self.camera_id:
+            return False
+        if self.plate_prefix and not (data.get("plate_number") or "").startswith(self.plate_prefix):
+            return False
+        return True
+
+    def hold(self):
+        """Buffer live events until resume(); the subscription can be registered before its replay is read"""
+        self._held = []
+
+    def resume(self, replay):
+        """Queue the replayed events, then the live ones held meanwhile, each id once"""
+        held, self._held = self._held or [], None
+        seen = set()
+        for event in [*replay, *held]:
+            if event.id not in seen:
+                seen.add(event.id)
+                self.offer(event)
+        # A shared backend stores an event before its live delivery reaches the loop
+        self._replayed = frozenset(seen)
+
+    def offer(self, event: Event):
+        if event.id in self._replayed:
+            return
+        if self._held is not None:
+            self._held.append(event)
+            return
+        if event.priority:
+            # Priority events (e.g. watchlist hits) are never dropped and jump the queue
+            self._priority.append(event)
+        else:
+            if len(self._normal) >= EVENT_SUBSCRIBER_QUEUE:
+                # Slow consumer: lose its oldest event instead of stalling publishers
+                self._normal.popleft()
+                self.dropped += 1
+            self._normal.append(event)
+        self._ready.set()
+
+    async def get(self, timeout=None):
+        while not (self._priority or self._normal):
+            self._ready.clear()
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        return self._priority.popleft() if self._priority else self._normal.popleft()
+
+
+class EventBus:
+    """
+    Pub/sub for detection and alert events.
+
+    Event ids and the bounded replay buffer (for Last-Event-ID resumes)
+    live in the shared state backend. With a shared backend, each worker
+    also polls the buffer and delivers events published by other workers
+    to its own subscribers. Publishing is safe from executor threads;
+    delivery always happens on the event loop the bus was bound to.
+
+    With a shared backend, ids and replay appends are written by one
+    thread of the bus's own (so in publish order), never on the event loop.
+    """
+
+    def __init__(self, replay_size=EVENT_REPLAY_SIZE, state=None, origin=ORIGIN):
+        self._replay_size = replay_size
+        self._state = state
+        self.origin = origin
+        self._subscribers = set()
+        self._last_id = 0
+        self._loop = None
+        self._sync_task = None
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="events")
+
+    @property
+    def state(self):
+        if self._state is None:
+            self._state = get_shared_state()
+        return self._state
+
+    def bind(self, loop):
+        self._loop = loop
+        if self.state.shared and self._sync_task is None:
+            self._sync_task = loop.create_task(self._sync())
+
+    def stop(self):
+        if self._sync_task:
+            self._sync_task.cancel()
+            self._sync_task = None
+
+    def publish(self, event_type, data, priority=False):
+        if self.state.shared and self._loop is not None:
+            self._writer.submit(self._store, event_type, data, priority)
+            return
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if self._loop is None or running is self._loop:
+            self._dispatch(event_type, data, priority)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, event_type, data, priority)
+
+    def _record(self, event_type, data, priority):
+        event = Event(self.state.incr("events:last_id"), event_type, data, priority)
+        self.state.append(REPLAY_KEY, {
+            "id": event.id,
+            "type": event_type,
+            "data": data,
+            "priority": priority,
+            "origin": self.origin,
+        }, self._replay_size)
+        return event
+
+    def _dispatch(self, event_type, data, priority=False):
+        self._deliver(self._record(event_type, data, priority))
+
+    def _store(self, event_type, data, priority):
+        """Writer thread: persist to the shared backend, then deliver on the loop"""
+        try:
+            event = self._record(event_type, data, priority)
+        except Exception as e:
+            print("[EVENTS] Publish failed:", e)
+            return
+        self._loop.call_soon_threadsafe(self._deliver, event)
+
+    def _deliver(self, event: Event):
+        self._last_id = max(self._last_id, event.id)
+        for sub in self._subscribers:
+            if sub.matches(event):
+                sub.offer(event)
+
+    async def _sync(self):
+        """Deliver events that other workers appended to the shared buffer"""
+        seen = None
+
+        while True:
+            try:
+                items = await run_state(self.state.items, REPLAY_KEY)
+            except Exception as e:
+                print("[EVENTS] Sync failed:", e)
+                items = None
+
+            if items is not None:
+                # Ids are allocated before appending, so they may land slightly
+                # out of order; track the whole window rather than a high-water mark
+                if seen is not None:
+                    for item in items:
+                        if item["id"] not in seen and item["origin"] != self.origin:
+                            self._deliver(_event(item))
+                seen = {item["id"] for item in items}
+
+            await asyncio.sleep(EVENT_SYNC_SEC)
+
+    async def subscribe(self, last_event_id=None, **filters) -> Subscription:
+        sub = Subscription(**filters)
+        if last_event_id is None:
+            self._subscribers.add(sub)
+            return sub
+
+        # Registered before the replay is read, so nothing published while
+        # it is read falls in between; duplicates are dropped by id
+        sub.hold()
+        self._subscribers.add(sub)
+        try:
+            replay = await self.recent()
+        except BaseException:
+            self._subscribers.discard(sub)
+            raise
+        sub.resume([e for e in replay if e.id > last_event_id and sub.matches(e)])
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+
+    async def recent(self, limit=None):
+        events = [_event(item) for item in await run_state(self.state.items, REPLAY_KEY)]
+        return events[-limit:] if limit else events
+
+    async def stats(self):
+        return {
+            "backend": self.state.name,
+            "last_event_id": self._last_id,
+            "buffered": len(await run_state(self.state.items, REPLAY_KEY)),
+            "subscribers": len(self._subscribers),
+            "dropped": sum(s.dropped for s in self._subscribers),
+        }
+
+
+event_bus = EventBus()
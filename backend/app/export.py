@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.models import Detection
+
+EXPORT_COLUMNS = [
+    "id", "plate_number", "confidence", "source", "timestamp",
+    "camera_id", "image_path", "video_timestamp",
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def history_filters(source=None, camera_id=None, plate=None, start=None, end=None, min_confidence=None):
+    """WHERE conditions shared by /history, /history/export and the export CLI"""
+    det = Detection.__table__
+    conditions = []
+    if source:
+        conditions.append(det.c.source == source)
+    if camera_id:
+        conditions.append(det.c.camera_id == camera_id)
+    if plate:
+        conditions.append(det.c.plate_number.like(f"{plate.upper()}%"))
+    if start:
+        conditions.append(det.c.timestamp >= start)
+    if end:
+        conditions.append(det.c.timestamp < end)
+    if min_confidence is not None:
+        conditions.append(det.c.confidence >= min_confidence)
+    return conditions
+
+
+def iter_row_chunks(conditions, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of detection rows in id order.
+
+    Rows come off a server-side cursor (`yield_per`), so memory stays at one
+    chunk regardless of how much history matches.
+    """
+    det = Detection.__table__
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            select(*[det.c[col] for col in EXPORT_COLUMNS])
+            .where(*conditions)
+            .order_by(det.c.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        for chunk in result.partitions():
+            yield chunk
+    finally:
+        db.close()
+
+
+def _value(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+# ---------- CSV ----------
+def csv_stream(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+
+    for chunk in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_value(v) for v in row] for row in chunk)
+        yield buffer.getvalue().encode()
+
+
+# ---------- NDJSON ----------
+def ndjson_stream(chunks):
+    for chunk in chunks:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_value, row)))) + "\n"
+            for row in chunk
+        ).encode()
+
+
+# ---------- Parquet ----------
+class _Drain:
+    """Write-only sink for ParquetWriter; bytes are handed out as they are produced"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_stream(chunks):
+    """One row group per chunk; the footer is written when the cursor is exhausted"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("plate_number", pa.string()),
+        ("confidence", pa.float64()),
+        ("source", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("camera_id", pa.string()),
+        ("image_path", pa.string()),
+        ("video_timestamp", pa.float64()),
+    ])
+
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            writer.write_table(pa.table(
+                {col: list(values) for col, values in zip(EXPORT_COLUMNS, columns)},
+                schema=schema
+            ))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+FORMATS = {
+    "csv": ("text/csv", csv_stream),
+    "ndjson": ("application/x-ndjson", ndjson_stream),
+    "parquet": ("application/vnd.apache.parquet", parquet_stream),
+}
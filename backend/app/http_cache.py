@@ -0,0 +1,88 @@
+import json
+from collections import OrderedDict
+from threading import Lock
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app import changes
+from app.config import HTTP_CACHE_ENTRIES
+
+
+class ResponseCache:
+    """
+    Conditional GET plus a small in-process cache for read routes whose
+    output depends only on the detections table (and its rollups).
+
+    A request carrying the current ETag gets 304 without any other query.
+    There is no Last-Modified: inserts move the token without touching a
+    timestamp, and whole-second dates could not tell apart two changes in
+    the same second anyway. Otherwise the serialized body
+    is reused while the change token is unchanged. The token is read from
+    the database on every request (app.changes.token, one indexed query), so
+    commits from other workers and tools invalidate it too; entries are also
+    dropped as soon as this process commits a change.
+    """
+
+    def __init__(self, max_entries=HTTP_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (path, query) -> (etag, body)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        changes.on_change(self.invalidate)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    async def respond(self, request: Request, build, db):
+        """build: async callable returning the JSON-able response data; db: the route's AsyncSession"""
+        etag = await changes.token(db)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",  # always revalidate; 304s are cheap
+        }
+
+        if self._is_fresh(request, etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return Response(entry[1], media_type="application/json", headers=headers)
+
+        self.misses += 1
+        body = json.dumps(jsonable_encoder(await build())).encode()
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def _is_fresh(self, request, etag):
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return False
+        # Weak comparison, as RFC 9110 asks for If-None-Match
+        return any(tag.strip().removeprefix("W/") == etag.removeprefix("W/")
+                   for tag in if_none_match.split(",")) or if_none_match.strip() == "*"
+
+    def stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,196 @@
+from collections import defaultdict
+from threading import Lock
+
+import cv2
+import numpy as np
+
+# libjpeg-turbo through PyTurboJPEG when it is installed (and the shared
+# library can be found); OpenCV's codec otherwise.
+try:
+    from turbojpeg import TurboJPEG, tjMCUHeight, tjMCUWidth
+    turbo = TurboJPEG()
+except Exception:
+    turbo = None
+
+ENCODER = "turbojpeg" if turbo is not None else "opencv"
+
+# DCT-domain downscaling OpenCV (and libjpeg-turbo) can do while decoding
+REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def encode_jpeg(image, quality=90) -> bytes:
+    if turbo is not None:
+        return turbo.encode(image, quality=quality)
+    _, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+def jpeg_size(data):
+    """(width, height) from the JPEG frame header without decoding; None if data is not a JPEG"""
+    buf = memoryview(data)
+    n = len(buf)
+    if n < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 9 < n:
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length
+            i += 2
+            continue
+        # SOF0..SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = (buf[i + 5] << 8) | buf[i + 6]
+            width = (buf[i + 7] << 8) | buf[i + 8]
+            return width, height
+        i += 2 + ((buf[i + 2] << 8) | buf[i + 3])
+    return None
+
+
+def jpeg_orientation(data):
+    """
+    EXIF orientation tag (1-8) from the APP1 segment; 1 when there is
+    none. Anything but 1 means the decoder rotates or flips the pixels,
+    so the frame header size and box coordinates no longer line up.
+    """
+    buf = bytes(data[:65536])
+    n = len(buf)
+    if n < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return 1
+
+    i = 2
+    while i + 4 <= n:
+        if buf[i] != 0xFF:
+            return 1
+        marker = buf[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0xDA or 0xC0 <= marker <= 0xCF:  # scan or frame header: no EXIF ahead
+            return 1
+        length = (buf[i + 2] << 8) | buf[i + 3]
+        if marker == 0xE1 and buf[i + 4:i + 10] == b"Exif\0\0":
+            return _exif_orientation(buf[i + 10:i + 2 + length])
+        i += 2 + length
+    return 1
+
+
+def _exif_orientation(tiff):
+    """Orientation (tag 0x0112) from IFD0 of a TIFF block"""
+    order = {b"II": "little", b"MM": "big"}.get(tiff[:2])
+    if order is None or len(tiff) < 8:
+        return 1
+    ifd = int.from_bytes(tiff[4:8], order)
+    if ifd + 2 > len(tiff):
+        return 1
+    for k in range(int.from_bytes(tiff[ifd:ifd + 2], order)):
+        entry = ifd + 2 + 12 * k
+        if entry + 12 > len(tiff):
+            break
+        if int.from_bytes(tiff[entry:entry + 2], order) == 0x0112:
+            value = int.from_bytes(tiff[entry + 8:entry + 10], order)
+            return value if 1 <= value <= 8 else 1
+    return 1
+
+
+def reduction_for(data, target):
+    """
+    Largest 1/2, 1/4, 1/8 decode factor that keeps the long side >= target
+    (1 if none). Rotated JPEGs (EXIF orientation) always get 1: the reduced
+    decoders do not apply the orientation the full decode does.
+    """
+    size = jpeg_size(data)
+    if size is None or jpeg_orientation(data) != 1:
+        return 1
+    long_side = max(size)
+    for factor in (8, 4, 2):
+        if long_side // factor >= target:
+            return factor
+    return 1
+
+
+def decode(data, factor=1, flags=cv2.IMREAD_COLOR):
+    """Encoded bytes -> BGR image, optionally scaled down by `factor` while decoding"""
+    if factor > 1:
+        if turbo is not None:
+            try:
+                return turbo.decode(data, scaling_factor=(1, factor))
+            except Exception:
+                pass
+        flags = REDUCED_FLAGS[factor]
+    return cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+
+
+def decode_region(data, x1, y1, x2, y2):
+    """
+    Full-resolution pixels of one box, decoding only the MCU blocks that
+    cover it (lossless crop, libjpeg-turbo only, unrotated JPEGs). None
+    when that is not possible; callers then fall back to a full decode.
+    """
+    if turbo is None or jpeg_orientation(data) != 1:
+        return None
+    try:
+        width, height, subsample, _ = turbo.decode_header(data)
+        mcu_w, mcu_h = tjMCUWidth[subsample], tjMCUHeight[subsample]
+        # Partial blocks at the right/bottom edge cannot be cropped losslessly
+        if x2 > width - width % mcu_w or y2 > height - height % mcu_h:
+            return None
+        ax, ay = x1 - x1 % mcu_w, y1 - y1 % mcu_h
+        part = turbo.decode(turbo.crop(data, ax, ay, x2 - ax, y2 - ay, preserve=True))
+        crop = part[y1 - ay:y2 - ay, x1 - ax:x2 - ax]
+        return crop if crop.shape[:2] == (y2 - y1, x2 - x1) else None
+    except Exception:
+        return None
+
+
+class ScratchPool:
+    """
+    Reusable uint8 arrays keyed by shape, for per-frame scratch images
+    (resize targets and the like) that would otherwise be allocated and
+    freed on every frame. Decoded frames are not pooled: cv2.imdecode
+    cannot write into a caller's array. Only give() back arrays nothing
+    else refers to.
+    """
+
+    def __init__(self, per_shape=4):
+        self.per_shape = per_shape
+        self.hits = 0
+        self.misses = 0
+        self._free = defaultdict(list)
+        self._lock = Lock()
+
+    def take(self, shape):
+        shape = tuple(shape)
+        with self._lock:
+            free = self._free.get(shape)
+            if free:
+                self.hits += 1
+                return free.pop()
+            self.misses += 1
+        return np.empty(shape, np.uint8)
+
+    def give(self, array):
+        with self._lock:
+            free = self._free[array.shape]
+            if len(free) < self.per_shape:
+                free.append(array)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "pooled": sum(len(v) for v in self._free.values()),
+            }
+
+
+scratch_pool = ScratchPool()
@@ -2,15 +2,26 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+import asyncio
 import os
 
-from app.routers import image, history, video
-from app.database import engine
-from app.models import Base
-from app.config import COUNTRY_CONFIG
+from app.routers import image, history, video, cameras, events, stats, retention, debug, watchlist as watchlist_router
+from app.database import async_engine
+from app.config import COUNTRY_CONFIG, CAMERAS_AUTOSTART, RETENTION_ENABLED
+from app.cameras import camera_scheduler, start_enabled_cameras
+from app.events import event_bus
+from app.watchlist import watchlist
+from app.retention import retention_service
+from app.admission import admission
+from app.schema import init_db  # also registers the commit and rollup flush listeners
+from app.http_cache import response_cache
+from app.upload_cache import upload_cache
+from app.detector.engine import pipeline_costs
+from app.detector.ocr import get_plate_ocr
+from app.detector.lifecycle import model_manager
 
 # ---------- DB ----------
-Base.metadata.create_all(bind=engine)
+init_db()
 
 # ---------- PATHS ----------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -43,6 +54,64 @@ app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 app.include_router(image.router, prefix="/detect", tags=["Detection"])
 app.include_router(video.router, prefix="/ws", tags=["WebSocket"])
 app.include_router(history.router, prefix="/history", tags=["History"])
+app.include_router(cameras.router, prefix="/cameras", tags=["Cameras"])
+app.include_router(events.router, prefix="/events", tags=["Events"])
+app.include_router(stats.router, prefix="/stats", tags=["Stats"])
+app.include_router(watchlist_router.router, prefix="/watchlist", tags=["Watchlist"])
+app.include_router(retention.router, prefix="/retention", tags=["Retention"])
+app.include_router(debug.router, prefix="/debug", tags=["Debug"])
+
+# ---------- EVENTS ----------
+@app.on_event("startup")
+async def bind_event_bus():
+    event_bus.bind(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+async def stop_event_bus():
+    event_bus.stop()
+
+# ---------- WATCHLIST ----------
+@app.on_event("startup")
+async def load_watchlists():
+    await asyncio.get_running_loop().run_in_executor(None, watchlist.start)
+
+@app.on_event("shutdown")
+async def stop_watchlists():
+    watchlist.stop()
+
+# ---------- RETENTION ----------
+@app.on_event("startup")
+async def start_retention():
+    if RETENTION_ENABLED:
+        retention_service.start()
+
+@app.on_event("shutdown")
+async def stop_retention():
+    retention_service.stop()
+
+# ---------- CAMERAS ----------
+@app.on_event("startup")
+async def start_cameras():
+    if CAMERAS_AUTOSTART:
+        start_enabled_cameras()
+
+@app.on_event("shutdown")
+async def stop_cameras():
+    await camera_scheduler.stop()
+
+# ---------- MODELS ----------
+@app.on_event("startup")
+async def start_model_reaper():
+    model_manager.start()
+
+@app.on_event("shutdown")
+async def stop_model_reaper():
+    model_manager.stop()
+
+# ---------- DB ----------
+@app.on_event("shutdown")
+async def close_async_db():
+    await async_engine.dispose()
 
 # ---------- COUNTRY CONFIG ----------
 class CountryConfigRequest(BaseModel):
@@ -68,14 +137,41 @@ async def root():
     return {
         "message": "RoadEye LPR API",
         "version": "1.0.0",
-        "country": COUNTRY_CONFIG.get(),
+        "country": await COUNTRY_CONFIG.get_async(),
         "endpoints": {
             "image_detection": "/detect/image",
+            "batch_detection": "/detect/batch",
             "video_stream": "/ws/video",
-            "history": "/history"
+            "cameras": "/cameras",
+            "events": "/events/stream",
+            "history": "/history",
+            "stats": "/stats"
         }
     }
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/admission")
+async def admission_stats():
+    return admission.stats()
+
+@app.get("/health/cache")
+async def cache_stats():
+    return {**response_cache.stats(), "uploads": upload_cache.stats()}
+
+@app.get("/health/pipeline")
+async def pipeline_stats():
+    """Per-profile, per-stage cost of the detection engine since startup"""
+    return pipeline_costs()
+
+@app.get("/health/ocr")
+async def ocr_stats():
+    """Early-exit OCR cascade: crops settled per level and OCR calls per crop"""
+    return get_plate_ocr().stats()
+
+@app.get("/health/models")
+async def model_stats():
+    """Loaded models, their estimated size, load/unload counts and process RSS"""
+    return model_manager.stats()
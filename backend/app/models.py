@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -11,10 +11,106 @@ class Detection(Base):
     id = Column(Integer, primary_key=True, index=True)
     plate_number = Column(String, index=True)
     confidence = Column(Float)
-    source = Column(String)  # "image", "video", or "live"
+    source = Column(String)  # "image", "video", "live" or "camera"
     timestamp = Column(DateTime, default=datetime.utcnow)
     image_path = Column(String, nullable=True)  # Path to saved image
     video_timestamp = Column(Float, nullable=True)  # For video detections
+    camera_id = Column(String, nullable=True, index=True)  # For server-side camera detections
     
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "plate_number": self.plate_number,
+            "confidence": self.confidence,
+            "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+            "source": self.source,
+            "camera_id": self.camera_id,
+            "image_path": self.image_path,
+            "video_timestamp": self.video_timestamp,
+        }
+
+    def __repr__(self):
+        return f"<Detection(plate={self.plate_number}, conf={self.confidence:.2f}, source={self.source})>"
+
+
+class Camera(Base):
+    __tablename__ = "cameras"
+
+    id = Column(String, primary_key=True)  # e.g. "gate-1"
+    name = Column(String, nullable=True)
+    source = Column(String)  # RTSP/HTTP URL, device index or local file path
+    priority = Column(Float, default=1.0)  # share of inference capacity relative to other cameras
+    max_fps = Column(Float, default=5.0)  # frames per second sent to the detector
+    enabled = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
     def __repr__(self):
-        return f"<Detection(plate={self.plate_number}, conf={self.confidence:.2f}, source={self.source})>"
\ No newline at end of file
+        return f"<Camera(id={self.id}, source={self.source}, priority={self.priority})>"
+
+
+# ---------- UPLOAD CACHE ----------
+# /detect/image results keyed by a hash of the uploaded bytes (app.upload_cache)
+
+class UploadResult(Base):
+    __tablename__ = "upload_results"
+
+    content_hash = Column(String, primary_key=True)
+    version = Column(String)  # models + OCR/country settings the result was produced with
+    result = Column(Text)  # JSON: detections, image_path, thumbnail_path
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used = Column(DateTime, default=datetime.utcnow, index=True)
+    hits = Column(Integer, default=0)
+
+
+# ---------- ROLLUPS ----------
+# Maintained incrementally by app.rollups on every insert/delete of a Detection
+
+class PlateSummary(Base):
+    __tablename__ = "plates"
+
+    plate_number = Column(String, primary_key=True)
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime, index=True)
+    sightings = Column(Integer, default=0)
+    best_confidence = Column(Float)
+    last_source = Column(String, nullable=True)
+    last_camera_id = Column(String, nullable=True)
+
+    def to_dict(self):
+        return {
+            "plate_number": self.plate_number,
+            "first_seen": self.first_seen.isoformat() if self.first_seen else None,
+            "last_seen": self.last_seen.isoformat() if self.last_seen else None,
+            "sightings": self.sightings,
+            "best_confidence": self.best_confidence,
+            "last_source": self.last_source,
+            "last_camera_id": self.last_camera_id,
+        }
+
+
+class HourlyStat(Base):
+    __tablename__ = "hourly_stats"
+
+    hour = Column(DateTime, primary_key=True)  # detection timestamp truncated to the hour (UTC)
+    source = Column(String, primary_key=True)
+    detections = Column(Integer, default=0)
+    confidence_sum = Column(Float, default=0.0)
+
+    def to_dict(self):
+        return {
+            "hour": self.hour.isoformat(),
+            "source": self.source,
+            "detections": self.detections,
+            "avg_confidence": (self.confidence_sum / self.detections) if self.detections else None,
+        }
+
+
+# ---------- CHANGE TOKENS ----------
+# One row per table served with conditional GET (app.changes), bumped in the
+# same transaction as every delete, in-place update or rebuild of that table
+
+class TableChange(Base):
+    __tablename__ = "table_changes"
+
+    name = Column(String, primary_key=True)
+    revision = Column(Integer, default=0)
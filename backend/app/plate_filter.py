@@ -0,0 +1,15 @@
+import time
+
+from app.shared_state import get_shared_state, run_state
+
+# Shared by the websocket streams and the server-side cameras
+
+# Plates read below this confidence are neither reported nor saved
+CONF_THRESHOLD = 0.2
+# The same plate is saved at most once per window
+DEDUP_WINDOW_SEC = 5
+
+
+async def should_save_plate(plate):
+    """Deduplicate plate saves to protect DB (atomic across workers with a shared backend)"""
+    return await run_state(get_shared_state().set_if_absent, f"dedup:{plate}", time.time(), DEDUP_WINDOW_SEC)
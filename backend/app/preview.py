@@ -0,0 +1,151 @@
+import asyncio
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from app.jpeg import ENCODER, encode_jpeg
+from app.config import (
+    PREVIEW_MAX_WIDTH,
+    PREVIEW_MIN_QUALITY,
+    PREVIEW_MIN_WIDTH,
+    PREVIEW_QUALITY,
+    PREVIEW_TARGET_MS,
+    PREVIEW_WORKERS,
+)
+
+_executor = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix="preview")
+
+
+def render_preview(image, width, quality) -> str:
+    """Downscale to `width` (never up) and JPEG-encode; returns base64 text for JSON messages"""
+    h, w = image.shape[:2]
+    if w > width:
+        image = cv2.resize(image, (width, max(1, int(h * width / w))), interpolation=cv2.INTER_AREA)
+    return base64.b64encode(encode_jpeg(image, quality)).decode("ascii")
+
+
+def _multiple_of_16(width):
+    return max(16, int(width) // 16 * 16)
+
+
+def _as_int(value):
+    """Client-supplied number (query string or JSON); None when missing or not a number"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class PreviewEncoder:
+    """
+    Preview settings for one websocket client.
+
+    Frames are downscaled to `width` and encoded at `quality` on the preview
+    pool. After every send, the time spent encoding and sending is compared
+    with the target: over it, quality drops first and then width; with
+    plenty of headroom both climb back, one step every few frames, up to
+    the limits the client asked for.
+    """
+
+    QUALITY_STEP = 10
+    WIDTH_FACTOR = 0.75
+    RECOVER_EVERY = 10
+
+    def __init__(self, max_width=PREVIEW_MAX_WIDTH, max_quality=PREVIEW_QUALITY, target_ms=PREVIEW_TARGET_MS):
+        self.max_width = _multiple_of_16(max_width)
+        self.max_quality = max_quality
+        self.width = self.max_width
+        self.quality = max_quality
+        self.target_sec = target_ms / 1000
+
+        self.frames = 0
+        self.bytes = 0
+        self._encode_sec = 0.0  # EWMA
+        self._send_sec = 0.0  # EWMA
+        self._bandwidth = 0.0  # EWMA, bytes/s
+        self._last_encode = 0.0
+        self._last_size = 0
+        self._good = 0
+
+    @classmethod
+    def from_params(cls, params):
+        """?preview_width=480&preview_quality=60 on the websocket URL"""
+        encoder = cls()
+        encoder.configure(params.get("preview_width"), params.get("preview_quality"))
+        return encoder
+
+    def configure(self, width=None, quality=None):
+        """Client-requested limits; adaptation stays at or below them. Values that are not numbers are ignored"""
+        width, quality = _as_int(width), _as_int(quality)
+        if width:
+            self.max_width = _multiple_of_16(max(PREVIEW_MIN_WIDTH, min(int(width), PREVIEW_MAX_WIDTH)))
+            self.width = min(self.width, self.max_width) if self.frames else self.max_width
+        if quality:
+            self.max_quality = max(PREVIEW_MIN_QUALITY, min(int(quality), 95))
+            self.quality = min(self.quality, self.max_quality) if self.frames else self.max_quality
+
+    # ---------- encode / send ----------
+    async def encode(self, image, shared=None) -> str:
+        """
+        Encode on the preview pool. `shared` is an optional dict reused by
+        viewers of the same frame, so equal settings are encoded once.
+        """
+        key = (self.width, self.quality)
+        if shared is not None and key in shared:
+            self._last_encode = 0.0
+        else:
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            text = await loop.run_in_executor(_executor, render_preview, image, self.width, self.quality)
+            self._last_encode = time.perf_counter() - start
+            self._encode_sec = 0.8 * self._encode_sec + 0.2 * self._last_encode
+            if shared is None:
+                self._last_size = len(text)
+                return text
+            shared[key] = text
+        self._last_size = len(shared[key])
+        return shared[key]
+
+    async def send_json(self, ws, message):
+        """Send a message carrying a preview and adapt to how long it took"""
+        start = time.perf_counter()
+        await ws.send_json(message)
+        self.record_send(time.perf_counter() - start)
+
+    def record_send(self, seconds):
+        self.frames += 1
+        self.bytes += self._last_size
+        self._send_sec = 0.8 * self._send_sec + 0.2 * seconds
+        if seconds > 0:
+            self._bandwidth = 0.8 * self._bandwidth + 0.2 * (self._last_size / seconds)
+
+        spent = self._last_encode + seconds
+        if spent > self.target_sec:
+            self._good = 0
+            if self.quality > PREVIEW_MIN_QUALITY:
+                self.quality = max(PREVIEW_MIN_QUALITY, self.quality - self.QUALITY_STEP)
+            else:
+                self.width = _multiple_of_16(max(PREVIEW_MIN_WIDTH, self.width * self.WIDTH_FACTOR))
+        elif spent < self.target_sec / 2:
+            self._good += 1
+            if self._good >= self.RECOVER_EVERY:
+                self._good = 0
+                # Undo in reverse order: width was the last thing given up
+                if self.width < self.max_width:
+                    self.width = min(self.max_width, _multiple_of_16(self.width / self.WIDTH_FACTOR))
+                elif self.quality < self.max_quality:
+                    self.quality = min(self.max_quality, self.quality + self.QUALITY_STEP // 2)
+
+    def stats(self):
+        return {
+            "encoder": ENCODER,
+            "width": self.width,
+            "quality": self.quality,
+            "frames": self.frames,
+            "kb_sent": round(self.bytes / 1024, 1),
+            "avg_encode_ms": round(self._encode_sec * 1000, 2),
+            "avg_send_ms": round(self._send_sec * 1000, 2),
+            "bandwidth_kbps": round(self._bandwidth * 8 / 1000, 1),
+        }
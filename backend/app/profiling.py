@@ -0,0 +1,218 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Leaf frames of threads that are parked, not working (pool workers waiting
+# for jobs, the event loop in select(), Event.wait, ...). Skipped by default.
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("base_events.py", "_run_once"),
+    ("socket.py", "accept"),
+}
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    In-process sampling profiler for live workers.
+
+    While a session is active, a background thread samples the stacks of
+    every thread via sys._current_frames() and counts them in collapsed
+    form ("root;child;leaf count"), ready for flamegraph.pl or speedscope.
+    When no session is active the only cost is one attribute check per
+    inference call, in tick().
+    """
+
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._frames_target = 0
+        self._frames_seen = 0
+
+        self._torch_active = False
+        self._torch_lock = threading.Lock()  # held by the one inference call being profiled
+        self._torch_ops = {}  # op name -> [calls, self cpu us, total cpu us]
+        self._torch_calls = 0
+        self._torch_error = None
+
+    # ---------- hot path ----------
+    def tick(self):
+        """Called once per processed frame/upload; counts toward a frames-limited session"""
+        if self.active:
+            self._frames_seen += 1
+            if self._frames_target and self._frames_seen >= self._frames_target:
+                self._stop.set()
+
+    def torch_ops(self):
+        """
+        Wraps one inference call (DetectionPipeline.run). torch's profiler
+        only records ops on the thread that started it, so the session does
+        not start one itself: while it asks for torch tables, inference
+        calls profile themselves on their own threads, one at a time (calls
+        overlapping a profiled one run unprofiled), and their op totals are
+        merged. Outside such a session this is one attribute check.
+        """
+        if not self._torch_active or not self._torch_lock.acquire(blocking=False):
+            return nullcontext()
+        return self._profile_call()
+
+    @contextmanager
+    def _profile_call(self):
+        try:
+            try:
+                import torch.profiler
+                prof = torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU])
+                prof.start()
+            except Exception as e:
+                self._torch_error = str(e) or "torch profiler unavailable"
+                prof = None
+            try:
+                yield
+            finally:
+                if prof is not None:
+                    try:
+                        prof.stop()
+                        self._merge_torch(prof.key_averages())
+                    except Exception as e:
+                        self._torch_error = str(e)
+        finally:
+            self._torch_lock.release()
+
+    def _merge_torch(self, averages):
+        for evt in averages:
+            op = self._torch_ops.setdefault(evt.key, [0, 0.0, 0.0])
+            op[0] += evt.count
+            op[1] += evt.self_cpu_time_total
+            op[2] += evt.cpu_time_total
+        self._torch_calls += 1
+
+    # ---------- sessions ----------
+    def run(self, seconds=10.0, frames=0, interval=0.005, include_idle=False, memory=False, torch_ops=False):
+        """Profile until `frames` inference calls have completed or `seconds` pass; blocking"""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("a profiling session is already running")
+
+        try:
+            self._stop.clear()
+            self._frames_target = frames
+            self._frames_seen = 0
+
+            started_tracemalloc = False
+            if memory:
+                import tracemalloc
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(25)
+                    started_tracemalloc = True
+
+            if torch_ops:
+                self._torch_ops, self._torch_calls, self._torch_error = {}, 0, None
+                self._torch_active = True
+
+            stacks = Counter()
+            samples = 0
+            own_id = threading.get_ident()
+            names = {}
+            self.active = True
+            start = time.perf_counter()
+            deadline = start + seconds
+
+            while not self._stop.is_set() and time.perf_counter() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()} if samples % 200 == 0 else names
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    code = frame.f_code
+                    if not include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                        continue
+
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(names.get(thread_id, str(thread_id)))
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                time.sleep(interval)
+
+            self.active = False
+            self._torch_active = False
+            elapsed = time.perf_counter() - start
+
+            result = {
+                "seconds": round(elapsed, 3),
+                "frames": self._frames_seen,
+                "samples": samples,
+                "interval_ms": interval * 1000,
+                "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+                "top_functions": self._top_functions(stacks),
+            }
+
+            if memory:
+                result["memory"] = self._memory_top(started_tracemalloc)
+            if torch_ops:
+                result["torch"] = self._torch_top()
+            return result
+
+        finally:
+            self.active = False
+            self._torch_active = False
+            self._lock.release()
+
+    def _top_functions(self, stacks, limit=25):
+        """Self (leaf) and total (inclusive) sample counts per function"""
+        own = Counter()
+        total = Counter()
+        for stack, count in stacks.items():
+            labels = stack.split(";")[1:]  # drop the thread name
+            if not labels:
+                continue
+            own[labels[-1]] += count
+            for label in set(labels):
+                total[label] += count
+        return [
+            {"function": label, "self": own[label], "total": count}
+            for label, count in total.most_common(limit)
+        ]
+
+    def _memory_top(self, stop_after, limit=20):
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        if stop_after:
+            tracemalloc.stop()
+        return [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:limit]
+        ]
+
+    def _torch_top(self, limit=25):
+        """Op totals over the profiled inference calls, most self CPU time first"""
+        with self._torch_lock:  # the last profiled call has merged
+            if not self._torch_calls and self._torch_error:
+                return {"error": self._torch_error}
+            ops = sorted(self._torch_ops.items(), key=lambda item: item[1][1], reverse=True)
+            return {
+                "calls_profiled": self._torch_calls,
+                "ops": [
+                    {"op": name, "calls": calls, "self_cpu_ms": round(own / 1000, 3), "cpu_ms": round(total / 1000, 3)}
+                    for name, (calls, own, total) in ops[:limit]
+                ],
+            }
+
+
+profiler = SamplingProfiler()
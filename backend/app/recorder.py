@@ -0,0 +1,244 @@
+import json
+import mmap
+import os
+import queue
+import secrets
+import time
+from datetime import datetime
+from threading import Lock, Semaphore, Thread
+
+import numpy as np
+
+from app.admin import authorized
+from app.config import RECORD_DIR, RECORD_DIR_MAX_MB, RECORD_MAX_MB, RECORD_QUEUE_FRAMES, RECORD_SESSIONS
+
+# ===========================
+# FORMAT
+# ===========================
+# A recorded session is three files sharing a name:
+#
+#   <name>.frames  the JPEG frames exactly as received, back to back
+#   <name>.idx     one INDEX_DTYPE record per frame: where it is in .frames,
+#                  when it arrived (seconds since the session started) and
+#                  the last frame_meta timestamp the client sent (NaN if none)
+#   <name>.json    session header: endpoint, source, query params, times, counts
+#
+# Both binary files are append-only and memory-mappable as they are.
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("arrival", "<f8"),
+    ("meta_ts", "<f8"),
+])
+
+
+# ===========================
+# WRITER
+# ===========================
+# One thread appends for every session, so frames of a session stay in
+# order. At most RECORD_QUEUE_FRAMES frames wait for it: when the disk
+# falls behind, further frames are dropped rather than held in memory.
+_queue = queue.Queue()
+_frame_slots = Semaphore(RECORD_QUEUE_FRAMES)
+_writer = None
+_writer_lock = Lock()
+
+
+def _submit(fn, *args):
+    """Run fn(*args) on the recorder thread"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = Thread(target=_write_loop, name="recorder", daemon=True)
+                _writer.start()
+    _queue.put((fn, args))
+
+
+def _write_loop():
+    while True:
+        fn, args = _queue.get()
+        try:
+            fn(*args)
+        except Exception as e:
+            print("[RECORDER] Write failed:", e)
+
+
+class DirectoryBudget:
+    """
+    RECORD_DIR_MAX_MB for this process: the directory is measured when a
+    session opens and every recorded frame is counted against what is left.
+    """
+
+    def __init__(self, directory=RECORD_DIR, max_mb=RECORD_DIR_MAX_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 2 ** 20
+        self._used = 0    # on disk at the last refresh + taken since
+        self._queued = 0  # taken but not written yet
+        self._lock = Lock()
+
+    def refresh(self):
+        """Re-measure the directory (recordings may have been deleted); True if there is room left"""
+        used = 0
+        if os.path.isdir(self.directory):
+            with os.scandir(self.directory) as entries:
+                used = sum(e.stat().st_size for e in entries if e.is_file())
+        with self._lock:
+            self._used = used + self._queued
+            return self._used < self.max_bytes
+
+    def take(self, n):
+        with self._lock:
+            if self._used + n > self.max_bytes:
+                return False
+            self._used += n
+            self._queued += n
+            return True
+
+    def written(self, n):
+        with self._lock:
+            self._queued -= n
+
+    def release(self, n):
+        """A taken frame that was dropped after all"""
+        with self._lock:
+            self._used -= n
+            self._queued -= n
+
+
+_budget = DirectoryBudget()
+
+
+class SessionRecorder:
+    """Appends the frames of one websocket session; writes happen on the recorder thread"""
+
+    def __init__(self, endpoint, source, params=None, directory=RECORD_DIR, max_mb=RECORD_MAX_MB, budget=_budget):
+        os.makedirs(directory, exist_ok=True)
+        started = datetime.utcnow()
+        self.name = f"{started:%Y%m%d-%H%M%S}-{endpoint}-{secrets.token_hex(3)}"
+        self.path = os.path.join(directory, self.name)
+        self.header = {
+            "endpoint": endpoint,
+            "source": source,
+            "params": dict(params or {}),
+            "started_at": started.isoformat(),
+        }
+        self.max_bytes = max_mb * 2 ** 20
+        self.budget = budget
+        self.frames = 0
+        self.bytes = 0
+        self.dropped = 0
+        self.truncated = False
+        self._start = time.monotonic()
+        self._frames_file = open(f"{self.path}.frames", "ab")
+        self._index_file = open(f"{self.path}.idx", "ab")
+
+    def frame(self, data, meta_ts=None):
+        """
+        Record one frame as received; silently stops once the session or
+        directory cap is reached, and drops frames the writer cannot keep up with.
+        """
+        if self.truncated:
+            return
+        if self.bytes + len(data) > self.max_bytes or not self.budget.take(len(data)):
+            self.truncated = True
+            return
+        record = np.array(
+            [(self.bytes, len(data), time.monotonic() - self._start, np.nan if meta_ts is None else meta_ts)],
+            dtype=INDEX_DTYPE,
+        )
+        if not _frame_slots.acquire(blocking=False):
+            self.budget.release(len(data))
+            self.dropped += 1
+            return
+        _submit(self._append, bytes(data), record.tobytes())
+        self.frames += 1
+        self.bytes += len(data)
+
+    def _append(self, data, record):
+        try:
+            self._frames_file.write(data)
+            self._index_file.write(record)
+        finally:
+            self.budget.written(len(data))
+            _frame_slots.release()
+
+    def close(self):
+        header = {
+            **self.header,
+            "ended_at": datetime.utcnow().isoformat(),
+            "duration_sec": round(time.monotonic() - self._start, 3),
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "dropped": self.dropped,
+            "truncated": self.truncated,
+        }
+        _submit(self._close, header)
+
+    def _close(self, header):
+        self._frames_file.close()
+        self._index_file.close()
+        with open(f"{self.path}.json", "w") as f:
+            json.dump(header, f, indent=2)
+        print(f"[RECORDER] Saved {self.name} ({header['frames']} frames, {header['bytes'] / 2 ** 20:.1f} MB)")
+
+
+def open_recorder(ws, endpoint, source):
+    """
+    A recorder for this websocket if recording is on for it, else None.
+    RECORD_SESSIONS=all records everything; with "requested", ?record=1
+    also needs ADMIN_TOKEN (X-Admin-Token header or ?admin_token=).
+    """
+    params = ws.query_params
+    if RECORD_SESSIONS != "all":
+        if RECORD_SESSIONS != "requested" or params.get("record") != "1":
+            return None
+        if not authorized(ws.headers.get("x-admin-token") or params.get("admin_token")):
+            print(f"[RECORDER] Refused ?record=1 on /{endpoint}: missing or wrong admin token")
+            return None
+    if not _budget.refresh():
+        print(f"[RECORDER] Not recording /{endpoint}: {RECORD_DIR} is over RECORD_DIR_MAX_MB")
+        return None
+    return SessionRecorder(endpoint, source, {k: v for k, v in params.items() if k != "admin_token"})
+
+
+class RecordedSession:
+    """
+    Read side: the index is loaded as a structured array and the frames
+    file is memory-mapped, so frame(i) is a zero-copy slice.
+    """
+
+    def __init__(self, path):
+        # Any of the three file names, or the shared name without extension
+        self.path = os.path.splitext(path)[0] if path.endswith((".json", ".frames", ".idx")) else path
+        header_path = f"{self.path}.json"
+        self.header = {}
+        if os.path.exists(header_path):
+            with open(header_path) as f:
+                self.header = json.load(f)
+        index_path = f"{self.path}.idx"
+        self.index = np.fromfile(index_path, dtype=INDEX_DTYPE, count=os.path.getsize(index_path) // INDEX_DTYPE.itemsize)
+        self._file = open(f"{self.path}.frames", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        # A session cut off mid-write keeps only the frames that are complete
+        if len(self.index):
+            self.index = self.index[self.index["offset"] + self.index["length"] <= size]
+
+    def __len__(self):
+        return len(self.index)
+
+    def frame(self, i):
+        entry = self.index[i]
+        return memoryview(self._map)[int(entry["offset"]):int(entry["offset"] + entry["length"])]
+
+    def __iter__(self):
+        """(arrival seconds, frame_meta timestamp or None, JPEG bytes view) per frame"""
+        for i, entry in enumerate(self.index):
+            meta_ts = None if np.isnan(entry["meta_ts"]) else float(entry["meta_ts"])
+            yield float(entry["arrival"]), meta_ts, self.frame(i)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
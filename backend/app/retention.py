@@ -0,0 +1,279 @@
+import asyncio
+import csv
+import gzip
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from threading import Lock
+
+import cv2
+from sqlalchemy import delete, exists, or_, select, update
+
+from app import changes, rollups
+from app.config import (
+    ARCHIVE_DIR,
+    RETENTION_BATCH_PAUSE_SEC,
+    RETENTION_BATCH_SIZE,
+    RETENTION_INTERVAL_SEC,
+    RETENTION_MAX_WIDTH,
+    RETENTION_POLICIES,
+    RETENTION_WEBP_QUALITY,
+)
+from app.database import SessionLocal
+from app.models import Detection, HourlyStat
+from app.storage import local_path, remove_image_files
+
+# Lossy compression and deletion both destroy evidence: each needs a policy
+DEFAULT_POLICY = {
+    "compress_after_days": None,
+    "delete_after_days": None,
+    "archive": True,
+}
+
+ARCHIVE_COLUMNS = [
+    "id", "plate_number", "confidence", "source", "timestamp",
+    "image_path", "video_timestamp", "camera_id",
+]
+
+
+def policy_for(source):
+    policy = dict(DEFAULT_POLICY)
+    policy.update(RETENTION_POLICIES.get("default", {}))
+    policy.update(RETENTION_POLICIES.get(source, {}))
+    return policy
+
+
+# ===========================
+# ARCHIVE
+# ===========================
+def write_archive(source, rows):
+    """
+    Write detection rows to ARCHIVE_DIR before they are deleted.
+    Parquet (zstd) when pyarrow is installed, gzipped CSV otherwise.
+    """
+    source_dir = os.path.join(ARCHIVE_DIR, "detections", f"source={source}")
+    os.makedirs(source_dir, exist_ok=True)
+    name = f"part-{rows[0].id:010d}-{rows[-1].id:010d}"
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        pa = None
+
+    if pa is not None:
+        path = os.path.join(source_dir, f"{name}.parquet")
+        table = pa.table({col: [getattr(r, col) for r in rows] for col in ARCHIVE_COLUMNS})
+        pq.write_table(table, path + ".tmp", compression="zstd")
+    else:
+        path = os.path.join(source_dir, f"{name}.csv.gz")
+        with gzip.open(path + ".tmp", "wt", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(ARCHIVE_COLUMNS)
+            for r in rows:
+                writer.writerow([getattr(r, col) for col in ARCHIVE_COLUMNS])
+
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# ===========================
+# SERVICE
+# ===========================
+class RetentionService:
+    """
+    Applies per-source retention policies in bounded batches.
+
+    Each batch is its own short transaction followed by a pause, so API
+    writers are never locked out for long. Expired rows leave the
+    plates/hourly_stats rollups in the same transaction, exactly like a
+    DELETE /history/{id}. Images that cannot be converted are left as they
+    are and retried on the next run.
+    """
+
+    def __init__(self):
+        self.last_run = None
+        self.last_result = None
+        self.totals = defaultdict(int)
+        self._lock = Lock()
+        self._task = None
+
+    def sources(self, db):
+        # hourly_stats is tiny compared to detections and knows every source
+        return [s for (s,) in db.query(HourlyStat.source).distinct().all()]
+
+    def run_once(self):
+        if not self._lock.acquire(blocking=False):
+            return {"skipped": "already running"}
+
+        start = time.perf_counter()
+        result = defaultdict(int)
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            for source in self.sources(db):
+                policy = policy_for(source)
+
+                if policy.get("compress_after_days") is not None:
+                    cutoff = now - timedelta(days=policy["compress_after_days"])
+                    compressed, skipped = self._compress(db, source, cutoff)
+                    result["images_compressed"] += compressed
+                    result["images_skipped"] += skipped
+
+                if policy.get("delete_after_days") is not None:
+                    cutoff = now - timedelta(days=policy["delete_after_days"])
+                    deleted, archived = self._expire(db, source, cutoff, policy.get("archive", True))
+                    result["rows_deleted"] += deleted
+                    result["rows_archived"] += archived
+
+            for key, value in result.items():
+                self.totals[key] += value
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            self.last_run = time.time()
+            self.last_result = dict(result)
+            return self.last_result
+
+        finally:
+            db.close()
+            self._lock.release()
+
+    def _compress(self, db, source, cutoff):
+        """
+        Replace old annotated JPEGs with downscaled WebP copies. Images are
+        content-addressed and may be shared: one still referenced by a newer
+        row or by another source is left alone until every row using it is
+        past this policy's cutoff.
+        """
+        det = Detection.__table__
+        other = det.alias("other")
+        compressed = 0
+        skipped = set()
+
+        while True:
+            query = (
+                select(det.c.image_path).distinct()
+                .where(det.c.source == source, det.c.timestamp < cutoff, det.c.image_path.like("%.jpg"))
+                .where(~exists().where(
+                    other.c.image_path == det.c.image_path,
+                    or_(other.c.source != source, other.c.timestamp >= cutoff),
+                ))
+                .limit(RETENTION_BATCH_SIZE)
+            )
+            if skipped:
+                query = query.where(det.c.image_path.notin_(skipped))
+            paths = db.execute(query).scalars().all()
+            if not paths:
+                return compressed, len(skipped)
+
+            converted = []
+            for old_path in paths:
+                try:
+                    new_path = self._to_webp(old_path)
+                except (OSError, cv2.error) as e:
+                    print(f"[RETENTION] Skipping {old_path}:", e)
+                    skipped.add(old_path)
+                    continue
+                db.execute(update(det).where(det.c.image_path == old_path).values(image_path=new_path))
+                converted.append(old_path)
+                compressed += new_path is not None
+            if converted:
+                changes.bump(db)  # image_path changed in place, outside the ORM hook
+            db.commit()
+
+            for old_path in converted:
+                remove_image_files(old_path)
+            time.sleep(RETENTION_BATCH_PAUSE_SEC)
+
+    def _to_webp(self, image_path):
+        """Returns the new URL path, or None if the original file is gone; raises OSError if it cannot be converted"""
+        if not os.path.exists(local_path(image_path)):
+            return None
+        image = cv2.imread(local_path(image_path))
+        if image is None:
+            raise OSError("unreadable image")
+
+        h, w = image.shape[:2]
+        if w > RETENTION_MAX_WIDTH:
+            scale = RETENTION_MAX_WIDTH / w
+            image = cv2.resize(image, (RETENTION_MAX_WIDTH, int(h * scale)), interpolation=cv2.INTER_AREA)
+
+        new_path = os.path.splitext(image_path)[0] + ".webp"
+        tmp_path = local_path(new_path) + ".tmp.webp"
+        try:
+            if not cv2.imwrite(tmp_path, image, [cv2.IMWRITE_WEBP_QUALITY, RETENTION_WEBP_QUALITY]):
+                raise OSError("WebP encode/write failed")
+            os.replace(tmp_path, local_path(new_path))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return new_path
+
+    def _expire(self, db, source, cutoff, archive):
+        """Archive then delete rows older than cutoff, one bounded batch at a time"""
+        det = Detection.__table__
+        deleted = archived = 0
+
+        while True:
+            rows = db.execute(
+                select(*[det.c[col] for col in ARCHIVE_COLUMNS])
+                .where(det.c.source == source, det.c.timestamp < cutoff)
+                .order_by(det.c.id)
+                .limit(RETENTION_BATCH_SIZE)
+            ).all()
+            if not rows:
+                return deleted, archived
+
+            if archive:
+                write_archive(source, rows)
+                archived += len(rows)
+
+            ids = [r.id for r in rows]
+            db.execute(delete(det).where(det.c.id.in_(ids)))
+            # Same rule as the ORM delete hook: rollups only describe rows that exist
+            rollups.apply_deletes(db.connection(), [
+                (r.plate_number, r.timestamp, r.confidence, r.source, r.camera_id) for r in rows
+            ])
+
+            paths = {r.image_path for r in rows if r.image_path}
+            still_used = set(db.execute(
+                select(det.c.image_path).distinct().where(det.c.image_path.in_(paths))
+            ).scalars()) if paths else set()
+            changes.bump(db)  # core DELETE: not seen by the ORM hook
+            db.commit()
+
+            for path in paths - still_used:
+                remove_image_files(path)
+            deleted += len(ids)
+            time.sleep(RETENTION_BATCH_PAUSE_SEC)
+
+    # ---------- background loop ----------
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.run_once)
+            except Exception as e:
+                print("[RETENTION] Run failed:", e)
+            await asyncio.sleep(RETENTION_INTERVAL_SEC)
+
+    def status(self):
+        return {
+            "last_run": self.last_run,
+            "last_result": self.last_result,
+            "totals": dict(self.totals),
+            "policies": {source: policy_for(source) for source in RETENTION_POLICIES} or {"default": policy_for(None)},
+        }
+
+
+retention_service = RetentionService()
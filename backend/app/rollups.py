@@ -0,0 +1,200 @@
+from collections import defaultdict
+
+from sqlalchemy import case, delete, event, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import changes
+from app.models import Detection, HourlyStat, PlateSummary
+
+# Rows per multi-row upsert; keeps well under SQLite's bound-parameter limit
+UPSERT_CHUNK = 100
+
+
+def _hour(ts):
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _insert(conn, table):
+    dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+
+def _chunks(items, size=UPSERT_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# ===========================
+# INCREMENTAL UPDATES
+# ===========================
+def apply_inserts(conn, rows):
+    """
+    Fold new detections into the rollup tables.
+
+    `rows` are (plate_number, timestamp, confidence, source, camera_id)
+    tuples. Rows are aggregated first, so a batch costs one upsert per
+    distinct plate and per distinct (hour, source).
+    """
+    plates = {}
+    hours = defaultdict(lambda: [0, 0.0])
+
+    for plate, ts, conf, source, camera_id in rows:
+        if not plate or ts is None:
+            continue
+        conf = conf or 0.0
+
+        p = plates.get(plate)
+        if p is None:
+            plates[plate] = {
+                "plate_number": plate,
+                "first_seen": ts,
+                "last_seen": ts,
+                "sightings": 1,
+                "best_confidence": conf,
+                "last_source": source,
+                "last_camera_id": camera_id,
+            }
+        else:
+            p["sightings"] += 1
+            p["first_seen"] = min(p["first_seen"], ts)
+            p["best_confidence"] = max(p["best_confidence"], conf)
+            if ts >= p["last_seen"]:
+                p["last_seen"] = ts
+                p["last_source"] = source
+                p["last_camera_id"] = camera_id
+
+        h = hours[(_hour(ts), source or "unknown")]
+        h[0] += 1
+        h[1] += conf
+
+    table = PlateSummary.__table__
+    for chunk in _chunks(list(plates.values())):
+        stmt = _insert(conn, table).values(chunk)
+        new = stmt.excluded
+        newer = new.last_seen >= table.c.last_seen
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.plate_number],
+            set_={
+                "first_seen": case((new.first_seen < table.c.first_seen, new.first_seen), else_=table.c.first_seen),
+                "last_seen": case((newer, new.last_seen), else_=table.c.last_seen),
+                "last_source": case((newer, new.last_source), else_=table.c.last_source),
+                "last_camera_id": case((newer, new.last_camera_id), else_=table.c.last_camera_id),
+                "sightings": table.c.sightings + new.sightings,
+                "best_confidence": case(
+                    (new.best_confidence > func.coalesce(table.c.best_confidence, 0.0), new.best_confidence),
+                    else_=table.c.best_confidence
+                ),
+            },
+        ))
+
+    table = HourlyStat.__table__
+    values = [
+        {"hour": hour, "source": source, "detections": n, "confidence_sum": total}
+        for (hour, source), (n, total) in hours.items()
+    ]
+    for chunk in _chunks(values):
+        stmt = _insert(conn, table).values(chunk)
+        conn.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.hour, table.c.source],
+            set_={
+                "detections": table.c.detections + stmt.excluded.detections,
+                "confidence_sum": table.c.confidence_sum + stmt.excluded.confidence_sum,
+            },
+        ))
+
+
+def apply_deletes(conn, rows):
+    """
+    Remove deleted detections from the rollups.
+
+    Hourly counts are decremented; the summary row of each affected plate
+    is recomputed from that plate's remaining (indexed) detections.
+    """
+    hours = defaultdict(lambda: [0, 0.0])
+    plates = set()
+
+    for plate, ts, conf, source, _ in rows:
+        if ts is not None:
+            h = hours[(_hour(ts), source or "unknown")]
+            h[0] += 1
+            h[1] += conf or 0.0
+        if plate:
+            plates.add(plate)
+
+    hourly = HourlyStat.__table__
+    for (hour, source), (n, total) in hours.items():
+        conn.execute(
+            update(hourly)
+            .where(hourly.c.hour == hour, hourly.c.source == source)
+            .values(detections=hourly.c.detections - n, confidence_sum=hourly.c.confidence_sum - total)
+        )
+
+    summary = PlateSummary.__table__
+    det = Detection.__table__
+    for plate in plates:
+        first, last, count, best = conn.execute(
+            select(func.min(det.c.timestamp), func.max(det.c.timestamp), func.count(), func.max(det.c.confidence))
+            .where(det.c.plate_number == plate)
+        ).one()
+
+        if not count:
+            conn.execute(delete(summary).where(summary.c.plate_number == plate))
+            continue
+
+        latest = conn.execute(
+            select(det.c.source, det.c.camera_id)
+            .where(det.c.plate_number == plate)
+            .order_by(det.c.timestamp.desc())
+            .limit(1)
+        ).one()
+
+        conn.execute(
+            update(summary)
+            .where(summary.c.plate_number == plate)
+            .values(
+                first_seen=first, last_seen=last, sightings=count, best_confidence=best,
+                last_source=latest.source, last_camera_id=latest.camera_id
+            )
+        )
+
+
+def _row(d: Detection):
+    return (d.plate_number, d.timestamp, d.confidence, d.source, d.camera_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _update_rollups(session, flush_context):
+    # new/deleted still hold the pre-flush state here, and the rows are
+    # already written, so rollups land in the same transaction.
+    inserted = [_row(o) for o in session.new if isinstance(o, Detection)]
+    deleted = [_row(o) for o in session.deleted if isinstance(o, Detection)]
+
+    if inserted:
+        apply_inserts(session.connection(), inserted)
+    if deleted:
+        apply_deletes(session.connection(), deleted)
+
+
+# ===========================
+# REBUILD
+# ===========================
+def rebuild(db, chunk_size=5000):
+    """Repopulate the rollup tables from the raw detections table"""
+    db.execute(delete(PlateSummary.__table__))
+    db.execute(delete(HourlyStat.__table__))
+
+    det = Detection.__table__
+    result = db.execute(
+        select(det.c.plate_number, det.c.timestamp, det.c.confidence, det.c.source, det.c.camera_id)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    total = 0
+    for chunk in result.partitions():
+        apply_inserts(db.connection(), chunk)
+        total += len(chunk)
+
+    changes.bump(db)  # stats responses change without any detection changing
+    db.commit()
+    return total
@@ -0,0 +1,152 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel
+from typing import Optional
+from app.cameras import camera_scheduler, worker_from_camera
+from app.database import SessionLocal, run_db
+from app.models import Camera
+from app.preview import PreviewEncoder
+
+router = APIRouter()
+
+# Handlers that touch camera_scheduler are async so the registry is only
+# ever mutated from the event loop the scheduler runs on; their database
+# work goes through run_db.
+
+
+class CameraRequest(BaseModel):
+    id: str
+    source: str
+    name: Optional[str] = None
+    priority: float = 1.0
+    max_fps: float = 5.0
+    enabled: bool = True
+
+
+def camera_to_dict(camera: Camera):
+    worker = camera_scheduler.workers.get(camera.id)
+    return {
+        "id": camera.id,
+        "name": camera.name,
+        "source": camera.source,
+        "priority": camera.priority,
+        "max_fps": camera.max_fps,
+        "enabled": camera.enabled,
+        "worker": worker.snapshot() if worker else None,
+    }
+
+
+@router.get("/")
+def list_cameras():
+    db = SessionLocal()
+    try:
+        return [camera_to_dict(c) for c in db.query(Camera).order_by(Camera.id).all()]
+    finally:
+        db.close()
+
+
+def _save_camera(req: CameraRequest):
+    db = SessionLocal()
+    try:
+        camera = db.query(Camera).filter(Camera.id == req.id).first()
+        if not camera:
+            camera = Camera(id=req.id)
+            db.add(camera)
+
+        camera.name = req.name
+        camera.source = req.source
+        camera.priority = req.priority
+        camera.max_fps = req.max_fps
+        camera.enabled = req.enabled
+        db.commit()
+        db.refresh(camera)
+        return camera
+    finally:
+        db.close()
+
+
+def _delete_camera(camera_id: str):
+    db = SessionLocal()
+    try:
+        camera = db.query(Camera).filter(Camera.id == camera_id).first()
+        if not camera:
+            return False
+        db.delete(camera)
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def _update_enabled(camera_id: str, enabled: bool):
+    db = SessionLocal()
+    try:
+        camera = db.query(Camera).filter(Camera.id == camera_id).first()
+        if not camera:
+            return None
+        camera.enabled = enabled
+        db.commit()
+        db.refresh(camera)
+        return camera
+    finally:
+        db.close()
+
+
+def _apply(camera: Camera):
+    """Start or stop the camera's worker to match its enabled flag"""
+    if camera.enabled:
+        camera_scheduler.add(worker_from_camera(camera))
+    else:
+        camera_scheduler.remove(camera.id)
+    return camera_to_dict(camera)
+
+
+@router.post("/")
+async def upsert_camera(req: CameraRequest):
+    return _apply(await run_db(_save_camera, req))
+
+
+@router.delete("/{camera_id}")
+async def delete_camera(camera_id: str):
+    if not await run_db(_delete_camera, camera_id):
+        return {"error": "Not found"}
+    camera_scheduler.remove(camera_id)
+    return {"success": True}
+
+
+@router.post("/{camera_id}/start")
+async def start_camera(camera_id: str):
+    return await _set_enabled(camera_id, True)
+
+
+@router.post("/{camera_id}/stop")
+async def stop_camera(camera_id: str):
+    return await _set_enabled(camera_id, False)
+
+
+async def _set_enabled(camera_id: str, enabled: bool):
+    camera = await run_db(_update_enabled, camera_id, enabled)
+    if camera is None:
+        return {"error": "Not found"}
+    return _apply(camera)
+
+
+# ===========================
+# LIVE VIEW WEBSOCKET
+# ===========================
+@router.websocket("/{camera_id}/ws")
+async def camera_view_ws(ws: WebSocket, camera_id: str):
+    await ws.accept()
+    queue = camera_scheduler.subscribe(camera_id)
+    preview = PreviewEncoder.from_params(ws.query_params)
+
+    try:
+        while True:
+            message, annotated, previews = await queue.get()
+            frame = await preview.encode(annotated, shared=previews)
+            await preview.send_json(ws, {**message, "frame": frame})
+
+    except WebSocketDisconnect:
+        print(f"[INFO] Camera {camera_id} viewer disconnected (preview {preview.stats()})")
+
+    finally:
+        camera_scheduler.unsubscribe(camera_id, queue)
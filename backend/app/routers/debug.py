@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.admin import require_admin
+from app.profiling import profiler
+
+router = APIRouter()
+
+
+@router.post("/profile", dependencies=[Depends(require_admin)])
+async def profile(
+    seconds: float = Query(10, gt=0, le=120),
+    frames: int = Query(0, ge=0, description="stop early after this many inference calls"),
+    interval_ms: float = Query(5, ge=1, le=100),
+    include_idle: bool = False,
+    memory: bool = False,
+    torch: bool = False,
+    format: str = Query("json", pattern="^(json|collapsed)$"),
+):
+    """
+    Sample the live worker for the next `frames` inference calls or `seconds`,
+    whichever comes first. format=collapsed returns flamegraph.pl input.
+    """
+    try:
+        result = await run_in_threadpool(
+            profiler.run, seconds, frames, interval_ms / 1000, include_idle, memory, torch
+        )
+    except RuntimeError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+
+    if format == "collapsed":
+        return PlainTextResponse(result["collapsed"] + "\n")
+    return result
@@ -0,0 +1,87 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from app.config import EVENT_HEARTBEAT_SEC
+from app.events import event_bus
+
+router = APIRouter()
+
+
+def _filters(source, camera_id, plate_prefix, types):
+    return {
+        "source": source,
+        "camera_id": camera_id,
+        "plate_prefix": plate_prefix,
+        "types": types.split(",") if types else None,
+    }
+
+
+@router.get("/stream")
+async def event_stream(
+    source: Optional[str] = None,
+    camera_id: Optional[str] = None,
+    plate_prefix: Optional[str] = None,
+    types: Optional[str] = None,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """Server-Sent Events; browsers resume automatically via Last-Event-ID"""
+    if last_event_id is None and last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+
+    sub = await event_bus.subscribe(last_event_id, **_filters(source, camera_id, plate_prefix, types))
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await sub.get(timeout=EVENT_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield event.sse
+        finally:
+            event_bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def event_ws(
+    ws: WebSocket,
+    source: Optional[str] = None,
+    camera_id: Optional[str] = None,
+    plate_prefix: Optional[str] = None,
+    types: Optional[str] = None,
+    last_event_id: Optional[int] = None,
+):
+    await ws.accept()
+    sub = await event_bus.subscribe(last_event_id, **_filters(source, camera_id, plate_prefix, types))
+
+    try:
+        while True:
+            try:
+                event = await sub.get(timeout=EVENT_HEARTBEAT_SEC)
+            except asyncio.TimeoutError:
+                await ws.send_json({"type": "ping"})
+                continue
+            await ws.send_text(event.json)
+
+    except WebSocketDisconnect:
+        print("[INFO] Event WS disconnected")
+
+    finally:
+        event_bus.unsubscribe(sub)
+
+
+@router.get("/stats")
+async def event_stats():
+    return await event_bus.stats()
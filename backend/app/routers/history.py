@@ -1,47 +1,86 @@
-from fastapi import APIRouter
-from app.database import SessionLocal
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.export import FORMATS, history_filters, iter_row_chunks
+from app.http_cache import response_cache
 from app.models import Detection
-import os
+from app.storage import remove_image_files
 
 router = APIRouter()
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
 @router.get("/")
-def get_history():
-    db = SessionLocal()
-    try:
-        records = db.query(Detection).order_by(Detection.timestamp.desc()).all()
-        return [
-            {
-                "id": r.id,
-                "plate_number": r.plate_number,
-                "confidence": r.confidence,
-                "timestamp": r.timestamp.isoformat(),
-                "source": r.source,
-                "image_path": r.image_path
-            }
-            for r in records
-        ]
-    finally:
-        db.close()
+async def get_history(
+    request: Request,
+    source: Optional[str] = None,
+    camera_id: Optional[str] = None,
+    plate: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    min_confidence: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    async def build():
+        conditions = history_filters(source, camera_id, plate, start, end, min_confidence)
+        records = await db.scalars(
+            select(Detection).where(*conditions).order_by(Detection.timestamp.desc())
+        )
+        return [r.to_dict() for r in records]
+
+    # 304 / cached body while nothing was inserted or deleted
+    return await response_cache.respond(request, build, db)
+
+
+@router.get("/export")
+def export_history(
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    source: Optional[str] = None,
+    camera_id: Optional[str] = None,
+    plate: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    min_confidence: Optional[float] = None,
+):
+    """Stream matching history in id order without loading it into memory"""
+    media_type, stream = FORMATS[format]
+    conditions = history_filters(source, camera_id, plate, start, end, min_confidence)
+    filename = f"detections_{datetime.utcnow():%Y%m%d_%H%M%S}.{format}"
+
+    return StreamingResponse(
+        stream(iter_row_chunks(conditions)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 @router.delete("/{record_id}")
-def delete_record(record_id: int):
-    db = SessionLocal()
-    try:
-        record = db.query(Detection).filter(Detection.id == record_id).first()
-        if not record:
-            return {"error": "Not found"}
-
-        if record.image_path:
-            abs_path = os.path.join(BASE_DIR, record.image_path.lstrip("/"))
-            if os.path.exists(abs_path):
-                os.remove(abs_path)
-
-        db.delete(record)
-        db.commit()
-        return {"success": True}
-    finally:
-        db.close()
+async def delete_record(
+    record_id: int,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+):
+    record = await db.get(Detection, record_id)
+    if not record:
+        return {"error": "Not found"}
+
+    # Annotated images are content-addressed and may be shared by several rows
+    shared = record.image_path and await db.scalar(
+        select(Detection.id).where(
+            Detection.image_path == record.image_path,
+            Detection.id != record.id
+        ).limit(1)
+    )
+
+    image_path = record.image_path
+    await db.delete(record)
+    await db.commit()  # rollups are updated by the same after_flush listener
+
+    # File removal happens after the response is sent
+    if image_path and not shared:
+        background_tasks.add_task(remove_image_files, image_path)
+
+    return {"success": True}
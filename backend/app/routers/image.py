@@ -1,36 +1,143 @@
 from fastapi import APIRouter, UploadFile, File
+from fastapi.responses import JSONResponse, StreamingResponse
 import cv2
 import numpy as np
 import base64
-from datetime import datetime
-from app.detector.detector import process_license_plate,PlateDetector
-from app.database import SessionLocal
+import json
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from typing import List
+from app.detector.detector import process_license_plate, process_license_plates
+from app.database import SessionLocal, run_db
 from app.models import Detection
-import os
+from app.storage import get_image_store, local_path
+from app.upload_cache import upload_cache
+from app.events import event_bus
+from app.watchlist import watchlist
+from app.admission import Overloaded, admission
+from app.config import ADMISSION_BATCH_MAX_BACKOFF_SEC, DETECT_BATCH_SIZE, DETECT_BATCH_MAX_IMAGES
 import asyncio
+import anyio
 from functools import partial
 
 
 router = APIRouter()
 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-UPLOAD_DIR = os.path.join(BASE_DIR, "uploads", "images")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-MODEL_PATH = os.path.join(
-    BASE_DIR,
-    "new_runs",
-    "detect",
-    "train",
-    "weights",
-    "best.pt"
-)
+def insert_detections(db, plates, image_path):
+    """
+    Add one "image" row per (plate, confidence); returns the response
+    entries and the events to publish once the caller has committed (then
+    check_watchlist fills in the entries' "watchlist").
+    """
+    results = []
+    events = []
+    for plate, confidence in plates:
+        record = Detection(
+            plate_number=plate,
+            confidence=confidence,
+            source="image",
+            image_path=image_path
+        )
+
+        db.add(record)
+        db.flush()  # faster than commit per row
+        events.append(record.to_dict())
+
+        results.append({
+            "id": record.id,
+            "plate_number": record.plate_number,
+            "confidence": float(record.confidence),
+        })
+    return results, events
+
+
+def check_watchlist(results, image_path):
+    """Watchlist verdict per committed entry; alerts only fire for rows that exist"""
+    for r in results:
+        r["watchlist"] = watchlist.check(r["plate_number"], r["confidence"], "image", image_path=image_path)
+    return results
+
+
+def record_repeat_upload(detections, image_path):
+    """New history rows for a cached upload the client asked to record again"""
+    db = SessionLocal()
+    try:
+        results, events = insert_detections(
+            db, [(d["plate_number"], d["confidence"]) for d in detections], image_path
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    for event in events:
+        event_bus.publish("detection", event)
+    return check_watchlist(results, image_path)
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def cached_response(key, cached, data, inline_image, thumbnail, record_repeat):
+    """Answer a repeat upload from the upload cache without decoding or inference"""
+    loop = asyncio.get_running_loop()
+    image_path = cached["image_path"]
+    results = cached["detections"]
+    if record_repeat and results:
+        results = await run_db(record_repeat_upload, results, image_path)
+    else:
+        # Stored verdicts are as old as the entry; the watchlist may have changed
+        # since. Only a verdict: nothing new was seen, so no alert fires.
+        results = [{**r, "watchlist": watchlist.match(r["plate_number"])} for r in results]
+
+    thumbnail_path = cached["thumbnail_path"]
+    if thumbnail and image_path and not thumbnail_path:
+        thumbnail_path = await loop.run_in_executor(None, get_image_store().thumbnail_for, image_path)
+        await run_db(upload_cache.update_thumbnail, key, thumbnail_path)
+
+    annotated_b64 = None
+    if inline_image:
+        # Without plates nothing was drawn: the upload itself is the annotated image
+        jpeg = await loop.run_in_executor(None, _read_file, local_path(image_path)) if image_path else data
+        annotated_b64 = base64.b64encode(jpeg).decode("utf-8")
+
+    return {
+        "detections": results,
+        "count": len(results),
+        "image_url": image_path,
+        "thumbnail_url": thumbnail_path if thumbnail else None,
+        "annotated_image": annotated_b64,
+        "cached": True,
+    }
 
-plate_detector = PlateDetector(model_path=MODEL_PATH)
 
 @router.post("/image")
-async def detect_image(file: UploadFile = File(...)):
+async def detect_image(
+    file: UploadFile = File(...),
+    inline_image: bool = False,
+    thumbnail: bool = False,
+    record_repeat: bool = False,
+):
+    """
+    Repeat uploads of the same file are answered from the upload cache and
+    report the original rows with a fresh watchlist verdict but no new alert;
+    record_repeat=true adds new history rows (and alerts) for them anyway.
+    """
     data = await file.read()
+
+    key = None
+    if upload_cache.enabled:
+        key = upload_cache.key(data)
+        cached = await run_db(upload_cache.lookup, key)
+        if cached is not None:
+            return await cached_response(key, cached, data, inline_image, thumbnail, record_repeat)
+
     np_img = np.frombuffer(data, np.uint8)
     image = cv2.imdecode(np_img, cv2.IMREAD_COLOR)
 
@@ -38,58 +145,58 @@ async def detect_image(file: UploadFile = File(...)):
         return {"detections": [], "count": 0}
 
     loop = asyncio.get_running_loop()
-    annotated_image, detections = await loop.run_in_executor(
-        None,
-        partial(process_license_plate, image, plate_detector)
-    )
+    try:
+        async with admission.slot("image"):
+            annotated_image, detections = await loop.run_in_executor(
+                None, process_license_plate, image
+            )
+    except Overloaded as e:
+        return JSONResponse({"error": e.reason}, status_code=e.status_code, headers=e.headers())
 
+    plates = [d for d in detections if d.get("plate") and d["plate"].strip()]
+
+    # One encode + write per annotated image, shared by all of its plates
+    stored = {"image_path": None, "thumbnail_path": None, "bytes": None}
+    if plates:
+        stored = await get_image_store().save(annotated_image, thumbnail=thumbnail, with_bytes=inline_image)
 
-    results = []
     db = SessionLocal()
 
     try:
-        for det in detections:
-            plate_text = det.get("plate")
-            confidence = det.get("ocr_conf", 0.0)
-
-            if not plate_text:
-                continue
-
-            plate_text_clean = plate_text.strip()
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            image_filename = f"{timestamp}_{plate_text_clean}.jpg"
-            abs_image_path = os.path.join(UPLOAD_DIR, image_filename)
-
-            if annotated_image is not None:
-                cv2.imwrite(abs_image_path, annotated_image)
-
-            record = Detection(
-                plate_number=plate_text_clean,
-                confidence=float(confidence),
-                source="image",
-                image_path=f"/uploads/images/{image_filename}"
-            )
-
-            db.add(record)
-            db.flush()  # faster than commit per row
-
-            results.append({
-                "id": record.id,
-                "plate_number": record.plate_number,
-                "confidence": float(record.confidence),
-            })
+        results, events = insert_detections(
+            db, [(d["plate"].strip(), float(d.get("ocr_conf", 0.0))) for d in plates], stored["image_path"]
+        )
 
         db.commit()
+        for event in events:
+            event_bus.publish("detection", event)
+        check_watchlist(results, stored["image_path"])
+
+        if key is not None:
+            try:
+                await run_db(upload_cache.store, key, {
+                    "detections": results,
+                    "image_path": stored["image_path"],
+                    "thumbnail_path": stored["thumbnail_path"],
+                })
+            except Exception as e:
+                print("UPLOAD CACHE ERROR:", e)
 
         annotated_b64 = None
-        if annotated_image is not None:
-            _, buffer = cv2.imencode(".jpg", annotated_image)
-            annotated_b64 = base64.b64encode(buffer).decode("utf-8")
+        if inline_image:
+            jpeg = stored["bytes"]
+            if jpeg is None:
+                _, buffer = await loop.run_in_executor(None, cv2.imencode, ".jpg", annotated_image)
+                jpeg = buffer.tobytes()
+            annotated_b64 = base64.b64encode(jpeg).decode("utf-8")
 
         return {
             "detections": results,
             "count": len(results),
+            "image_url": stored["image_path"],
+            "thumbnail_url": stored["thumbnail_path"],
             "annotated_image": annotated_b64,
+            "cached": False,
         }
 
     except Exception as e:
@@ -99,3 +206,226 @@ async def detect_image(file: UploadFile = File(...)):
 
     finally:
         db.close()
+
+
+# ===========================
+# BATCH DETECTION
+# ===========================
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+ARCHIVE_EXTS = (".zip", ".tar", ".tar.gz", ".tgz")
+
+
+def iter_upload_images(uploads):
+    """Yield (name, bytes) per image, expanding zip/tar archives member by member"""
+    for name, fileobj in uploads:
+        lower = name.lower()
+        fileobj.seek(0)
+
+        if lower.endswith(".zip"):
+            with zipfile.ZipFile(fileobj) as zf:
+                for info in zf.infolist():
+                    if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTS):
+                        yield info.filename, zf.read(info)
+
+        elif lower.endswith(ARCHIVE_EXTS):
+            with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+                for member in tf:
+                    if member.isfile() and member.name.lower().endswith(IMAGE_EXTS):
+                        yield member.name, tf.extractfile(member).read()
+
+        else:
+            yield name, fileobj.read()
+
+
+def copy_uploads(files):
+    """
+    (name, temp file) per upload. FastAPI closes its UploadFiles as soon as
+    the handler returns, before a streamed response body is produced, so
+    the batch reads its own copies.
+    """
+    uploads = []
+    try:
+        for f in files:
+            tmp = tempfile.TemporaryFile()
+            uploads.append((f.filename or "upload", tmp))
+            f.file.seek(0)
+            shutil.copyfileobj(f.file, tmp)
+    except Exception:
+        for _, tmp in uploads:
+            tmp.close()
+        raise
+    return uploads
+
+
+def decode_next_batch(items, size):
+    """Pull up to `size` uploads and decode them; image is None if undecodable"""
+    batch = []
+    for name, data in items:
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        batch.append((name, image))
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def save_batch_detections(named_outputs):
+    """Write annotated evidence and insert all rows in one transaction"""
+    db = SessionLocal()
+    try:
+        per_image = []
+
+        for name, (annotated_image, detections) in named_outputs:
+            plates = [d for d in detections if d.get("plate") and d["plate"].strip()]
+            image_path = None
+
+            if plates:
+                image_path = get_image_store().save_sync(annotated_image)["image_path"]
+
+            records = [
+                Detection(
+                    plate_number=d["plate"].strip(),
+                    confidence=float(d.get("ocr_conf", 0.0)),
+                    source="image",
+                    image_path=image_path
+                )
+                for d in plates
+            ]
+            db.add_all(records)
+            per_image.append((records, plates, image_path))
+
+        db.flush()
+        events = [r.to_dict() for records, _, _ in per_image for r in records]
+        db.commit()
+        for event in events:
+            event_bus.publish("detection", event)
+
+        return [
+            {
+                "detections": [
+                    {
+                        "id": r.id,
+                        "plate_number": r.plate_number,
+                        "confidence": float(r.confidence),
+                        "bbox": list(d["bbox"]),
+                        "watchlist": watchlist.check(
+                            r.plate_number, r.confidence, "image", image_path=image_path
+                        ),
+                    }
+                    for r, d in zip(records, plates)
+                ],
+                "count": len(records),
+                "image_path": image_path,
+            }
+            for records, plates, image_path in per_image
+        ]
+
+    except Exception:
+        db.rollback()
+        raise
+
+    finally:
+        db.close()
+
+
+@router.post("/batch")
+async def detect_batch(files: List[UploadFile] = File(...)):
+    """
+    Detect plates on many images (plain files and/or zip/tar archives).
+    Results stream back as NDJSON, one line per image, in upload order,
+    followed by a final summary line.
+    """
+    loop = asyncio.get_running_loop()
+
+    # Batches are the first thing to go under load: refuse outright rather than queue
+    if admission.degradation("batch"):
+        e = admission.reject("batch", 503, "server busy, batch detection paused")
+        return JSONResponse({"error": e.reason}, status_code=e.status_code, headers=e.headers())
+
+    uploads = await loop.run_in_executor(None, copy_uploads, files)
+    items = iter_upload_images(uploads)
+    # The decode currently running on the executor, if any
+    decoding = {"future": None}
+
+    def decode_next():
+        decoding["future"] = loop.run_in_executor(None, decode_next_batch, items, DETECT_BATCH_SIZE)
+        return decoding["future"]
+
+    async def stream():
+        try:
+            async for line in detect_stream():
+                yield line
+        finally:
+            # Stopped early (batch limit, client gone): the executor may still
+            # be reading the uploads, so let that decode finish before closing
+            pending = decoding["future"]
+            if pending is not None and not pending.done():
+                with anyio.CancelScope(shield=True):
+                    await asyncio.wait([pending])
+            for _, fileobj in uploads:
+                fileobj.close()
+
+    async def detect_chunk(images):
+        """Detector outputs under admission control; None once backing off exceeds the cap"""
+        waited = 0.0
+        while True:
+            try:
+                async with admission.slot("batch"):
+                    return await loop.run_in_executor(None, partial(process_license_plates, images))
+            except Overloaded as e:
+                if waited + e.retry_after > ADMISSION_BATCH_MAX_BACKOFF_SEC:
+                    return None
+                # Mid-stream: back off and yield the slots to interactive traffic
+                await asyncio.sleep(e.retry_after)
+                waited += e.retry_after
+
+    async def detect_stream():
+        index = 0
+        total_plates = 0
+        pending = decode_next()
+
+        while True:
+            batch = await pending
+            if not batch:
+                break
+
+            if index + len(batch) > DETECT_BATCH_MAX_IMAGES:
+                yield json.dumps({"error": f"batch limit of {DETECT_BATCH_MAX_IMAGES} images exceeded"}) + "\n"
+                break
+
+            # Decode the next batch while this one is on the detector
+            pending = decode_next()
+
+            decoded = [(name, img) for name, img in batch if img is not None]
+            try:
+                outputs = await detect_chunk([img for _, img in decoded])
+                if outputs is None:
+                    yield json.dumps({
+                        "error": f"server busy, batch stopped after backing off {ADMISSION_BATCH_MAX_BACKOFF_SEC:g}s"
+                    }) + "\n"
+                    break
+                saved = await loop.run_in_executor(
+                    None,
+                    partial(save_batch_detections, list(zip([name for name, _ in decoded], outputs)))
+                )
+                error = None
+            except Exception as e:
+                print("BATCH DETECTION ERROR:", e)
+                saved, error = None, "detection_failed"
+
+            saved = iter(saved or [])
+            for name, img in batch:
+                line = {"index": index, "filename": name}
+                if img is None:
+                    line["error"] = "decode_failed"
+                elif error:
+                    line["error"] = error
+                else:
+                    line.update(next(saved))
+                    total_plates += line["count"]
+
+                index += 1
+                yield json.dumps(line) + "\n"
+
+        yield json.dumps({"done": True, "images": index, "plates": total_plates}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+from starlette.concurrency import run_in_threadpool
+
+from app.admin import require_admin
+from app.retention import retention_service
+
+router = APIRouter()
+
+
+@router.get("/")
+def retention_status():
+    return retention_service.status()
+
+
+@router.post("/run", dependencies=[Depends(require_admin)])
+async def run_retention():
+    """Apply retention policies now instead of waiting for the next scheduled run"""
+    return await run_in_threadpool(retention_service.run_once)
@@ -0,0 +1,100 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.http_cache import response_cache
+from app.models import HourlyStat, PlateSummary
+
+router = APIRouter()
+
+# All of these read the rollup tables maintained by app.rollups, never the
+# raw detections table, so their cost does not grow with history size.
+# Rollups change exactly when detections do, so they share its change token.
+
+
+@router.get("/hourly")
+async def hourly_stats(
+    request: Request,
+    source: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 168,
+    db: AsyncSession = Depends(get_async_db),
+):
+    async def build():
+        query = select(HourlyStat)
+        if source:
+            query = query.where(HourlyStat.source == source)
+        if start:
+            query = query.where(HourlyStat.hour >= start)
+        if end:
+            query = query.where(HourlyStat.hour < end)
+
+        rows = await db.scalars(query.order_by(HourlyStat.hour.desc()).limit(limit))
+        return [r.to_dict() for r in rows]
+
+    return await response_cache.respond(request, build, db)
+
+
+@router.get("/summary")
+async def summary(
+    request: Request,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    async def build():
+        query = select(
+            HourlyStat.source,
+            func.sum(HourlyStat.detections),
+            func.sum(HourlyStat.confidence_sum),
+        )
+        if start:
+            query = query.where(HourlyStat.hour >= start)
+        if end:
+            query = query.where(HourlyStat.hour < end)
+
+        result = await db.execute(query.group_by(HourlyStat.source))
+        by_source = {
+            source: {
+                "detections": int(n or 0),
+                "avg_confidence": (total / n) if n else None,
+            }
+            for source, n, total in result.all()
+        }
+        return {
+            "detections": sum(v["detections"] for v in by_source.values()),
+            "by_source": by_source,
+        }
+
+    return await response_cache.respond(request, build, db)
+
+
+@router.get("/plates")
+async def plate_summaries(
+    request: Request,
+    order: str = "last_seen",
+    limit: int = 50,
+    db: AsyncSession = Depends(get_async_db),
+):
+    async def build():
+        column = PlateSummary.sightings if order == "sightings" else PlateSummary.last_seen
+        rows = await db.scalars(select(PlateSummary).order_by(column.desc()).limit(limit))
+        return [r.to_dict() for r in rows]
+
+    return await response_cache.respond(request, build, db)
+
+
+@router.get("/plates/{plate_number}")
+async def plate_summary(request: Request, plate_number: str, db: AsyncSession = Depends(get_async_db)):
+    async def build():
+        row = await db.get(PlateSummary, plate_number.upper())
+        if not row:
+            return {"error": "Not found"}
+        return row.to_dict()
+
+    return await response_cache.respond(request, build, db)
@@ -1,32 +1,24 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from app.detector.video_pipeline import process_license_plate
-from app.database import SessionLocal
+from app.detector.video_pipeline import process_frame, read_plate_texts
+from app.database import SessionLocal, run_db
 from app.models import Detection
+from app.events import event_bus
+from app.watchlist import watchlist
+from app.plate_filter import CONF_THRESHOLD, should_save_plate
+from app.admission import DEGRADE_FPS, DEGRADE_RESOLUTION, DEGRADE_SKIP_OCR, Overloaded, admission
+from app.config import ADMISSION_DEGRADED_WIDTH
+from app.preview import PreviewEncoder
+from app.recorder import open_recorder
 from datetime import datetime
 
-import cv2
-import numpy as np
-import base64
+import asyncio
 import json
 import time
 from asyncio import get_running_loop
-from functools import partial
-from collections import deque
+from contextlib import suppress
 
 router = APIRouter()
 
-CONF_THRESHOLD = 0.2
-DEDUP_WINDOW_SEC = 5     
-MAX_IN_MEMORY_EVENTS = 500
-
-history_buffer = deque(maxlen=MAX_IN_MEMORY_EVENTS)
-recent_plates = {}  
-
-
-def encode_frame(frame):
-    _, buffer = cv2.imencode(".jpg", frame)
-    return base64.b64encode(buffer).decode("utf-8")
-
 
 from datetime import datetime
 
@@ -42,7 +34,10 @@ def save_video_detection(plate, confidence, video_ts):
             image_path=None
         )
         db.add(record)
+        db.flush()
+        event = record.to_dict()
         db.commit()
+        event_bus.publish("detection", event)
     finally:
         db.close()
 
@@ -58,22 +53,221 @@ def save_live_detection(plate, confidence):
             image_path=None
         )
         db.add(record)
+        db.flush()
+        event = record.to_dict()
         db.commit()
+        event_bus.publish("detection", event)
     finally:
         db.close()
 
 
 
-def should_save_plate(plate):
-    """Deduplicate plate saves to protect DB"""
-    now = time.time()
-    last_seen = recent_plates.get(plate)
+# ---------- admission / degradation ----------
+def degrade_overrides(level):
+    """
+    Lower-resolution step: the detector runs on a downscaled copy and boxes
+    come back full size (stream OCR already stops at the first level).
+    """
+    if level >= DEGRADE_RESOLUTION:
+        return {"detect": {"max_width": ADMISSION_DEGRADED_WIDTH}}
+    return None
+
+
+async def process_stream_frame(loop, frame, source, frame_no):
+    """
+    The "stream" profile under admission control, degraded step by step
+    as load rises. `frame` is JPEG bytes or an image. Returns the engine
+    frame dict, or None if the frame was dropped.
+    """
+    level = admission.degradation(source)
+    admission.record_degraded(source, level)
+    if level >= DEGRADE_FPS and frame_no % 2:
+        return None
+
+    profile = "stream_boxes" if level >= DEGRADE_SKIP_OCR else "stream"
+    try:
+        async with admission.slot(source):
+            return await loop.run_in_executor(None, process_frame, frame, degrade_overrides(level), profile)
+    except Overloaded:
+        return None
+
+
+async def report_plates(result, source, timestamp):
+    """
+    Watchlist + dedup save for every confident plate in the frame. Returns the
+    legacy message body (without the preview "frame"): "plate"/"confidence"
+    are the best plate, "plates" lists all.
+    """
+    plates = []
+    for p in result["plates"]:
+        text = (p.get("text") or "").strip()
+        if not text or p["confidence"] < CONF_THRESHOLD:
+            continue
+        watchlist.check(text, p["confidence"], source)
+        if await should_save_plate(text):
+            if source == "video":
+                await run_db(save_video_detection, plate=text, confidence=p["confidence"], video_ts=timestamp)
+            else:
+                await run_db(save_live_detection, plate=text, confidence=p["confidence"])
+        plates.append({"plate": text, "confidence": p["confidence"], "bbox": list(p["bbox"])})
+
+    best = result["plates"][0]["confidence"] if result["plates"] else 0.0
+    return {
+        "plate": plates[0]["plate"] if plates else None,
+        "confidence": plates[0]["confidence"] if plates else best,
+        "plates": plates,
+        "timestamp": timestamp,
+    }
+
+
+# ===========================
+# TWO-PHASE STREAMING (?mode=two_phase)
+# ===========================
+class TwoPhaseStream:
+    """
+    Sends plate boxes as soon as the detector returns, then the OCR text in
+    a follow-up message keyed by (seq, box_id):
+
+        {"type": "boxes", "seq": 7, "boxes": [{"box_id": 0, "box": [x1, y1, x2, y2], "confidence": 0.91}], ...}
+        {"type": "ocr", "seq": 7, "plates": [{"box_id": 0, "plate": "KA01AB1234", ...}]}
+
+    Only one OCR job runs per connection. A newer frame supersedes OCR that
+    has not finished, which is reported as {"type": "ocr", "seq": 7, "superseded": true}.
+    No annotated image is sent; clients draw the boxes over their own frame.
+    """
+
+    def __init__(self, ws: WebSocket, source: str):
+        self.ws = ws
+        self.source = source
+        self.loop = get_running_loop()
+        self.seq = 0
+        self.superseded = 0
+        self._send_lock = asyncio.Lock()
+        self._ocr_task = None
+        self.recorder = open_recorder(ws, ws.url.path.rsplit("/", 1)[-1], source)
+
+    async def send(self, payload):
+        async with self._send_lock:
+            await self.ws.send_json(payload)
+
+    async def handle_frame(self, data, timestamp):
+        """data: the JPEG bytes as received; decoded (at reduced scale) in the executor"""
+        self.seq += 1
+        seq = self.seq
+
+        level = admission.degradation(self.source)
+        admission.record_degraded(self.source, level)
+        if level >= DEGRADE_FPS and seq % 2:
+            await self.send({"type": "dropped", "seq": seq})
+            return
+
+        try:
+            async with admission.slot(self.source):
+                # Boxes always come back in original-frame coordinates
+                frame = await self.loop.run_in_executor(
+                    None, process_frame, data, degrade_overrides(level), "stream_detect"
+                )
+        except Overloaded:
+            await self.send({"type": "dropped", "seq": seq})
+            return
+
+        if frame["image"] is None:  # not a decodable image
+            await self.send({"type": "dropped", "seq": seq})
+            return
+
+        boxes = [(*p["bbox"], p["det_conf"]) for p in frame["plates"]]
+        width, height = frame["size"]
+        await self.send({
+            "type": "boxes",
+            "seq": seq,
+            "timestamp": timestamp,
+            "width": width,
+            "height": height,
+            "boxes": [
+                {"box_id": i, "box": [x1, y1, x2, y2], "confidence": conf}
+                for i, (x1, y1, x2, y2, conf) in enumerate(boxes)
+            ],
+        })
+
+        if self._ocr_task and not self._ocr_task.done():
+            self._ocr_task.cancel()
+
+        candidates = [(i, box) for i, box in enumerate(boxes) if box[4] >= CONF_THRESHOLD]
+        if candidates and level < DEGRADE_SKIP_OCR:
+            self._ocr_task = asyncio.create_task(self._ocr(data, seq, timestamp, candidates))
+
+    async def _ocr(self, data, seq, timestamp, candidates):
+        try:
+            # Cancelling here also cancels the executor job if it has not started yet
+            async with admission.slot(self.source):
+                results = await self.loop.run_in_executor(
+                    None, read_plate_texts, data, [box for _, box in candidates]
+                )
+        except Overloaded:
+            with suppress(Exception):
+                await self.send({"type": "ocr", "seq": seq, "dropped": True})
+            return
+        except asyncio.CancelledError:
+            self.superseded += 1
+            with suppress(Exception):
+                await self.send({"type": "ocr", "seq": seq, "superseded": True})
+            return
+
+        plates = []
+        for (box_id, box), (text, ocr_confidence) in zip(candidates, results):
+            if not text:
+                continue
+            confidence = box[4]
+            watchlist.check(text, confidence, self.source)
+            if await should_save_plate(text):
+                if self.source == "video":
+                    await run_db(save_video_detection, plate=text, confidence=confidence, video_ts=timestamp)
+                else:
+                    await run_db(save_live_detection, plate=text, confidence=confidence)
+            plates.append({
+                "box_id": box_id,
+                "plate": text,
+                "confidence": confidence,
+                "ocr_confidence": ocr_confidence,
+            })
+
+        with suppress(Exception):  # client may have gone away meanwhile
+            await self.send({"type": "ocr", "seq": seq, "timestamp": timestamp, "plates": plates})
+
+    async def run(self):
+        timestamp = 0.0
+        try:
+            while True:
+                msg = await self.ws.receive()
+                if msg["type"] == "websocket.disconnect":
+                    break
+
+                if msg.get("text"):
+                    try:
+                        payload = json.loads(msg["text"])
+                    except ValueError:
+                        continue
+                    if payload.get("type") == "frame_meta":
+                        timestamp = float(payload.get("timestamp", timestamp))
+                    continue
+
+                if not msg.get("bytes"):
+                    continue
 
-    if last_seen and now - last_seen < DEDUP_WINDOW_SEC:
-        return False
+                if self.recorder:
+                    self.recorder.frame(msg["bytes"], timestamp if self.source == "video" else None)
+                if self.source == "live":
+                    timestamp = time.time()
+                await self.handle_frame(msg["bytes"], timestamp)
 
-    recent_plates[plate] = now
-    return True
+        except WebSocketDisconnect:
+            pass
+        finally:
+            if self._ocr_task and not self._ocr_task.done():
+                self._ocr_task.cancel()
+            if self.recorder:
+                self.recorder.close()
+            print(f"[INFO] Two-phase {self.source} WS closed ({self.seq} frames, {self.superseded} OCR superseded)")
 
 
 # ===========================
@@ -83,8 +277,15 @@ def should_save_plate(plate):
 async def video_stream_ws(ws: WebSocket):
     await ws.accept()
 
+    if ws.query_params.get("mode") == "two_phase":
+        await TwoPhaseStream(ws, "video").run()
+        return
+
     loop = get_running_loop()
+    preview = PreviewEncoder.from_params(ws.query_params)
+    recorder = open_recorder(ws, "video", "video")
     last_timestamp = 0.0
+    frame_no = 0
 
     try:
         while True:
@@ -101,6 +302,10 @@ async def video_stream_ws(ws: WebSocket):
                     if payload.get("type") == "frame_meta":
                         last_timestamp = float(payload.get("timestamp", last_timestamp))
                         continue
+
+                    if payload.get("type") == "preview":
+                        preview.configure(payload.get("width"), payload.get("quality"))
+                        continue
                 except Exception:
                     continue
 
@@ -108,55 +313,39 @@ async def video_stream_ws(ws: WebSocket):
             if not msg.get("bytes"):
                 continue
 
-            nparr = np.frombuffer(msg["bytes"], np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if frame is None:
-                continue
-
-            plate_img, annotated, plate_text, confidence = await loop.run_in_executor(
-                None,
-                partial(process_license_plate, frame)
-            )
+            if recorder:
+                recorder.frame(msg["bytes"], last_timestamp)
 
-            if confidence < CONF_THRESHOLD:
-                plate_text = None
-
-            # ---------- SAVE TO DB (metadata only) ----------
-            if plate_text and should_save_plate(plate_text):
-                save_video_detection(
-                    plate=plate_text.strip(),
-                    confidence=confidence,
-                    video_ts=last_timestamp
-                )
-
-            # ---------- IN-MEMORY BUFFER ----------
-            history_buffer.append({
-                "plate": plate_text,
-                "timestamp": last_timestamp,
-                "confidence": confidence,
-                "source": "video"
-            })
+            # Decoded in the executor, at reduced scale when the frame is large
+            frame_no += 1
+            result = await process_stream_frame(loop, msg["bytes"], "video", frame_no)
+            if result is None:
+                await ws.send_json({"type": "status", "message": "dropped"})
+                continue
+            if result["image"] is None:
+                continue
 
-            # ---------- SEND BACK ----------
+            # ---------- SAVE TO DB (metadata only) + SEND BACK ----------
+            message = await report_plates(result, "video", last_timestamp)
+            message["frame"] = await preview.encode(result["annotated"])
             try:
-                await ws.send_json({
-                    "frame": encode_frame(annotated),
-                    "plate": plate_text,
-                    "confidence": confidence,
-                    "timestamp": last_timestamp
-                })
+                await preview.send_json(ws, message)
             except Exception:
                 break  # client disconnected
 
 
     except WebSocketDisconnect:
-        print("[INFO] Video WS disconnected")
+        print(f"[INFO] Video WS disconnected (preview {preview.stats()})")
 
     except Exception as e:
         print("[ERROR]", e)
         import traceback
         traceback.print_exc()
 
+    finally:
+        if recorder:
+            recorder.close()
+
 
 # ===========================
 # LIVE WEBCAM WEBSOCKET
@@ -164,7 +353,14 @@ async def video_stream_ws(ws: WebSocket):
 @router.websocket("/webcam")
 async def webcam_ws(ws: WebSocket):
     await ws.accept()
+
+    if ws.query_params.get("mode") == "two_phase":
+        await TwoPhaseStream(ws, "live").run()
+        return
     loop = get_running_loop()
+    preview = PreviewEncoder.from_params(ws.query_params)
+    recorder = open_recorder(ws, "webcam", "live")
+    frame_no = 0
 
     try:
         while True:
@@ -176,44 +372,34 @@ async def webcam_ws(ws: WebSocket):
                     payload = json.loads(msg["text"])
                     if payload.get("type") == "ping":
                         continue
+                    if payload.get("type") == "preview":
+                        preview.configure(payload.get("width"), payload.get("quality"))
+                        continue
                 except Exception:
                     continue
 
             if not msg.get("bytes"):
                 continue
 
-            nparr = np.frombuffer(msg["bytes"], np.uint8)
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            if frame is None:
-                continue
-
-            plate_img, annotated, plate_text, confidence = await loop.run_in_executor(
-                None,
-                partial(process_license_plate, frame)
-            )
+            if recorder:
+                recorder.frame(msg["bytes"])
 
-            if confidence < CONF_THRESHOLD:
-                plate_text = None
-
-            if plate_text and should_save_plate(plate_text):
-                save_live_detection(
-                    plate=plate_text.strip(),
-                    confidence=confidence
-                )
-
-            history_buffer.append({
-                "plate": plate_text,
-                "timestamp": time.time(),
-                "confidence": confidence,
-                "source": "live"
-            })
+            # Decoded in the executor, at reduced scale when the frame is large
+            frame_no += 1
+            result = await process_stream_frame(loop, msg["bytes"], "live", frame_no)
+            if result is None:
+                await ws.send_json({"type": "status", "message": "dropped"})
+                continue
+            if result["image"] is None:
+                continue
 
-            await ws.send_json({
-                "frame": encode_frame(annotated),
-                "plate": plate_text,
-                "confidence": confidence,
-                "timestamp": time.time()
-            })
+            message = await report_plates(result, "live", time.time())
+            message["frame"] = await preview.encode(result["annotated"])
+            await preview.send_json(ws, message)
 
     except WebSocketDisconnect:
-        print("[INFO] Webcam WS disconnected")
+        print(f"[INFO] Webcam WS disconnected (preview {preview.stats()})")
+
+    finally:
+        if recorder:
+            recorder.close()
@@ -0,0 +1,57 @@
+import os
+import re
+import shutil
+
+from fastapi import APIRouter, Depends, UploadFile, File
+
+from app.admin import require_admin
+
+from app.watchlist import watchlist
+
+router = APIRouter()
+
+LIST_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+@router.get("/")
+def watchlist_stats():
+    return watchlist.stats()
+
+
+@router.get("/match")
+def match_plate(plate: str):
+    return {"plate": plate, "hits": watchlist.current.match(plate)}
+
+
+@router.post("/reload", dependencies=[Depends(require_admin)])
+def reload_watchlists():
+    watchlist.reload(force=True)
+    return watchlist.stats()
+
+
+@router.put("/{list_name}", dependencies=[Depends(require_admin)])
+def upload_list(list_name: str, file: UploadFile = File(...)):
+    """Replace (or create) a list from an uploaded CSV of `plate[,reason]` rows"""
+    if not LIST_NAME.match(list_name):
+        return {"error": "List names may only contain letters, digits, '-' and '_'"}
+
+    os.makedirs(watchlist.directory, exist_ok=True)
+    path = os.path.join(watchlist.directory, f"{list_name}.csv")
+    tmp_path = path + ".upload"
+    with open(tmp_path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+    os.replace(tmp_path, path)
+
+    watchlist.reload()
+    return watchlist.stats()
+
+
+@router.delete("/{list_name}", dependencies=[Depends(require_admin)])
+def delete_list(list_name: str):
+    path = os.path.join(watchlist.directory, f"{list_name}.csv")
+    if not LIST_NAME.match(list_name) or not os.path.exists(path):
+        return {"error": "Not found"}
+
+    os.remove(path)
+    watchlist.reload()
+    return watchlist.stats()
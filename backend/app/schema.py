@@ -0,0 +1,25 @@
+from sqlalchemy import inspect
+
+from app import changes, rollups
+from app.database import SessionLocal, engine, ensure_columns, ensure_index
+from app.models import Base
+
+# Schema bootstrap shared by the server and the offline tools that write
+# detections, so whichever starts first leaves the database in the same state.
+
+
+def init_db():
+    """Create/upgrade the tables, backfill rollups when they are new, seed the change token"""
+    backfill_rollups = not inspect(engine).has_table("plates")
+    Base.metadata.create_all(bind=engine)
+    ensure_columns("detections", {"camera_id": "VARCHAR"})
+    ensure_index("ix_detections_source_timestamp", "detections", ["source", "timestamp"])
+
+    db = SessionLocal()
+    try:
+        if backfill_rollups:
+            # First start with rollup tables: fold in the history recorded before them
+            rollups.rebuild(db)
+        changes.seed(db)
+    finally:
+        db.close()
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from app.config import SHARED_STATE_PREFIX, SHARED_STATE_URL
+
+# Every backend implements the same small set of operations:
+#   set_if_absent(key, value, ttl) -> bool   atomic; True if this caller set it
+#   get(key, default=None) / set(key, value)
+#   incr(key, amount=1) -> int
+#   append(name, item, maxlen)                bounded list of JSON-able dicts
+#   items(name) -> list                       oldest first
+#
+# `shared` tells callers whether other processes can see the same state.
+
+
+# ===========================
+# IN-PROCESS
+# ===========================
+class MemoryState:
+    """Single-process backend (the default); nothing is shared between workers"""
+
+    shared = False
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._expiring = {}
+        self._lists = {}
+
+    def set_if_absent(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            if len(self._expiring) > 10000:
+                self._expiring = {k: v for k, v in self._expiring.items() if v[1] > now}
+
+            current = self._expiring.get(key)
+            if current and current[1] > now:
+                return False
+            self._expiring[key] = (value, now + ttl)
+            return True
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._values.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            return self._values[key]
+
+    def append(self, name, item, maxlen):
+        with self._lock:
+            items = self._lists.get(name)
+            if items is None or items.maxlen != maxlen:
+                items = self._lists[name] = deque(items or (), maxlen=maxlen)
+            items.append(item)
+
+    def items(self, name):
+        with self._lock:
+            return list(self._lists.get(name, ()))
+
+
+# ===========================
+# SQLITE (single host)
+# ===========================
+class SQLiteState:
+    """
+    Shared by every worker on one host. Point it at tmpfs
+    (e.g. sqlite:////dev/shm/roadeye-state.db) to keep it in memory.
+    """
+
+    shared = True
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._ops = 0
+        with self._conn() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS lists (seq INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, value TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_lists_name_seq ON lists (name, seq)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def set_if_absent(self, key, value, ttl):
+        now = time.time()
+        conn = self._conn()
+
+        # Insert, or take over an expired key; a live key leaves rowcount at 0
+        cursor = conn.execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE kv.expires_at IS NOT NULL AND kv.expires_at <= ?",
+            (key, json.dumps(value), now + ttl, now)
+        )
+
+        self._ops += 1
+        if self._ops % 1000 == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key, value):
+        self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, NULL) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = NULL",
+            (key, json.dumps(value))
+        )
+
+    def incr(self, key, amount=1):
+        return int(self._conn().execute(
+            "INSERT INTO kv (key, value, expires_at) VALUES (?, ?, NULL) "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(kv.value AS INTEGER) + excluded.value "
+            "RETURNING value",
+            (key, str(amount))
+        ).fetchone()[0])
+
+    def append(self, name, item, maxlen):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            seq = conn.execute(
+                "INSERT INTO lists (name, value) VALUES (?, ?)", (name, json.dumps(item))
+            ).lastrowid
+            conn.execute("DELETE FROM lists WHERE name = ? AND seq <= ?", (name, seq - maxlen))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def items(self, name):
+        rows = self._conn().execute("SELECT value FROM lists WHERE name = ? ORDER BY seq", (name,))
+        return [json.loads(value) for (value,) in rows]
+
+
+# ===========================
+# REDIS PROTOCOL (multi-host)
+# ===========================
+class RedisState:
+    """
+    Any server speaking the Redis protocol (Redis, Valkey, KeyDB, ...).
+    `client` can be passed in to use an existing or stand-in connection.
+    """
+
+    shared = True
+    name = "redis"
+
+    def __init__(self, url=None, prefix=SHARED_STATE_PREFIX, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key):
+        return f"{self.prefix}{key}"
+
+    def set_if_absent(self, key, value, ttl):
+        return bool(self.client.set(self._key(key), json.dumps(value), nx=True, px=max(1, int(ttl * 1000))))
+
+    def get(self, key, default=None):
+        value = self.client.get(self._key(key))
+        return json.loads(value) if value is not None else default
+
+    def set(self, key, value):
+        self.client.set(self._key(key), json.dumps(value))
+
+    def incr(self, key, amount=1):
+        return int(self.client.incr(self._key(key), amount))
+
+    def append(self, name, item, maxlen):
+        pipe = self.client.pipeline()
+        pipe.rpush(self._key(name), json.dumps(item))
+        pipe.ltrim(self._key(name), -maxlen, -1)
+        pipe.execute()
+
+    def items(self, name):
+        return [json.loads(value) for value in self.client.lrange(self._key(name), 0, -1)]
+
+
+def create_state(url):
+    if url.startswith("memory://"):
+        return MemoryState()
+    if url.startswith("sqlite:///"):
+        path = url[len("sqlite:///"):]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SQLiteState(path)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+
+_shared_state = None
+_shared_state_lock = threading.Lock()
+
+
+def get_shared_state():
+    global _shared_state
+    if _shared_state is None:
+        with _shared_state_lock:
+            if _shared_state is None:
+                _shared_state = create_state(SHARED_STATE_URL)
+                print(f"[STATE] Using {_shared_state.name} shared state backend")
+    return _shared_state
+
+
+# Shared backends block on disk (SQLite busy timeout) or the network, so
+# async code never calls them on the event loop
+state_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="shared-state")
+
+
+async def run_state(fn, *args):
+    """Run a shared state call off the event loop; the in-process backend runs inline"""
+    if not get_shared_state().shared:
+        return fn(*args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(state_executor, partial(fn, *args))
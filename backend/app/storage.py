@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import cv2
+import numpy as np
+
+from app.config import IMAGE_JPEG_QUALITY, IMAGE_STORE_WORKERS, THUMBNAIL_WIDTH
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(BASE_DIR, "uploads", "images")
+
+
+class ImageStore:
+    """
+    Content-addressed store for annotated images.
+
+    Files are named after a hash of the pixels, so the same annotated image
+    is encoded and written once no matter how many plates or re-uploads
+    point at it. Encoding runs on a small dedicated pool, never on the
+    event loop and never on the inference executor.
+    """
+
+    def __init__(self, root=IMAGE_DIR, url_prefix="/uploads/images", workers=IMAGE_STORE_WORKERS):
+        self.root = root
+        self.thumb_dir = os.path.join(root, "thumbs")
+        self.url_prefix = url_prefix
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-store")
+
+    def key(self, image: np.ndarray) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(str(image.shape).encode())
+        h.update(np.ascontiguousarray(image).data)
+        return h.hexdigest()
+
+    def save_sync(self, image, thumbnail=False, with_bytes=False):
+        """Store image (and optionally a thumbnail); returns URL paths and, if asked, the JPEG bytes"""
+        name = f"{self.key(image)}.jpg"
+        path = os.path.join(self.root, name)
+        data = None
+
+        if os.path.exists(path):
+            if with_bytes:
+                with open(path, "rb") as f:
+                    data = f.read()
+        else:
+            data = self._write(path, image)
+
+        result = {
+            "image_path": f"{self.url_prefix}/{name}",
+            "thumbnail_path": None,
+        }
+
+        if thumbnail:
+            thumb_path = os.path.join(self.thumb_dir, name)
+            if not os.path.exists(thumb_path):
+                self._write(thumb_path, self._thumbnail(image))
+            result["thumbnail_path"] = f"{self.url_prefix}/thumbs/{name}"
+
+        if with_bytes:
+            result["bytes"] = data
+        return result
+
+    async def save(self, image, thumbnail=False, with_bytes=False):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            partial(self.save_sync, image, thumbnail, with_bytes)
+        )
+
+    def thumbnail_for(self, image_path):
+        """Thumbnail URL path for an already stored image, writing it from the stored file if missing"""
+        name = os.path.splitext(os.path.basename(image_path))[0] + ".jpg"
+        thumb_path = os.path.join(self.thumb_dir, name)
+        if not os.path.exists(thumb_path):
+            image = cv2.imread(local_path(image_path))
+            if image is None:
+                return None
+            self._write(thumb_path, self._thumbnail(image))
+        return f"{self.url_prefix}/thumbs/{name}"
+
+    def _thumbnail(self, image):
+        h, w = image.shape[:2]
+        if w <= THUMBNAIL_WIDTH:
+            return image
+        scale = THUMBNAIL_WIDTH / w
+        return cv2.resize(image, (THUMBNAIL_WIDTH, max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    def _write(self, path, image):
+        ok, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, IMAGE_JPEG_QUALITY])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        data = buffer.tobytes()
+
+        # Write-then-rename so concurrent writers of the same key never expose a partial file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return data
+
+
+def local_path(image_path: str) -> str:
+    """Filesystem path for a stored /uploads/... URL path"""
+    return os.path.join(BASE_DIR, image_path.lstrip("/"))
+
+
+def remove_image_files(image_path: str):
+    """Delete a stored image and its thumbnail, if present"""
+    abs_path = local_path(image_path)
+    stem = os.path.splitext(os.path.basename(abs_path))[0]
+    thumb_path = os.path.join(os.path.dirname(abs_path), "thumbs", f"{stem}.jpg")
+    for path in (abs_path, thumb_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+_image_store = None
+
+
+def get_image_store():
+    global _image_store
+    if _image_store is None:
+        _image_store = ImageStore()
+    return _image_store
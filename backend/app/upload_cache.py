@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+from threading import Lock
+
+from sqlalchemy import delete, func, select, update
+
+from app.config import (
+    COUNTRY_CONFIG,
+    OCR_ACCEPT_CONF,
+    OCR_CASCADE_LEVELS,
+    PREPROCESS_PROFILE,
+    UPLOAD_CACHE_ENTRIES,
+)
+from app.database import SessionLocal
+from app.detector.engine import MODEL_PATH
+from app.models import Detection, UploadResult
+from app.storage import local_path
+
+
+def result_version():
+    """
+    Everything a /detect/image result depends on besides the bytes: the
+    detector weights (path, size, mtime), the selected country (the OCR
+    cascade's plate syntax) and the OCR settings. Entries written under
+    another version are misses. Watchlist verdicts are not part of it:
+    they are recomputed on every hit.
+    """
+    try:
+        st = os.stat(MODEL_PATH)
+        weights = f"{MODEL_PATH}:{st.st_size}:{int(st.st_mtime)}"
+    except OSError:
+        weights = f"{MODEL_PATH}:missing"
+    parts = (weights, COUNTRY_CONFIG.get(), PREPROCESS_PROFILE, OCR_ACCEPT_CONF, OCR_CASCADE_LEVELS)
+    return hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=8).hexdigest()
+
+
+class UploadCache:
+    """
+    Persistent LRU of /detect/image results keyed by a hash of the uploaded
+    bytes, in the upload_results table so every worker shares it.
+
+    A hit is only served while its evidence is intact: the rows it reported
+    must still exist with the same image (not deleted, not recompressed by
+    retention) and the image file must still be on disk. Otherwise the
+    entry is dropped and the upload goes through the detector again.
+    """
+
+    def __init__(self, max_entries=UPLOAD_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def lookup(self, key):
+        """The cached result dict for key, or None; bumps recency on a hit"""
+        version = result_version()
+        db = SessionLocal()
+        try:
+            entry = db.get(UploadResult, key)
+            result = json.loads(entry.result) if entry is not None and entry.version == version else None
+            if result is not None and not self._intact(db, result):
+                result = None
+                self._count("stale")
+            if result is None:
+                if entry is not None:
+                    db.delete(entry)
+                    db.commit()
+                self._count("misses")
+                return None
+
+            db.execute(
+                update(UploadResult)
+                .where(UploadResult.content_hash == key)
+                .values(last_used=datetime.utcnow(), hits=UploadResult.hits + 1)
+            )
+            db.commit()
+            self._count("hits")
+            return result
+        finally:
+            db.close()
+
+    def _intact(self, db, result):
+        ids = [d["id"] for d in result["detections"]]
+        if not ids:
+            return True
+        if not result["image_path"] or not os.path.exists(local_path(result["image_path"])):
+            return False
+        rows = db.execute(
+            select(Detection.id).where(Detection.id.in_(ids), Detection.image_path == result["image_path"])
+        ).all()
+        return len(rows) == len(ids)
+
+    def store(self, key, result):
+        """result: {"detections": [...], "image_path", "thumbnail_path"}; evicts least recently used entries"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            db.merge(UploadResult(
+                content_hash=key, version=result_version(), result=json.dumps(result),
+                created_at=now, last_used=now, hits=0,
+            ))
+            db.flush()
+            excess = db.scalar(select(func.count()).select_from(UploadResult)) - self.max_entries
+            if excess > 0:
+                oldest = select(UploadResult.content_hash).order_by(UploadResult.last_used).limit(excess)
+                db.execute(delete(UploadResult).where(UploadResult.content_hash.in_(oldest)))
+                self._count("evictions", excess)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def update_thumbnail(self, key, thumbnail_path):
+        db = SessionLocal()
+        try:
+            entry = db.get(UploadResult, key)
+            if entry is not None:
+                result = json.loads(entry.result)
+                result["thumbnail_path"] = thumbnail_path
+                entry.result = json.dumps(result)
+                db.commit()
+        finally:
+            db.close()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+            }
+
+
+upload_cache = UploadCache()
@@ -0,0 +1,235 @@
+import csv
+import itertools
+import os
+import re
+import time
+from threading import Event, Lock, Thread
+
+from app.config import (
+    WATCHLIST_ALERT_WINDOW_SEC,
+    WATCHLIST_DIR,
+    WATCHLIST_MAX_EDITS,
+    WATCHLIST_POLL_SEC,
+)
+from app.detector.plate_postprocess import LETTER_TO_DIGIT
+from app.events import event_bus
+
+# Every character maps to the representative of its OCR confusion class
+# (O/Q/D/0, I/L/1, Z/2, S/5, G/6, B/8), so confusable reads share a key.
+CONFUSION_TABLE = str.maketrans(LETTER_TO_DIGIT)
+WILDCARD = "*"
+
+
+def normalize(plate: str) -> str:
+    return re.sub(r"[^A-Z0-9]", "", (plate or "").upper())
+
+
+def canonical(plate: str) -> str:
+    return plate.translate(CONFUSION_TABLE)
+
+
+def _add(index, key, value):
+    """dict of key -> value, or -> list of values on collision (saves a list per key)"""
+    existing = index.get(key)
+    if existing is None:
+        index[key] = value
+    elif isinstance(existing, list):
+        existing.append(value)
+    else:
+        index[key] = [existing, value]
+
+
+def _get(index, key):
+    value = index.get(key)
+    if value is None:
+        return ()
+    return value if isinstance(value, list) else (value,)
+
+
+class Watchlist:
+    """
+    Compiled, read-only watchlist.
+
+    Entries are (plate, list_name, reason) tuples indexed by their
+    confusion-class key, so exact and confusion-tolerant matches are one
+    dict lookup. With max_edits=1, a wildcard index additionally matches
+    any single remaining substitution (one extra lookup per character).
+    """
+
+    def __init__(self, entries, max_edits=0):
+        self.max_edits = max_edits
+        self.size = 0
+        self.lists = {}
+        self._index = {}
+        self._wildcards = {} if max_edits else None
+
+        for plate, list_name, reason in entries:
+            key = canonical(plate)
+            _add(self._index, key, (plate, list_name, reason))
+            self.lists[list_name] = self.lists.get(list_name, 0) + 1
+            self.size += 1
+
+        if max_edits:
+            for key in self._index:
+                for i in range(len(key)):
+                    _add(self._wildcards, key[:i] + WILDCARD + key[i + 1:], key)
+
+    def match(self, text: str):
+        plate = normalize(text)
+        if not plate:
+            return []
+
+        key = canonical(plate)
+        hits = [
+            {"plate": p, "list": name, "reason": reason, "match": "exact" if p == plate else "confusion"}
+            for p, name, reason in _get(self._index, key)
+        ]
+        if hits or not self.max_edits:
+            return hits
+
+        seen = set()
+        for i in range(len(key)):
+            for candidate in _get(self._wildcards, key[:i] + WILDCARD + key[i + 1:]):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                hits.extend(
+                    {"plate": p, "list": name, "reason": reason, "match": "edit"}
+                    for p, name, reason in _get(self._index, candidate)
+                )
+        return hits
+
+
+def read_csv_entries(path, list_name):
+    """Yield (plate, list_name, reason) from a CSV of `plate[,reason]` rows"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if not row:
+                continue
+            plate = normalize(row[0])
+            if not plate or plate == "PLATE":  # blank or header row
+                continue
+            reason = row[1].strip() if len(row) > 1 and row[1].strip() else None
+            yield plate, list_name, reason
+
+
+class WatchlistManager:
+    """
+    Loads every `<list>.csv` in WATCHLIST_DIR and hot-swaps the compiled
+    Watchlist whenever the files change. Readers never block on a reload:
+    they keep using the previous Watchlist until the new one is ready.
+    """
+
+    def __init__(self, directory=WATCHLIST_DIR, max_edits=WATCHLIST_MAX_EDITS):
+        self.directory = directory
+        self.max_edits = max_edits
+        self.current = Watchlist([], max_edits)
+        self.loaded_at = None
+        self.load_seconds = 0.0
+        self._signature = None
+        self._reload_lock = Lock()
+        self._recent_alerts = {}
+        # check() runs on the event loop and on executor threads
+        self._alerts_lock = Lock()
+        self._stop = Event()
+        self._thread = None
+
+    def _files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+            if name.lower().endswith(".csv")
+        )
+
+    def _current_signature(self):
+        return tuple((path, os.path.getmtime(path), os.path.getsize(path)) for path in self._files())
+
+    def reload(self, force=False):
+        with self._reload_lock:
+            signature = self._current_signature()
+            if not force and signature == self._signature:
+                return False
+
+            start = time.perf_counter()
+            entries = itertools.chain.from_iterable(
+                read_csv_entries(path, os.path.splitext(os.path.basename(path))[0])
+                for path, _, _ in signature
+            )
+
+            self.current = Watchlist(entries, self.max_edits)
+            self._signature = signature
+            self.loaded_at = time.time()
+            self.load_seconds = time.perf_counter() - start
+            print(f"[WATCHLIST] Loaded {self.current.size} entries in {self.load_seconds:.2f}s")
+            return True
+
+    def start(self):
+        """Initial load plus a background thread polling for file changes"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.reload(force=True)
+        if self._thread is None:
+            self._thread = Thread(target=self._watch, name="watchlist-reload", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(WATCHLIST_POLL_SEC):
+            try:
+                self.reload()
+            except Exception as e:
+                print("[WATCHLIST] Reload failed:", e)
+
+    def match(self, plate):
+        """Hits for a plate against the current lists, without alerting (verdicts for old reads)"""
+        return self.current.match(plate)
+
+    def check(self, plate, confidence=None, source=None, camera_id=None, image_path=None):
+        """Match a new detection and publish a high-priority event per (rate-limited) hit"""
+        hits = self.match(plate)
+        if not hits:
+            return hits
+
+        now = time.time()
+        alerts = []
+        with self._alerts_lock:
+            if len(self._recent_alerts) > 10000:
+                self._recent_alerts = {
+                    k: t for k, t in self._recent_alerts.items() if now - t < WATCHLIST_ALERT_WINDOW_SEC
+                }
+
+            for hit in hits:
+                alert_key = (hit["plate"], hit["list"], camera_id or source)
+                last = self._recent_alerts.get(alert_key)
+                if last and now - last < WATCHLIST_ALERT_WINDOW_SEC:
+                    continue
+                self._recent_alerts[alert_key] = now
+                alerts.append(hit)
+
+        for hit in alerts:
+            event_bus.publish("watchlist_hit", {
+                **hit,
+                "plate_number": plate,
+                "confidence": confidence,
+                "source": source,
+                "camera_id": camera_id,
+                "image_path": image_path,
+                "timestamp": now,
+            }, priority=True)
+
+        return hits
+
+    def stats(self):
+        return {
+            "entries": self.current.size,
+            "lists": self.current.lists,
+            "max_edits": self.max_edits,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 3),
+        }
+
+
+watchlist = WatchlistManager()
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# All test modules share one throwaway database, set before anything
+# imports app.database. Run from backend/:
+#
+#     python -m unittest discover -s tests -t .
+_tmp = tempfile.mkdtemp(prefix="roadeye-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp}/test.db"
@@ -0,0 +1,69 @@
+"""
+Routes that change alerting or delete data need ADMIN_TOKEN.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import admin
+from app.retention import retention_service
+from app.routers import retention as retention_router
+from app.routers import watchlist as watchlist_router
+from app.watchlist import watchlist
+
+TOKEN = {"X-Admin-Token": "s3cret"}
+CSV = {"file": ("stolen.csv", b"KA01AB1234,stolen\n", "text/csv")}
+
+
+class AdminRoutesTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        for patch in (mock.patch.object(admin, "ADMIN_TOKEN", "s3cret"),
+                      mock.patch.object(watchlist, "directory", tmp.name)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        app = FastAPI()
+        app.include_router(watchlist_router.router, prefix="/watchlist")
+        app.include_router(retention_router.router, prefix="/retention")
+        self.client = TestClient(app)
+        self.directory = tmp.name
+
+    def test_watchlist_changes_need_the_token(self):
+        self.assertEqual(self.client.put("/watchlist/stolen", files=CSV).status_code, 403)
+        self.assertEqual(self.client.put("/watchlist/stolen", files=CSV, headers={"X-Admin-Token": "x"}).status_code, 403)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "stolen.csv")))
+
+        self.assertEqual(self.client.put("/watchlist/stolen", files=CSV, headers=TOKEN).status_code, 200)
+        self.assertEqual(self.client.delete("/watchlist/stolen").status_code, 403)
+        self.assertEqual(self.client.post("/watchlist/reload").status_code, 403)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "stolen.csv")))
+
+        self.assertEqual(self.client.delete("/watchlist/stolen", headers=TOKEN).status_code, 200)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "stolen.csv")))
+
+    def test_retention_run_needs_the_token(self):
+        with mock.patch.object(retention_service, "run_once", return_value={"rows_deleted": 0}) as run_once:
+            self.assertEqual(self.client.post("/retention/run").status_code, 403)
+            run_once.assert_not_called()
+            self.assertEqual(self.client.post("/retention/run", headers=TOKEN).json(), {"rows_deleted": 0})
+
+    def test_reads_stay_open(self):
+        self.assertEqual(self.client.get("/watchlist/").status_code, 200)
+        self.assertEqual(self.client.get("/watchlist/match", params={"plate": "KA01AB1234"}).status_code, 200)
+
+    def test_no_token_configured_disables_changes(self):
+        with mock.patch.object(admin, "ADMIN_TOKEN", None):
+            self.assertEqual(self.client.put("/watchlist/stolen", files=CSV, headers=TOKEN).status_code, 403)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Event bus delivery, Last-Event-ID replay and cross-worker sync.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from app import events
+from app.events import EventBus
+from app.shared_state import MemoryState, SQLiteState
+
+
+def detection(plate, source="image"):
+    return {"plate_number": plate, "source": source}
+
+
+async def drain(sub):
+    """Everything queued on sub right now"""
+    out = []
+    while True:
+        try:
+            out.append(await sub.get(timeout=0.05))
+        except asyncio.TimeoutError:
+            return out
+
+
+class EventBusTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.bus = EventBus(replay_size=100, state=MemoryState())
+        self.bus.bind(asyncio.get_running_loop())
+
+    async def test_live_delivery_with_filters(self):
+        sub = await self.bus.subscribe(source="camera", plate_prefix="ka")
+        self.bus.publish("detection", detection("KA01AB1234", "camera"))
+        self.bus.publish("detection", detection("KA01AB1234", "image"))
+        self.bus.publish("detection", detection("MH12A1234", "camera"))
+        self.assertEqual([e.data["plate_number"] for e in await drain(sub)], ["KA01AB1234"])
+
+    async def test_replay_after_last_event_id(self):
+        for plate in ("A1", "A2", "A3"):
+            self.bus.publish("detection", detection(plate))
+        sub = await self.bus.subscribe(last_event_id=1)
+        self.assertEqual([e.id for e in await drain(sub)], [2, 3])
+
+    async def test_event_published_while_replay_is_read(self):
+        self.bus.publish("detection", detection("A1"))
+        read = self.bus.recent
+
+        async def slow_recent(limit=None):
+            replay = await read(limit)
+            self.bus.publish("detection", detection("A2"))  # lands during the await
+            return replay
+
+        with mock.patch.object(self.bus, "recent", slow_recent):
+            sub = await self.bus.subscribe(last_event_id=0)
+        self.assertEqual([e.data["plate_number"] for e in await drain(sub)], ["A1", "A2"])
+
+    async def test_replayed_and_live_event_delivered_once(self):
+        read = self.bus.recent
+
+        async def racing_recent(limit=None):
+            self.bus.publish("detection", detection("A1"))  # both live and in the replay
+            return await read(limit)
+
+        with mock.patch.object(self.bus, "recent", racing_recent):
+            sub = await self.bus.subscribe(last_event_id=0)
+        self.assertEqual([e.id for e in await drain(sub)], [1])
+
+    async def test_priority_first_and_slow_consumer_drops_oldest(self):
+        sub = await self.bus.subscribe()
+        with mock.patch.object(events, "EVENT_SUBSCRIBER_QUEUE", 2):
+            for plate in ("A1", "A2", "A3"):
+                self.bus.publish("detection", detection(plate))
+            self.bus.publish("watchlist_hit", detection("A4"), priority=True)
+        self.assertEqual([e.data["plate_number"] for e in await drain(sub)], ["A4", "A2", "A3"])
+        self.assertEqual(sub.dropped, 1)
+
+
+class SharedEventBusTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "state.db")
+        patch = mock.patch.object(events, "EVENT_SYNC_SEC", 0.01)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        loop = asyncio.get_running_loop()
+        self.workers = []
+        for origin in ("worker-1", "worker-2"):
+            bus = EventBus(replay_size=100, state=SQLiteState(path), origin=origin)
+            bus.bind(loop)
+            self.addCleanup(bus.stop)
+            self.workers.append(bus)
+
+    def publish_from(self, index, *args, **kwargs):
+        bus = self.workers[index]
+        bus.publish(*args, **kwargs)
+        bus._writer.submit(lambda: None).result()  # stored
+
+    async def test_other_workers_events_are_delivered(self):
+        await asyncio.sleep(0.05)  # both sync loops have seen the (empty) buffer
+        sub = await self.workers[1].subscribe()
+        self.publish_from(0, "detection", detection("A1"))
+        await asyncio.sleep(0.1)
+        self.assertEqual([e.data["plate_number"] for e in await drain(sub)], ["A1"])
+
+    async def test_own_events_are_not_delivered_twice(self):
+        await asyncio.sleep(0.05)
+        sub = await self.workers[0].subscribe()
+        self.publish_from(0, "detection", detection("A1"))
+        await asyncio.sleep(0.1)
+        self.assertEqual([e.id for e in await drain(sub)], [1])
+
+    async def test_ids_are_shared_and_replayed_everywhere(self):
+        self.publish_from(0, "detection", detection("A1"))
+        self.publish_from(1, "detection", detection("A2"))
+        sub = await self.workers[1].subscribe(last_event_id=0)
+        self.assertEqual([(e.id, e.data["plate_number"]) for e in await drain(sub)], [(1, "A1"), (2, "A2")])
+
+
+if __name__ == "__main__":
+    unittest.main()
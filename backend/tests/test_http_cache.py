@@ -0,0 +1,164 @@
+"""
+Conditional GET on the history and stats routes.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import unittest
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, insert
+
+from app import changes, rollups
+from app.database import SessionLocal, engine
+from app.http_cache import response_cache
+from app.models import Base, Detection, TableChange
+from app.routers import history, stats
+from tools import ingest
+
+
+def detection(plate="KA01AB1234"):
+    return {
+        "plate_number": plate,
+        "confidence": 0.9,
+        "source": "image",
+        "camera_id": None,
+        "timestamp": datetime(2026, 10, 19, 10, 0),
+    }
+
+
+class ConditionalGetTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        try:
+            changes.seed(db)
+        finally:
+            db.close()
+        app = FastAPI()
+        app.include_router(history.router, prefix="/history")
+        app.include_router(stats.router, prefix="/stats")
+        cls.client = TestClient(app)
+
+    def setUp(self):
+        response_cache.invalidate()
+        self.add_orm()
+
+    def add_orm(self, plate="KA01AB1234"):
+        db = SessionLocal()
+        try:
+            db.add(Detection(**detection(plate)))
+            db.commit()
+        finally:
+            db.close()
+
+    def write_core(self, statement, params=None):
+        """A write by another process: no ORM hook, and no in-process invalidation"""
+        db = SessionLocal()
+        try:
+            db.execute(statement, params)
+            changes.bump(db)
+            db.commit()
+        finally:
+            db.close()
+        response_cache.invalidate()  # ours only; the token alone has to move
+
+    def revision(self):
+        db = SessionLocal()
+        try:
+            return db.get(TableChange, changes.TABLE).revision
+        finally:
+            db.close()
+
+    def get(self, path="/history/", etag=None):
+        return self.client.get(path, headers={"If-None-Match": etag} if etag else {})
+
+    def test_matching_etag_gets_304(self):
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        again = self.get(etag=first.headers["etag"])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+        self.assertEqual(again.headers["etag"], first.headers["etag"])
+
+    def test_stale_etag_gets_body(self):
+        self.assertEqual(self.get(etag='W/"0-0"').status_code, 200)
+
+    def test_body_reused_while_unchanged(self):
+        self.get("/stats/summary")
+        hits = response_cache.hits
+        second = self.get("/stats/summary")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(response_cache.hits, hits + 1)
+
+    def test_orm_insert_invalidates(self):
+        etag = self.get().headers["etag"]
+        self.add_orm("MH12A1234")
+        after = self.get(etag=etag)
+        self.assertEqual(after.status_code, 200)
+        self.assertIn("MH12A1234", after.text)
+
+    def test_insert_leaves_revision_row_alone(self):
+        before = self.revision()
+        self.add_orm("KL07CD4321")
+        ingest.commit_rows([detection("KL07CD4322")])
+        self.assertEqual(self.revision(), before)
+
+    def test_update_in_same_second_invalidates(self):
+        first = self.get()
+        db = SessionLocal()
+        try:
+            db.query(Detection).filter_by(plate_number="KA01AB1234").first().plate_number = "KA01AB9999"
+            db.commit()
+        finally:
+            db.close()
+        self.assertNotIn("last-modified", first.headers)
+        after = self.get(etag=first.headers["etag"])
+        self.assertEqual(after.status_code, 200)
+        self.assertIn("KA01AB9999", after.text)
+        # A date-only revalidation never short-circuits to a stale 304
+        self.assertEqual(self.client.get("/history/", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}).status_code, 200)
+
+    def test_other_process_insert_invalidates(self):
+        etag = self.get().headers["etag"]
+        db = SessionLocal()
+        try:
+            db.execute(insert(Detection.__table__), [detection("DL3CAB1234")])
+            db.commit()
+        finally:
+            db.close()
+        after = self.get(etag=etag)
+        self.assertEqual(after.status_code, 200)
+        self.assertIn("DL3CAB1234", after.text)
+
+    def test_other_process_delete_invalidates(self):
+        etag = self.get().headers["etag"]
+        det = Detection.__table__
+        self.write_core(delete(det).where(det.c.plate_number == "KA01AB1234"))
+        after = self.get(etag=etag)
+        self.assertEqual(after.status_code, 200)
+        self.assertNotIn("KA01AB1234", after.text)
+
+    def test_ingest_invalidates(self):
+        etag = self.get("/stats/summary").headers["etag"]
+        ingest.commit_rows([detection("TN09BC5678")])
+        response_cache.invalidate()  # as seen from the server process
+        after = self.get("/stats/summary", etag=etag)
+        self.assertEqual(after.status_code, 200)
+        self.assertNotEqual(after.headers["etag"], etag)
+
+    def test_rollup_rebuild_invalidates(self):
+        etag = self.get("/stats/summary").headers["etag"]
+        db = SessionLocal()
+        try:
+            rollups.rebuild(db)
+        finally:
+            db.close()
+        self.assertEqual(self.get("/stats/summary", etag=etag).status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Reduced-scale decoding and EXIF orientation.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import struct
+import unittest
+
+import cv2
+import numpy as np
+
+from app.detector.engine import _crop, _decode
+from app.jpeg import decode_region, jpeg_orientation, jpeg_size, reduction_for
+
+
+def jpeg(width=1600, height=1200, orientation=None):
+    """Gradient JPEG, optionally with an APP1 EXIF block carrying the orientation tag"""
+    image = np.zeros((height, width, 3), np.uint8)
+    image[:, :, 0] = np.arange(width, dtype=np.uint32)[None, :] % 256
+    image[:, :, 1] = np.arange(height, dtype=np.uint32)[:, None] % 256
+    data = cv2.imencode(".jpg", image)[1].tobytes()
+    if orientation is None:
+        return data
+    # Big-endian TIFF header, IFD0 at 8 with one SHORT entry: 0x0112 = orientation
+    tiff = b"MM\0\x2a" + struct.pack(">I", 8) + struct.pack(">H", 1)
+    tiff += struct.pack(">HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack(">I", 0)
+    app1 = b"Exif\0\0" + tiff
+    return data[:2] + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + data[2:]
+
+
+class OrientationTest(unittest.TestCase):
+    def test_tag_is_read(self):
+        self.assertEqual(jpeg_orientation(jpeg()), 1)
+        self.assertEqual(jpeg_orientation(jpeg(orientation=6)), 6)
+        self.assertEqual(jpeg_orientation(b"not a jpeg"), 1)
+
+    def test_rotated_jpeg_is_not_reduced(self):
+        self.assertEqual(reduction_for(jpeg(), 640), 2)
+        self.assertEqual(reduction_for(jpeg(orientation=6), 640), 1)
+        self.assertIsNone(decode_region(jpeg(orientation=6), 0, 0, 16, 16))
+
+    def test_geometry_matches_the_decoded_image(self):
+        for orientation in (1, 6):
+            data = jpeg(orientation=orientation)
+            frame = {"data": data}
+            _decode([frame], reduce_to=400)
+            image = frame["image"]
+            width, height = frame["size"]
+            # size / scale describe the image the boxes were found on
+            self.assertAlmostEqual(image.shape[1] * frame["scale"], width)
+            self.assertAlmostEqual(image.shape[0] * frame["scale"], height)
+            if orientation == 6:
+                self.assertEqual((width, height), (1200, 1600))
+            else:
+                self.assertEqual((width, height), jpeg_size(data))
+
+            box = (100, 200, 300, 260)
+            frame["plates"] = [{"bbox": box}]
+            _crop([frame])
+            full = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            x1, y1, x2, y2 = box
+            crop = frame["plates"][0]["crop"]
+            self.assertEqual(crop.shape, full[y1:y2, x1:x2].shape)
+            self.assertLess(np.abs(crop.astype(int) - full[y1:y2, x1:x2]).mean(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""
+ModelManager loads and evictions under a memory budget.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import threading
+import unittest
+from unittest import mock
+
+from app.detector import lifecycle
+from app.detector.lifecycle import ModelManager
+
+
+class FakeMemory:
+    """resident_mb() stand-in: loaders add to it, unloads give it back"""
+
+    def __init__(self):
+        self.mb = 100.0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            return self.mb
+
+    def add(self, mb):
+        with self.lock:
+            self.mb += mb
+
+
+class BudgetTest(unittest.TestCase):
+    def setUp(self):
+        self.memory = FakeMemory()
+        patches = [
+            mock.patch.object(lifecycle, "resident_mb", self.memory),
+            mock.patch.object(lifecycle, "_release_memory", lambda: None),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.manager = ModelManager(idle_sec=0, budget_mb=100)
+
+    def loader(self, name, mb, started=None, go=None):
+        def load():
+            if started is not None:
+                started.set()
+                go.wait(5)
+            self.memory.add(mb)
+            return f"model-{name}"
+        return load
+
+    def test_lru_model_is_evicted_to_fit(self):
+        self.manager.register("a", self.loader("a", 80))
+        self.manager.register("b", self.loader("b", 80))
+        self.assertEqual(self.manager.get("a"), "model-a")
+        self.assertEqual(self.manager.get("b"), "model-b")
+        models = self.manager.stats()["models"]
+        self.assertFalse(models["a"]["loaded"])
+        self.assertEqual(models["a"]["evictions"], 1)
+        self.assertTrue(models["b"]["loaded"])
+
+    def test_concurrent_loads_that_evict_each_other_finish(self):
+        # Both loads finish, then both make room for themselves at once:
+        # each has to unload the other's model
+        barrier = threading.Barrier(2, timeout=2)
+        make_room = self.manager._make_room
+
+        def meet_then_make_room(name, needed_mb):
+            if needed_mb:  # after a load, once its size is known
+                try:
+                    barrier.wait()
+                except threading.BrokenBarrierError:
+                    pass
+            make_room(name, needed_mb)
+
+        self.manager._make_room = meet_then_make_room
+        go = threading.Event()
+        started = {"yolo": threading.Event(), "easyocr": threading.Event()}
+        for name in started:
+            self.manager.register(name, self.loader(name, 80, started[name], go))
+
+        results = {}
+        threads = [
+            threading.Thread(target=lambda n=name: results.__setitem__(n, self.manager.get(n)), daemon=True)
+            for name in started
+        ]
+        for t in threads:
+            t.start()
+        for event in started.values():
+            self.assertTrue(event.wait(2))
+        go.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertFalse(any(t.is_alive() for t in threads), "get() deadlocked")
+        self.assertEqual(results, {"yolo": "model-yolo", "easyocr": "model-easyocr"})
+
+
+if __name__ == "__main__":
+    unittest.main()
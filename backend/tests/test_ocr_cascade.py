@@ -0,0 +1,152 @@
+"""
+PlateOCR early-exit cascade and the vote, with a scripted OCR engine in
+place of EasyOCR.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import unittest
+from collections import defaultdict
+from unittest import mock
+
+import numpy as np
+
+from app.detector import ocr
+from app.detector.ocr import PlateOCR, vote
+from app.detector.plate_postprocess import apply_plate_syntax, matches_syntax
+
+
+class _Identity:
+    def run_batch(self, images):
+        return list(images)
+
+
+def crop(n):
+    """A crop tagged with its index in the top-left pixel"""
+    img = np.zeros((30, 100, 3), dtype=np.uint8)
+    img[0, 0] = n
+    return img
+
+
+class ScriptedEngine:
+    """Crop n gets readings[n][k] on its k-th OCR call, then ("", 0.0)"""
+
+    def __init__(self, readings):
+        self.readings = readings
+        self.calls = defaultdict(int)
+
+    def __call__(self, img, **params):
+        n = int(img[0, 0, 0])
+        k = self.calls[n]
+        self.calls[n] += 1
+        script = self.readings.get(n, [])
+        return script[k] if k < len(script) else ("", 0.0)
+
+
+class CascadeTest(unittest.TestCase):
+    def run_cascade(self, readings, crops=None, country="IN", **kwargs):
+        engine = ScriptedEngine(readings)
+        patches = [
+            mock.patch.dict(ocr.ENGINES, {"easyocr": engine}),
+            mock.patch.object(ocr, "pytesseract", None),  # levels: 1, 2 and 1 EasyOCR calls
+            mock.patch.object(ocr, "get_pipeline", lambda profile=None: _Identity()),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        reader = PlateOCR(accept_conf=0.5)
+        crops = crops if crops is not None else [crop(n) for n in sorted(readings)]
+        return reader.cascade(crops, country=country, **kwargs), engine.calls, reader
+
+    def test_ten_character_in_plate_exits_at_first_level(self):
+        results, calls, _ = self.run_cascade({0: [("KA01AB1234", 0.9)]})
+        self.assertEqual(results[0]["text"], "KA01AB1234")
+        self.assertEqual(results[0]["level"], 0)
+        self.assertEqual(calls[0], 1)
+
+    def test_nine_character_in_plate_exits_at_first_level(self):
+        results, calls, _ = self.run_cascade({0: [("MH12A1234", 0.9)]})
+        self.assertEqual(results[0]["text"], "MH12A1234")
+        self.assertEqual(results[0]["level"], 0)
+        self.assertEqual(calls[0], 1)
+
+    def test_selected_country_is_used_by_default(self):
+        with mock.patch.object(ocr.COUNTRY_CONFIG, "get", return_value="UK"):
+            results, calls, _ = self.run_cascade({0: [("AB12CDE", 0.9)]}, country=None)
+        self.assertEqual(results[0]["level"], 0)
+        self.assertEqual(calls[0], 1)
+
+    def test_unknown_country_accepts_on_confidence(self):
+        results, calls, _ = self.run_cascade({0: [("XYZ123", 0.9)]}, country="FR")
+        self.assertEqual(results[0]["level"], 0)
+        self.assertEqual(calls[0], 1)
+
+    def test_low_confidence_escalates(self):
+        results, calls, _ = self.run_cascade({0: [("KA01AB1234", 0.3), ("KA01AB1234", 0.8), ("", 0.0)]})
+        self.assertEqual(results[0]["level"], 1)
+        self.assertEqual(results[0]["conf"], 0.8)
+        self.assertEqual(calls[0], 3)
+
+    def test_only_unresolved_crops_escalate(self):
+        results, calls, _ = self.run_cascade({
+            0: [("KA01AB1234", 0.9)],
+            1: [("KA01AB12", 0.9), ("KA01AB1234", 0.7)],
+        })
+        self.assertEqual([r["level"] for r in results], [0, 1])
+        self.assertEqual(calls[0], 1)
+        self.assertEqual(calls[1], 3)
+
+    def test_unresolved_crop_is_voted(self):
+        results, calls, reader = self.run_cascade({0: [("KA01AB12", 0.4), ("KA01AB1234", 0.35), ("KA01AB12", 0.2)]})
+        # 0.6 for the short reading against 0.35 x SYNTAX_WEIGHT for the valid one
+        self.assertEqual(results[0]["level"], "vote")
+        self.assertEqual(results[0]["text"], "KA01AB1234")
+        self.assertEqual(calls[0], 4)
+        self.assertEqual(reader.stats()["voted"], 1)
+
+    def test_max_levels_stops_escalation(self):
+        results, calls, _ = self.run_cascade({0: [("KA01AB1234", 0.3)]}, max_levels=1)
+        self.assertEqual(results[0]["level"], "vote")
+        self.assertEqual(results[0]["text"], "KA01AB1234")
+        self.assertEqual(calls[0], 1)
+
+    def test_empty_crops_are_not_read(self):
+        results, calls, reader = self.run_cascade({}, crops=[None, np.zeros((0, 0, 3), dtype=np.uint8)])
+        self.assertEqual([r["level"] for r in results], [None, None])
+        self.assertEqual(sum(calls.values()), 0)
+        self.assertEqual(reader.stats()["levels"][0]["crops"], 0)
+
+
+class VoteTest(unittest.TestCase):
+    def test_confidences_add_up_per_text(self):
+        self.assertEqual(vote([("KA01AB1234", 0.4), ("KA01AB1284", 0.6), ("KA01AB1234", 0.3)]), ("KA01AB1234", 0.4))
+
+    def test_syntax_valid_readings_weigh_more(self):
+        self.assertEqual(vote([("KA01AB1234", 0.4), ("KA01AB123", 0.7)]), ("KA01AB1234", 0.4))
+
+    def test_country_layout_is_used(self):
+        self.assertEqual(vote([("AB12CDE", 0.4), ("KA01AB1234", 0.7)], country="UK"), ("AB12CDE", 0.4))
+
+    def test_nothing_read(self):
+        self.assertEqual(vote([]), ("", 0.0))
+        self.assertEqual(vote([("", 0.9)]), ("", 0.0))
+
+
+class SyntaxTest(unittest.TestCase):
+    def test_in_layouts(self):
+        self.assertTrue(matches_syntax("KA01AB1234", "IN"))
+        self.assertTrue(matches_syntax("MH12A1234", "IN"))
+        self.assertFalse(matches_syntax("KA01AB123", "IN"))
+        self.assertFalse(matches_syntax("", "IN"))
+
+    def test_correction_uses_the_layout_of_that_length(self):
+        self.assertEqual(apply_plate_syntax("MH1ZA1Z34", "IN"), "MH12A1234")
+        self.assertEqual(apply_plate_syntax("KA0IAB1Z34", "IN"), "KA01AB1234")
+
+    def test_unknown_country(self):
+        self.assertTrue(matches_syntax("ANYTHING1", "FR"))
+        self.assertFalse(matches_syntax("", "FR"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+The sampling profiler's torch tables come from the threads that run
+inference. torch itself is replaced by a recorder that, like the real
+profiler, only sees ops on the thread that started it.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import sys
+import threading
+import time
+import types
+import unittest
+from unittest import mock
+
+from app.profiling import SamplingProfiler
+
+_local = threading.local()
+
+
+def op(name):
+    """An op as inference would run it: recorded only by a profiler started on this thread"""
+    recorder = getattr(_local, "recorder", None)
+    if recorder is not None:
+        recorder.append(name)
+
+
+class _Avg:
+    def __init__(self, key, count):
+        self.key, self.count = key, count
+        self.self_cpu_time_total = self.cpu_time_total = 1000.0 * count
+
+
+class _ThreadProfiler:
+    def __init__(self, activities):
+        self.ops = []
+
+    def start(self):
+        _local.recorder = self.ops
+
+    def stop(self):
+        _local.recorder = None
+
+    def key_averages(self):
+        return [_Avg(name, self.ops.count(name)) for name in sorted(set(self.ops))]
+
+
+def fake_torch():
+    profiler = types.ModuleType("torch.profiler")
+    profiler.profile = _ThreadProfiler
+    profiler.ProfilerActivity = types.SimpleNamespace(CPU="cpu")
+    torch = types.ModuleType("torch")
+    torch.profiler = profiler
+    return {"torch": torch, "torch.profiler": profiler}
+
+
+class TorchOpsTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.dict(sys.modules, fake_torch())
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.profiler = SamplingProfiler()
+
+    def inference(self, stop):
+        while not stop.is_set():
+            with self.profiler.torch_ops():
+                op("aten::conv2d")
+                op("aten::relu")
+            self.profiler.tick()
+            time.sleep(0.005)
+
+    def test_ops_on_inference_threads_are_recorded(self):
+        stop = threading.Event()
+        workers = [threading.Thread(target=self.inference, args=(stop,)) for _ in range(3)]
+        for w in workers:
+            w.start()
+        try:
+            result = self.profiler.run(seconds=5, frames=20, interval=0.002, torch_ops=True)
+        finally:
+            stop.set()
+            for w in workers:
+                w.join()
+
+        torch = result["torch"]
+        self.assertGreater(torch["calls_profiled"], 0)
+        ops = {o["op"]: o["calls"] for o in torch["ops"]}
+        self.assertEqual(set(ops), {"aten::conv2d", "aten::relu"})
+        self.assertEqual(ops["aten::conv2d"], torch["calls_profiled"])
+
+    def test_no_profiling_outside_a_torch_session(self):
+        with self.profiler.torch_ops():
+            self.assertIsNone(getattr(_local, "recorder", None))
+        self.assertEqual(self.profiler.run(seconds=0.05, torch_ops=False).get("torch"), None)
+
+    def test_overlapping_calls_run_unprofiled(self):
+        self.profiler._torch_active = True
+        with self.profiler.torch_ops():
+            with self.profiler.torch_ops():
+                op("aten::add")  # still recorded once, by the outer call
+        self.profiler._torch_active = False
+        self.assertEqual(self.profiler._torch_top()["calls_profiled"], 1)
+
+    def test_missing_torch_is_reported(self):
+        with mock.patch.dict(sys.modules, {"torch": None, "torch.profiler": None}):
+            self.profiler._torch_active = True
+            with self.profiler.torch_ops():
+                pass
+            self.profiler._torch_active = False
+        self.assertIn("error", self.profiler._torch_top())
+
+
+if __name__ == "__main__":
+    unittest.main()
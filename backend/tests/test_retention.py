@@ -0,0 +1,166 @@
+"""
+Retention: WebP compression of shared images, expiry with rollups, and
+the opt-in defaults.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import glob
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import cv2
+import numpy as np
+from sqlalchemy import delete, func, select
+
+from app import retention, storage
+from app.database import SessionLocal, engine
+from app.models import Base, Detection, HourlyStat, PlateSummary, TableChange
+from app.retention import RetentionService
+
+
+def days_ago(n):
+    return datetime.utcnow() - timedelta(days=n)
+
+
+class RetentionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        Base.metadata.create_all(bind=engine)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        os.makedirs(os.path.join(self.root, "uploads", "images"))
+        for patch in (
+            mock.patch.object(storage, "BASE_DIR", self.root),
+            mock.patch.object(retention, "ARCHIVE_DIR", os.path.join(self.root, "archive")),
+            mock.patch.object(retention, "RETENTION_BATCH_PAUSE_SEC", 0),
+            mock.patch.object(retention, "RETENTION_POLICIES", {}),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        db = SessionLocal()
+        try:
+            for table in (Detection, PlateSummary, HourlyStat):
+                db.execute(delete(table))
+            db.commit()
+        finally:
+            db.close()
+
+    def policies(self, policies):
+        patch = mock.patch.object(retention, "RETENTION_POLICIES", policies)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def image(self, name, readable=True):
+        path = f"/uploads/images/{name}.jpg"
+        with open(storage.local_path(path), "wb") as f:
+            if readable:
+                f.write(cv2.imencode(".jpg", np.full((40, 120, 3), 90, np.uint8))[1].tobytes())
+            else:
+                f.write(b"not a jpeg")
+        return path
+
+    def add(self, plate, source, when, image_path):
+        db = SessionLocal()
+        try:
+            db.add(Detection(plate_number=plate, confidence=0.9, source=source, timestamp=when, image_path=image_path))
+            db.commit()
+        finally:
+            db.close()
+
+    def image_paths(self):
+        db = SessionLocal()
+        try:
+            return dict(db.execute(select(Detection.plate_number, Detection.image_path)).all())
+        finally:
+            db.close()
+
+    def revision(self):
+        db = SessionLocal()
+        try:
+            row = db.get(TableChange, "detections")
+            return row.revision if row else 0
+        finally:
+            db.close()
+
+    def test_nothing_happens_without_a_policy(self):
+        self.add("OLD1", "image", days_ago(400), self.image("a"))
+        result = RetentionService().run_once()
+        self.assertNotIn("images_compressed", result)
+        self.assertNotIn("rows_deleted", result)
+        self.assertEqual(self.image_paths(), {"OLD1": "/uploads/images/a.jpg"})
+
+    def test_compress_skips_images_shared_with_newer_rows_or_other_sources(self):
+        self.policies({"image": {"compress_after_days": 30}})
+        self.add("OLD1", "image", days_ago(60), self.image("own"))
+        shared_new = self.image("shared-new")
+        self.add("OLD2", "image", days_ago(60), shared_new)
+        self.add("NEW2", "image", days_ago(1), shared_new)
+        shared_source = self.image("shared-source")
+        self.add("OLD3", "image", days_ago(60), shared_source)
+        self.add("CAM3", "camera", days_ago(60), shared_source)
+        before = self.revision()
+
+        result = RetentionService().run_once()
+
+        self.assertEqual(result["images_compressed"], 1)
+        self.assertEqual(self.image_paths(), {
+            "OLD1": "/uploads/images/own.webp",
+            "OLD2": shared_new,
+            "NEW2": shared_new,
+            "OLD3": shared_source,
+            "CAM3": shared_source,
+        })
+        self.assertTrue(os.path.exists(storage.local_path("/uploads/images/own.webp")))
+        self.assertFalse(os.path.exists(storage.local_path("/uploads/images/own.jpg")))
+        self.assertTrue(os.path.exists(storage.local_path(shared_new)))
+        self.assertGreater(self.revision(), before)
+
+    def test_unconvertible_image_is_skipped_and_the_rest_continue(self):
+        self.policies({"image": {"compress_after_days": 30}})
+        self.add("BAD", "image", days_ago(60), self.image("bad", readable=False))
+        self.add("GOOD", "image", days_ago(60), self.image("good"))
+
+        result = RetentionService().run_once()
+
+        self.assertEqual((result["images_compressed"], result["images_skipped"]), (1, 1))
+        self.assertEqual(self.image_paths()["BAD"], "/uploads/images/bad.jpg")
+        self.assertEqual(self.image_paths()["GOOD"], "/uploads/images/good.webp")
+        self.assertFalse(glob.glob(os.path.join(self.root, "uploads", "images", "*.tmp.webp")))
+
+    def test_expire_archives_deletes_and_updates_rollups(self):
+        self.policies({"image": {"delete_after_days": 30}})
+        shared = self.image("shared")
+        self.add("GONE", "image", days_ago(60), self.image("gone"))
+        self.add("KEPT", "image", days_ago(60), shared)
+        self.add("KEPT", "image", days_ago(1), shared)
+        before = self.revision()
+
+        result = RetentionService().run_once()
+
+        self.assertEqual((result["rows_deleted"], result["rows_archived"]), (2, 2))
+        self.assertEqual(self.image_paths(), {"KEPT": shared})
+        self.assertFalse(os.path.exists(storage.local_path("/uploads/images/gone.jpg")))
+        self.assertTrue(os.path.exists(storage.local_path(shared)))
+        self.assertTrue(glob.glob(os.path.join(self.root, "archive", "detections", "source=image", "part-*")))
+        self.assertGreater(self.revision(), before)
+
+        db = SessionLocal()
+        try:
+            summaries = {p.plate_number: p.sightings for p in db.scalars(select(PlateSummary))}
+            hourly = db.scalar(select(func.sum(HourlyStat.detections)))
+        finally:
+            db.close()
+        self.assertEqual(summaries, {"KEPT": 1})
+        self.assertEqual(hourly, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Schema bootstrap on a database from before camera_id and the rollups,
+run in a child process so it gets a database of its own.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OLD_SCHEMA = """
+CREATE TABLE detections (
+    id INTEGER PRIMARY KEY, plate_number VARCHAR, confidence FLOAT, source VARCHAR,
+    timestamp DATETIME, image_path VARCHAR, video_timestamp FLOAT
+);
+INSERT INTO detections (plate_number, confidence, source, timestamp)
+VALUES ('KA01AB1234', 0.9, 'image', '2026-10-19 10:00:00.000000'),
+       ('KA01AB1234', 0.8, 'image', '2026-10-19 11:00:00.000000');
+"""
+
+
+class InitDbTest(unittest.TestCase):
+    def run_child(self, path, code):
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}"}
+        subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env, check=True, capture_output=True)
+
+    def test_first_bootstrap_upgrades_and_backfills(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "old.db")
+            with sqlite3.connect(path) as conn:
+                conn.executescript(OLD_SCHEMA)
+
+            # What tools.ingest does before its first commit
+            self.run_child(path, "from app.schema import init_db; init_db()")
+            # The server starting later must not find empty rollups it will never fill
+            self.run_child(path, "from app.schema import init_db; init_db()")
+
+            with sqlite3.connect(path) as conn:
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(detections)")}
+                sightings = conn.execute("SELECT sightings FROM plates WHERE plate_number = 'KA01AB1234'").fetchone()
+                hours = conn.execute("SELECT SUM(detections) FROM hourly_stats").fetchone()
+                tokens = conn.execute("SELECT COUNT(*) FROM table_changes").fetchone()
+            self.assertIn("camera_id", columns)
+            self.assertEqual(sightings, (2,))
+            self.assertEqual(hours, (2,))
+            self.assertEqual(tokens, (1,))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+The shared state backends against the same contract: in-process, SQLite
+on a temp file, and the Redis protocol through fakeredis (skipped when it
+is not installed).
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from app import config, shared_state
+from app.shared_state import MemoryState, RedisState, SQLiteState, create_state
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class StateContract:
+    """Mixed into one TestCase per backend; make_state() returns a fresh backend"""
+
+    def setUp(self):
+        self.state = self.make_state()
+
+    def test_set_if_absent_is_exclusive_until_expiry(self):
+        self.assertTrue(self.state.set_if_absent("dedup:KA01", 1, ttl=0.2))
+        self.assertFalse(self.state.set_if_absent("dedup:KA01", 2, ttl=0.2))
+        self.assertTrue(self.state.set_if_absent("dedup:MH12", 1, ttl=0.2))
+        time.sleep(0.3)
+        self.assertTrue(self.state.set_if_absent("dedup:KA01", 3, ttl=0.2))
+
+    def test_set_if_absent_has_one_winner_across_threads(self):
+        wins = []
+        barrier = threading.Barrier(8)
+
+        def race():
+            barrier.wait()
+            wins.append(self.state.set_if_absent("dedup:race", 1, ttl=5))
+
+        threads = [threading.Thread(target=race) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(wins.count(True), 1)
+
+    def test_get_set(self):
+        self.assertIsNone(self.state.get("config:country"))
+        self.assertEqual(self.state.get("config:country", "IN"), "IN")
+        self.state.set("config:country", "UK")
+        self.assertEqual(self.state.get("config:country"), "UK")
+
+    def test_incr(self):
+        self.assertEqual(self.state.incr("events:last_id"), 1)
+        self.assertEqual(self.state.incr("events:last_id"), 2)
+        self.assertEqual(self.state.incr("events:last_id", 5), 7)
+
+    def test_append_keeps_the_newest_maxlen_items(self):
+        for i in range(5):
+            self.state.append("events", {"id": i}, maxlen=3)
+        self.assertEqual(self.state.items("events"), [{"id": 2}, {"id": 3}, {"id": 4}])
+        self.assertEqual(self.state.items("other"), [])
+
+
+class MemoryStateTest(StateContract, unittest.TestCase):
+    def make_state(self):
+        return MemoryState()
+
+
+class SQLiteStateTest(StateContract, unittest.TestCase):
+    def make_state(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "state.db")
+        return create_state(f"sqlite:///{self.path}")
+
+    def test_workers_share_state(self):
+        other = SQLiteState(self.path)  # a second worker on the same file
+        self.assertTrue(self.state.set_if_absent("dedup:KA01", 1, ttl=5))
+        self.assertFalse(other.set_if_absent("dedup:KA01", 1, ttl=5))
+        self.state.append("events", {"id": 1}, maxlen=10)
+        other.append("events", {"id": 2}, maxlen=10)
+        self.assertEqual(other.items("events"), [{"id": 1}, {"id": 2}])
+        self.assertEqual(other.incr("events:last_id"), 1)
+        self.assertEqual(self.state.incr("events:last_id"), 2)
+
+    def test_expired_keys_read_as_missing(self):
+        self.state.set_if_absent("dedup:KA01", "v", ttl=0.1)
+        self.assertEqual(self.state.get("dedup:KA01"), "v")
+        time.sleep(0.2)
+        self.assertIsNone(self.state.get("dedup:KA01"))
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class RedisStateTest(StateContract, unittest.TestCase):
+    def make_state(self):
+        self.server = fakeredis.FakeServer()
+        return RedisState(prefix="test:", client=fakeredis.FakeRedis(server=self.server))
+
+    def test_keys_are_prefixed(self):
+        self.state.set("config:country", "UK")
+        client = fakeredis.FakeRedis(server=self.server)
+        self.assertEqual(client.keys("*"), [b"test:config:country"])
+
+
+class CountryConfigTest(unittest.IsolatedAsyncioTestCase):
+    async def test_async_reads_run_off_the_event_loop(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        state = SQLiteState(os.path.join(tmp.name, "state.db"))
+        state.set(config.CountryConfig.KEY, "UK")
+        loop_thread = threading.current_thread()
+        reads = []
+        get = state.get
+
+        def tracked_get(key, default=None):
+            reads.append(threading.current_thread())
+            return get(key, default)
+
+        with mock.patch.object(shared_state, "_shared_state", state), \
+                mock.patch.object(state, "get", tracked_get):
+            country = config.CountryConfig()
+            self.assertEqual(await country.get_async(), "UK")
+            self.assertEqual(await country.get_async(), "UK")  # cached
+        self.assertEqual(len(reads), 1)
+        self.assertIsNot(reads[0], loop_thread)
+
+    async def test_default_and_ttl(self):
+        state = MemoryState()
+        with mock.patch.object(shared_state, "_shared_state", state):
+            country = config.CountryConfig(default="IN")
+            self.assertEqual(await country.get_async(), "IN")
+            state.set(config.CountryConfig.KEY, "DE")  # another worker
+            self.assertEqual(country.get(), "IN")
+            with mock.patch.object(config.time, "monotonic", return_value=time.monotonic() + country.TTL + 1):
+                self.assertEqual(await country.get_async(), "DE")
+            country.set("uk")
+            self.assertEqual(country.get(), "UK")
+            self.assertEqual(state.get(config.CountryConfig.KEY), "UK")
+
+
+if __name__ == "__main__":
+    unittest.main()
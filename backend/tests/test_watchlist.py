@@ -0,0 +1,50 @@
+"""
+Watchlist verdicts for repeat uploads answered from the upload cache.
+
+    cd backend
+    python -m unittest discover -s tests -t .
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from app.events import event_bus
+from app.routers import image
+from app.watchlist import Watchlist, watchlist
+
+CACHED = {
+    "detections": [{"id": 1, "plate_number": "KA01AB1234", "confidence": 0.9}],
+    "image_path": None,
+    "thumbnail_path": None,
+}
+
+
+class CachedUploadTest(unittest.TestCase):
+    def setUp(self):
+        for patch in (mock.patch.object(watchlist, "current", Watchlist([("KA01AB1234", "stolen", None)])),
+                      mock.patch.object(event_bus, "publish")):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def respond(self, record_repeat=False):
+        return asyncio.run(image.cached_response("key", CACHED, b"", False, False, record_repeat))
+
+    def published(self, kind):
+        return [c for c in event_bus.publish.call_args_list if c.args[0] == kind]
+
+    def test_cached_hit_reports_verdict_without_alert(self):
+        for _ in range(2):
+            response = self.respond()
+            self.assertTrue(response["cached"])
+            self.assertEqual(response["detections"][0]["watchlist"][0]["list"], "stolen")
+        self.assertEqual(self.published("watchlist_hit"), [])
+        self.assertNotIn("watchlist", CACHED["detections"][0])
+
+    def test_match_does_not_alert(self):
+        self.assertEqual(len(watchlist.match("KA01AB1234")), 1)
+        self.assertEqual(watchlist.match("MH12ZZ0000"), [])
+        event_bus.publish.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
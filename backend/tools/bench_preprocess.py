@@ -0,0 +1,146 @@
+"""
+Benchmark preprocessing profiles for speed and OCR accuracy.
+
+    cd backend
+    python -m tools.bench_preprocess --data path/to/crops --profiles default,fast,fast_median
+
+The data directory holds plate crops. Labels come from `labels.csv`
+(`filename,plate`) when present, otherwise from the file name up to the
+first "_" (e.g. `KA01AB1234_003.jpg`). Without --data, synthetic crops are
+used and only timings are reported.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from app.detector.preprocess import PROFILES, PreprocessPipeline
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_crops(data_dir):
+    labels = {}
+    labels_csv = os.path.join(data_dir, "labels.csv")
+    if os.path.exists(labels_csv):
+        with open(labels_csv, newline="") as f:
+            for row in csv.reader(f):
+                if len(row) >= 2 and row[0] != "filename":
+                    labels[row[0]] = row[1].strip().upper()
+
+    crops = []
+    for name in sorted(os.listdir(data_dir)):
+        if not name.lower().endswith(IMAGE_EXTS):
+            continue
+        img = cv2.imread(os.path.join(data_dir, name))
+        if img is None:
+            continue
+        label = labels.get(name) or os.path.splitext(name)[0].split("_")[0].upper()
+        crops.append((img, label))
+    return crops
+
+
+def synthetic_crops(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    crops = []
+    for _ in range(n):
+        h = int(rng.integers(20, 80))
+        w = h * 4
+        img = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+        cv2.putText(img, "KA01AB1234", (2, h - 4), cv2.FONT_HERSHEY_SIMPLEX, h / 40, (0, 0, 0), 2)
+        crops.append((img, None))
+    return crops
+
+
+def cer(pred, truth):
+    """Character error rate (Levenshtein distance / label length)"""
+    if not truth:
+        return 0.0 if not pred else 1.0
+    prev = list(range(len(truth) + 1))
+    for i, p in enumerate(pred, 1):
+        cur = [i]
+        for j, t in enumerate(truth, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (p != t)))
+        prev = cur
+    return prev[-1] / len(truth)
+
+
+def bench_profile(profile, crops, batch_size, with_ocr):
+    pipeline = PreprocessPipeline(profile)
+    imgs = [img for img, _ in crops]
+
+    start = time.perf_counter()
+    prepped = []
+    for i in range(0, len(imgs), batch_size):
+        prepped.extend(pipeline.run_batch(imgs[i:i + batch_size]))
+    prep_ms = (time.perf_counter() - start) * 1000 / max(len(imgs), 1)
+
+    report = {
+        "profile": profile,
+        "crops": len(imgs),
+        "preprocess_ms_per_crop": round(prep_ms, 3),
+        "stage_cost": pipeline.cost(),
+    }
+
+    if with_ocr:
+        from app.detector.ocr import get_easy_reader
+        from app.detector.plate_postprocess import apply_plate_syntax
+
+        reader = get_easy_reader()
+        correct, total_cer = 0, 0.0
+        start = time.perf_counter()
+        for img, (_, label) in zip(prepped, crops):
+            results = reader.readtext(img)
+            text = ""
+            if results:
+                best = max(results, key=lambda r: r[2])
+                text = apply_plate_syntax(best[1])
+            correct += int(text == label)
+            total_cer += cer(text, label)
+        ocr_ms = (time.perf_counter() - start) * 1000 / max(len(imgs), 1)
+
+        report.update({
+            "accuracy": round(correct / max(len(imgs), 1), 4),
+            "cer": round(total_cer / max(len(imgs), 1), 4),
+            "ocr_ms_per_crop": round(ocr_ms, 3),
+        })
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="directory of labeled plate crops")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="comma-separated profile names")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--no-ocr", action="store_true", help="time preprocessing only")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    crops = load_crops(args.data) if args.data else synthetic_crops()
+    with_ocr = bool(args.data) and not args.no_ocr
+
+    reports = [
+        bench_profile(p.strip(), crops, args.batch_size, with_ocr)
+        for p in args.profiles.split(",") if p.strip()
+    ]
+
+    print(f"{'profile':<14}{'prep ms':>10}{'ocr ms':>10}{'acc':>8}{'cer':>8}")
+    for r in reports:
+        print(
+            f"{r['profile']:<14}{r['preprocess_ms_per_crop']:>10.3f}"
+            f"{r.get('ocr_ms_per_crop', float('nan')):>10.3f}"
+            f"{r.get('accuracy', float('nan')):>8.3f}{r.get('cer', float('nan')):>8.3f}"
+        )
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
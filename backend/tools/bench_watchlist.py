@@ -0,0 +1,109 @@
+"""
+Measure watchlist build time, memory and match latency at scale.
+
+    cd backend
+    python -m tools.bench_watchlist --entries 1000000 --max-edits 0,1
+"""
+import argparse
+import gc
+import json
+import random
+import string
+import time
+import tracemalloc
+
+from app.watchlist import Watchlist
+
+# Reverse of the OCR confusions, used to fake misreads of listed plates
+MISREADS = {"0": "O", "1": "I", "2": "Z", "5": "S", "6": "G", "8": "B", "O": "0", "B": "8", "S": "5"}
+
+
+def random_plate(rng):
+    """Indian-style plate, e.g. KA01AB1234"""
+    letters = string.ascii_uppercase
+    return (
+        "".join(rng.choice(letters) for _ in range(2))
+        + f"{rng.randint(0, 99):02d}"
+        + "".join(rng.choice(letters) for _ in range(2))
+        + f"{rng.randint(0, 9999):04d}"
+    )
+
+
+def misread(plate, rng):
+    positions = [i for i, c in enumerate(plate) if c in MISREADS]
+    if not positions:
+        return plate
+    i = rng.choice(positions)
+    return plate[:i] + MISREADS[plate[i]] + plate[i + 1:]
+
+
+def substitute(plate, rng):
+    i = rng.randrange(len(plate))
+    c = rng.choice([c for c in string.ascii_uppercase + string.digits if c != plate[i]])
+    return plate[:i] + c + plate[i + 1:]
+
+
+def percentiles(samples_ns):
+    samples = sorted(samples_ns)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] / 1000
+    return {"p50_us": round(pick(0.50), 2), "p99_us": round(pick(0.99), 2), "max_us": round(samples[-1] / 1000, 2)}
+
+
+def time_queries(wl, queries):
+    samples = []
+    hits = 0
+    for q in queries:
+        start = time.perf_counter_ns()
+        found = wl.match(q)
+        samples.append(time.perf_counter_ns() - start)
+        hits += bool(found)
+    return {**percentiles(samples), "hit_rate": round(hits / len(queries), 4)}
+
+
+def bench(n, max_edits, queries, seed):
+    rng = random.Random(seed)
+    plates = [random_plate(rng) for _ in range(n)]
+    entries = [(p, "stolen", None) for p in plates]
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    wl = Watchlist(entries, max_edits=max_edits)
+    build_s = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sample = [rng.choice(plates) for _ in range(queries)]
+    report = {
+        "entries": n,
+        "max_edits": max_edits,
+        "build_s": round(build_s, 2),
+        "index_mb": round(current / 2**20, 1),
+        "exact": time_queries(wl, sample),
+        "confusion": time_queries(wl, [misread(p, rng) for p in sample]),
+        "miss": time_queries(wl, [random_plate(rng) for _ in range(queries)]),
+    }
+    if max_edits:
+        report["substitution"] = time_queries(wl, [substitute(p, rng) for p in sample])
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--max-edits", default="0,1", help="comma-separated max_edits values to test")
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    reports = [bench(args.entries, int(e), args.queries, args.seed) for e in args.max_edits.split(",")]
+    print(json.dumps(reports, indent=2))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
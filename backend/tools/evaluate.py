@@ -0,0 +1,278 @@
+"""
+Evaluate the detection engine on a labeled image set and sweep its
+parameters, to pick the fastest configuration that is accurate enough.
+
+    cd backend
+    python -m tools.evaluate --data path/to/images --imgsz 480,640 --conf 0.15,0.25 \\
+        --preprocess default,fast --ocr single,cascade --workers 4 --min-accuracy 0.9 --out sweep.json
+
+The data directory holds full frames. Labels come from `labels.csv`
+(`filename,plates`, several plates separated by ";", empty for none) when
+present, otherwise from the file name up to the first "_"
+(e.g. `KA01AB1234_003.jpg`).
+
+Every combination of the swept values is one configuration, run over the
+whole set by one worker process through the chosen engine profile
+("image" or "stream"), with these overrides:
+
+    --imgsz           detector input size (also the reduced-decode target for "stream")
+    --conf, --iou     detector thresholds
+    --preprocess      first-level OCR preprocess profile
+    --ocr             single: one EasyOCR pass; cascade: the full PlateOCR cascade
+    --min-ocr-conf    fuse stage cut-off for unread plates
+    --fusion          det:ocr fusion weights, e.g. 0.6:0.4
+
+--min-ocr-conf and --fusion default to the profile's own fuse parameters
+(0.6:0.4 and 0.1 for "image", detector confidence only for "stream"), so
+an unswept axis measures what is deployed.
+    --min-confidence  plates below this confidence don't count (the routes' save cut-off)
+
+Reported per configuration: plate accuracy (exact reads / labeled plates),
+precision (exact reads / reported plates), mean CER per labeled plate,
+frames per second and OCR calls per plate. The table marks the Pareto
+front over accuracy and fps. Workers share the machine, so fps compares
+configurations; use --workers 1 for absolute numbers.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tools.bench_preprocess import IMAGE_EXTS, cer
+
+OCR_BACKENDS = {
+    "single": {"max_levels": 1},
+    "cascade": {"max_levels": None},  # the full cascade, also for "stream"
+}
+
+SWEEP_AXES = ("imgsz", "conf", "iou", "preprocess", "ocr", "min_ocr_conf", "fusion", "min_confidence")
+
+
+def normalize(plate):
+    return "".join(c for c in plate.upper() if c.isalnum())
+
+
+def load_dataset(data_dir, limit=None):
+    """[(name, encoded bytes, [plates])], files read as-is so decoding is part of the measurement"""
+    labels = {}
+    labels_csv = os.path.join(data_dir, "labels.csv")
+    if os.path.exists(labels_csv):
+        with open(labels_csv, newline="") as f:
+            for row in csv.reader(f):
+                if row and row[0] != "filename":
+                    plates = row[1].split(";") if len(row) > 1 else []
+                    labels[row[0]] = [normalize(p) for p in plates if normalize(p)]
+
+    dataset = []
+    for name in sorted(os.listdir(data_dir)):
+        if not name.lower().endswith(IMAGE_EXTS):
+            continue
+        if name in labels:
+            plates = labels[name]
+        else:
+            plates = [normalize(os.path.splitext(name)[0].split("_")[0])]
+        with open(os.path.join(data_dir, name), "rb") as f:
+            dataset.append((name, f.read(), plates))
+        if limit and len(dataset) >= limit:
+            break
+    return dataset
+
+
+def overrides_for(profile, config):
+    from app.detector.engine import PROFILES
+
+    fuse = {}  # axes left at None keep the profile's fuse params
+    if config["fusion"] is not None:
+        fuse["det_weight"], fuse["ocr_weight"] = (float(w) for w in config["fusion"].split(":"))
+    if config["min_ocr_conf"] is not None:
+        fuse["min_ocr_conf"] = config["min_ocr_conf"]
+    overrides = {
+        "detect": {"imgsz": config["imgsz"], "conf": config["conf"], "iou": config["iou"]},
+        "read": {"profile": config["preprocess"], **OCR_BACKENDS[config["ocr"]]},
+        "fuse": fuse,
+    }
+    decode_params = dict(PROFILES[profile]).get("decode", {})
+    if "reduce_to" in decode_params:
+        overrides["decode"] = {"reduce_to": config["imgsz"]}
+    return overrides
+
+
+# ---------- worker process ----------
+_dataset = None
+
+
+def _init_worker(data_dir, limit, threads):
+    global _dataset
+    import cv2
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _dataset = load_dataset(data_dir, limit)
+
+
+def evaluate(profile, config, batch_size):
+    """Run one configuration over the dataset in this worker; returns its report"""
+    from app.detector.engine import get_detection_pipeline
+    from app.detector.ocr import get_plate_ocr
+
+    pipeline = get_detection_pipeline(profile)
+    overrides = overrides_for(profile, config)
+    ocr = get_plate_ocr()
+
+    # Warm-up outside the timed run: models load lazily on first use
+    pipeline.run([{"data": _dataset[0][1]}], overrides)
+
+    before = ocr.stats()
+    predictions = []
+    start = time.perf_counter()
+    for i in range(0, len(_dataset), batch_size):
+        frames = pipeline.run([{"data": data} for _, data, _ in _dataset[i:i + batch_size]], overrides)
+        for f in frames:
+            predictions.append([
+                p["text"] for p in f["plates"]
+                if p.get("text") and p.get("confidence", 0.0) >= config["min_confidence"]
+            ])
+    elapsed = time.perf_counter() - start
+    after = ocr.stats()
+
+    labeled = reported = exact = images_exact = 0
+    total_cer = 0.0
+    for (_, _, truth), predicted in zip(_dataset, predictions):
+        labeled += len(truth)
+        reported += len(predicted)
+        exact += sum((Counter(truth) & Counter(predicted)).values())
+        images_exact += int(Counter(truth) == Counter(predicted))
+        for plate in truth:
+            total_cer += min((cer(p, plate) for p in predicted), default=1.0)
+
+    crops = after["levels"][0]["crops"] - before["levels"][0]["crops"]
+    calls = sum(a["ocr_calls"] - b["ocr_calls"] for a, b in zip(after["levels"], before["levels"]))
+    return {
+        "config": config,
+        "images": len(_dataset),
+        "labeled_plates": labeled,
+        "reported_plates": reported,
+        "accuracy": round(exact / labeled, 4) if labeled else 0.0,
+        "precision": round(exact / reported, 4) if reported else 0.0,
+        "image_accuracy": round(images_exact / len(_dataset), 4),
+        "cer": round(total_cer / labeled, 4) if labeled else 0.0,
+        "fps": round(len(_dataset) / elapsed, 2) if elapsed else 0.0,
+        "ms_per_image": round(elapsed * 1000 / len(_dataset), 2),
+        "ocr_calls_per_plate": round(calls / crops, 2) if crops else 0.0,
+    }
+
+
+# ---------- report ----------
+def pareto_front(reports):
+    """Configurations no other one beats on both accuracy and fps"""
+    front = []
+    for r in reports:
+        dominated = any(
+            o["accuracy"] >= r["accuracy"] and o["fps"] >= r["fps"]
+            and (o["accuracy"] > r["accuracy"] or o["fps"] > r["fps"])
+            for o in reports
+        )
+        if not dominated:
+            front.append(r)
+    return front
+
+
+def label(config):
+    return " ".join(f"{k}={'profile' if config[k] is None else config[k]}" for k in SWEEP_AXES)
+
+
+def print_table(reports, front, best):
+    print(f"{'':2}{'acc':>7}{'prec':>7}{'cer':>7}{'fps':>8}{'ocr/pl':>8}  config")
+    for r in sorted(reports, key=lambda r: r["fps"], reverse=True):
+        mark = ">" if r is best else ("*" if r in front else "")
+        print(
+            f"{mark:2}{r['accuracy']:>7.3f}{r['precision']:>7.3f}{r['cer']:>7.3f}"
+            f"{r['fps']:>8.2f}{r['ocr_calls_per_plate']:>8.2f}  {label(r['config'])}"
+        )
+    print("* Pareto front (accuracy vs fps)   > fastest configuration meeting --min-accuracy")
+
+
+def _floats(text):
+    return [float(v) for v in text.split(",") if v.strip()]
+
+
+def _ints(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def _names(text):
+    return [v.strip() for v in text.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="directory of labeled frames")
+    parser.add_argument("--profile", default="image", choices=["image", "stream"])
+    parser.add_argument("--imgsz", type=_ints, default=[640])
+    parser.add_argument("--conf", type=_floats, default=[0.25])
+    parser.add_argument("--iou", type=_floats, default=[0.7])
+    parser.add_argument("--preprocess", type=_names, default=["default"])
+    parser.add_argument("--ocr", type=_names, default=["cascade"])
+    parser.add_argument("--min-ocr-conf", type=_floats, default=[None], help="default: the profile's")
+    parser.add_argument("--fusion", type=_names, default=[None], help="default: the profile's")
+    parser.add_argument("--min-confidence", type=_floats, default=[0.0])
+    parser.add_argument("--min-accuracy", type=float, default=0.0, help="accuracy bar for the recommendation")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--threads", type=int, help="CPU threads per worker (default: cores / workers)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--limit", type=int, help="only the first N images")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    for name in args.ocr:
+        if name not in OCR_BACKENDS:
+            parser.error(f"unknown --ocr '{name}' (choose from {', '.join(OCR_BACKENDS)})")
+    if not load_dataset(args.data, 1):
+        parser.error(f"no images in {args.data}")
+
+    axes = [args.imgsz, args.conf, args.iou, args.preprocess, args.ocr,
+            args.min_ocr_conf, args.fusion, args.min_confidence]
+    configs = [dict(zip(SWEEP_AXES, values)) for values in itertools.product(*axes)]
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+    print(f"{len(configs)} configurations, {args.workers} workers x {threads} threads, profile '{args.profile}'")
+
+    reports = []
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.data, args.limit, threads),
+    ) as pool:
+        futures = [pool.submit(evaluate, args.profile, c, args.batch_size) for c in configs]
+        for future in as_completed(futures):
+            r = future.result()
+            reports.append(r)
+            print(f"  [{len(reports)}/{len(configs)}] acc={r['accuracy']:.3f} fps={r['fps']:.2f}  {label(r['config'])}")
+
+    front = pareto_front(reports)
+    meeting = [r for r in reports if r["accuracy"] >= args.min_accuracy]
+    best = max(meeting, key=lambda r: r["fps"]) if meeting else None
+    print()
+    print_table(reports, front, best)
+    if best is None:
+        print(f"\nNo configuration reaches accuracy {args.min_accuracy}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "profile": args.profile,
+                "min_accuracy": args.min_accuracy,
+                "recommended": best,
+                "pareto_front": sorted(front, key=lambda r: r["fps"], reverse=True),
+                "reports": reports,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
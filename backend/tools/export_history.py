@@ -0,0 +1,50 @@
+"""
+Export detection history straight to a file, with the same filters as
+GET /history/export.
+
+    cd backend
+    python -m tools.export_history --format parquet --start 2024-05-01 --end 2024-06-01 --out may.parquet
+"""
+import argparse
+import time
+from datetime import datetime
+
+from app.export import EXPORT_CHUNK_SIZE, FORMATS, history_filters, iter_row_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--source")
+    parser.add_argument("--camera-id")
+    parser.add_argument("--plate", help="plate number prefix")
+    parser.add_argument("--start", type=datetime.fromisoformat)
+    parser.add_argument("--end", type=datetime.fromisoformat)
+    parser.add_argument("--min-confidence", type=float)
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    conditions = history_filters(
+        args.source, args.camera_id, args.plate, args.start, args.end, args.min_confidence
+    )
+
+    rows = 0
+
+    def counted(chunks):
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    start = time.perf_counter()
+    _, stream = FORMATS[args.format]
+    with open(args.out, "wb") as f:
+        for data in stream(counted(iter_row_chunks(conditions, args.chunk_size))):
+            f.write(data)
+
+    print(f"Exported {rows} detections to {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Backfill detections from archived stills without going through the web
+stack.
+
+    cd backend
+    python -m tools.ingest /archive/gate-1 "/archive/2024-*/**/*.jpg" --camera-id gate-1
+    python -m tools.ingest /archive --decode-workers 6 --batch-size 16 --commit-every 1000
+
+Arguments are directories (walked recursively) or glob patterns. Files are
+decoded in a process pool, run through the "image" detection profile in
+batches, and their annotated evidence is written on a thread pool while the
+next batches are on the detector. Rows go in with one bulk INSERT per
+transaction (rollups updated in the same transaction), timestamped with the
+file's modification time unless --timestamp now is given. Backfilled rows
+publish no live events or watchlist alerts, but each transaction advances
+the highest detection id, which is part of the change token (app.changes),
+so a running server's history/stats ETags move and dashboards refetch.
+
+Progress is checkpointed after every commit by appending the files of that
+transaction to --checkpoint; a rerun skips every file listed there. If the
+process dies between a commit and its checkpoint write, that one
+transaction is ingested again on resume.
+"""
+import argparse
+import glob
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import cv2
+from sqlalchemy import insert
+
+from app import rollups
+from app.database import SessionLocal
+from app.detector.detector import process_license_plates
+from app.models import Detection
+from app.schema import init_db
+from app.storage import get_image_store
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def find_images(inputs):
+    """Sorted, de-duplicated image paths from directories and glob patterns"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.update(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTS))
+        else:
+            paths.update(p for p in glob.glob(item, recursive=True)
+                         if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTS))
+    return sorted(os.path.abspath(p) for p in paths)
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def append_checkpoint(path, done):
+    with open(path, "a") as f:
+        f.writelines(f"{p}\n" for p in done)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# ---------- decode (worker processes) ----------
+def _init_decoder():
+    cv2.setNumThreads(1)
+
+
+def _decode(path):
+    return cv2.imread(path, cv2.IMREAD_COLOR)
+
+
+def decoded(pool, paths, in_flight):
+    """Yield (path, image or None) in order, keeping at most in_flight decodes queued"""
+    pending = deque()
+    paths = iter(paths)
+    for path in paths:
+        pending.append((path, pool.submit(_decode, path)))
+        if len(pending) >= in_flight:
+            break
+    while pending:
+        path, future = pending.popleft()
+        next_path = next(paths, None)
+        if next_path is not None:
+            pending.append((next_path, pool.submit(_decode, next_path)))
+        yield path, future.result()
+
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------- write ----------
+def commit_rows(rows):
+    """One bulk INSERT plus rollup upserts in a single transaction"""
+    if not rows:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(insert(Detection.__table__), rows)
+        rollups.apply_inserts(db.connection(), [
+            (r["plate_number"], r["timestamp"], r["confidence"], r["source"], r["camera_id"])
+            for r in rows
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="directories and/or glob patterns")
+    parser.add_argument("--source", default="image", help="source column of the new rows")
+    parser.add_argument("--camera-id", help="camera_id column of the new rows")
+    parser.add_argument("--timestamp", choices=["mtime", "now"], default="mtime")
+    parser.add_argument("--batch-size", type=int, default=8, help="images per detector call")
+    parser.add_argument("--commit-every", type=int, default=500, help="images per transaction")
+    parser.add_argument("--decode-workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--write-workers", type=int, default=4, help="threads writing annotated evidence")
+    parser.add_argument("--checkpoint", default="ingest.checkpoint", help="file listing already ingested paths")
+    args = parser.parse_args()
+
+    init_db()  # same bootstrap as the server, so its first start finds the rollups filled
+
+    paths = find_images(args.inputs)
+    done = load_checkpoint(args.checkpoint)
+    todo = [p for p in paths if p not in done]
+    print(f"{len(paths)} images found, {len(paths) - len(todo)} already ingested, {len(todo)} to go")
+    if not todo:
+        return
+
+    store = get_image_store()
+    now = datetime.utcnow()
+    images = plates = failed = 0
+    rows, committed = [], []
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal rows, committed
+        # Evidence must be on disk before rows pointing at it are visible
+        for r in rows:
+            r["image_path"] = r["image_path"].result()["image_path"]
+        commit_rows(rows)
+        append_checkpoint(args.checkpoint, committed)
+        elapsed = time.perf_counter() - start
+        print(f"  {images}/{len(todo)} images, {plates} plates, {failed} unreadable, "
+              f"{images / elapsed:.1f} img/s")
+        rows, committed = [], []
+
+    with ProcessPoolExecutor(args.decode_workers, initializer=_init_decoder) as decoders, \
+            ThreadPoolExecutor(args.write_workers, thread_name_prefix="ingest-write") as writers:
+        stream = decoded(decoders, todo, args.decode_workers * args.batch_size * 2)
+
+        for batch in batches(stream, args.batch_size):
+            readable = [(p, img) for p, img in batch if img is not None]
+            failed += len(batch) - len(readable)
+            outputs = process_license_plates([img for _, img in readable]) if readable else []
+
+            for (path, _), (annotated, detections) in zip(readable, outputs):
+                found = [d for d in detections if d.get("plate") and d["plate"].strip()]
+                if not found:
+                    continue
+                write = writers.submit(store.save_sync, annotated)
+                ts = datetime.utcfromtimestamp(os.path.getmtime(path)) if args.timestamp == "mtime" else now
+                rows.extend({
+                    "plate_number": d["plate"].strip(),
+                    "confidence": float(d.get("ocr_conf", 0.0)),
+                    "source": args.source,
+                    "camera_id": args.camera_id,
+                    "timestamp": ts,
+                    "image_path": write,
+                } for d in found)
+                plates += len(found)
+
+            images += len(batch)
+            committed.extend(p for p, _ in batch)
+            if len(committed) >= args.commit_every:
+                flush()
+
+        if committed:
+            flush()
+
+    elapsed = time.perf_counter() - start
+    print(f"Ingested {images} images ({plates} plates) in {elapsed:.1f}s, {images / elapsed:.1f} img/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+Replay a video file (or synthetic frames) to many concurrent /ws/video and
+/ws/webcam sessions and report latency, throughput, drops and errors.
+
+    cd backend
+    python -m tools.load_ws --video sample.mp4 --sessions 8 --fps 10 --duration 60 --out report.json
+    python -m tools.load_ws --synthetic 1280x720 --endpoints video,webcam --sessions 4
+
+Each session sends frames at --fps. A frame is dropped (not sent) when
+--max-in-flight frames are already awaiting a result, the same way a real
+client skips frames when the server falls behind. Latency is measured from
+send to the matching result message (the one carrying "frame"). With
+--mode two_phase, latency is measured to the "boxes" message and OCR
+latency to the matching "ocr" message.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+
+import cv2
+import numpy as np
+import websockets
+
+
+def load_frames(video_path, max_frames, width, quality):
+    """Decode and JPEG-encode the clip once; every session replays the same bytes"""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if width and frame.shape[1] > width:
+            frame = cv2.resize(frame, (width, int(frame.shape[0] * width / frame.shape[1])))
+        frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    cap.release()
+    if not frames:
+        raise SystemExit(f"No frames could be read from {video_path}")
+    return frames
+
+
+def synthetic_frames(size, count, quality, seed=0):
+    """Noisy road-ish frames with a plate-like box drifting across them"""
+    w, h = map(int, size.lower().split("x"))
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        frame = rng.integers(40, 120, (h, w, 3), dtype=np.uint8)
+        x = int((w - w // 4) * i / max(1, count - 1))
+        y = h // 2
+        cv2.rectangle(frame, (x, y), (x + w // 4, y + h // 10), (255, 255, 255), -1)
+        cv2.putText(frame, "KA01AB1234", (x + 5, y + h // 14), cv2.FONT_HERSHEY_SIMPLEX, w / 1600, (0, 0, 0), 2)
+        frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    return frames
+
+
+def percentiles(samples_ms):
+    if not samples_ms:
+        return {"p50_ms": None, "p90_ms": None, "p99_ms": None, "max_ms": None}
+    samples = sorted(samples_ms)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))], 1)
+    return {"p50_ms": pick(0.50), "p90_ms": pick(0.90), "p99_ms": pick(0.99), "max_ms": round(samples[-1], 1)}
+
+
+class SessionStats:
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.errors = 0
+        self.plates = 0
+        self.latencies_ms = []
+        self.ocr_latencies_ms = []
+        self.superseded = 0
+        self.server_dropped = 0
+        self.connected = False
+        self.error_messages = []
+
+    def error(self, message):
+        self.errors += 1
+        if len(self.error_messages) < 5:
+            self.error_messages.append(message)
+
+
+async def run_session(url, endpoint, frames, args, stats, start_delay):
+    await asyncio.sleep(start_delay)
+    pending = deque()  # send times of frames still awaiting a result
+    sent_at = {}  # two_phase: seq -> send time, kept until its OCR message arrives
+    interval = 1.0 / args.fps
+    two_phase = args.mode == "two_phase"
+    if two_phase:
+        url += "?mode=two_phase"
+
+    try:
+        async with websockets.connect(url, max_size=None, open_timeout=10) as ws:
+            stats.connected = True
+
+            async def receive():
+                async for message in ws:
+                    try:
+                        payload = json.loads(message)
+                    except ValueError:
+                        stats.error("non-JSON message")
+                        continue
+
+                    if "error" in payload:
+                        stats.error(str(payload["error"]))
+
+                    if two_phase:
+                        now = time.perf_counter()
+                        if payload.get("type") == "dropped":
+                            if pending:
+                                pending.popleft()
+                            sent_at.pop(payload["seq"], None)
+                            stats.server_dropped += 1
+                        elif payload.get("type") == "boxes":
+                            if pending:
+                                pending.popleft()
+                            stats.latencies_ms.append((now - sent_at[payload["seq"]]) * 1000)
+                            stats.received += 1
+                            if not any(b["confidence"] >= args.ocr_min_conf for b in payload["boxes"]):
+                                sent_at.pop(payload["seq"], None)  # no OCR will follow
+                        elif payload.get("type") == "ocr":
+                            started = sent_at.pop(payload["seq"], None)
+                            if payload.get("superseded") or payload.get("dropped"):
+                                stats.superseded += 1
+                            elif started is not None:
+                                stats.ocr_latencies_ms.append((now - started) * 1000)
+                                stats.plates += bool(payload.get("plates"))
+                        continue
+
+                    if payload.get("message") == "dropped":
+                        # Shed or skipped by the server's admission control
+                        if pending:
+                            pending.popleft()
+                        stats.server_dropped += 1
+                        continue
+                    if "frame" not in payload:
+                        continue  # per-message "processing" status
+
+                    if pending:
+                        stats.latencies_ms.append((time.perf_counter() - pending.popleft()) * 1000)
+                    stats.received += 1
+                    stats.plates += bool(payload.get("plate"))
+
+            receiver = asyncio.create_task(receive())
+            deadline = time.perf_counter() + args.duration
+            next_send = time.perf_counter()
+            i = 0
+
+            while time.perf_counter() < deadline and not receiver.done():
+                if len(pending) >= args.max_in_flight:
+                    stats.dropped += 1
+                else:
+                    if endpoint == "video":
+                        await ws.send(json.dumps({"type": "frame_meta", "timestamp": i / args.fps}))
+                    pending.append(time.perf_counter())
+                    await ws.send(frames[i % len(frames)])
+                    stats.sent += 1
+                    sent_at[stats.sent] = pending[-1]
+                i += 1
+
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+            # Let in-flight frames finish, then hang up
+            drain_deadline = time.perf_counter() + args.drain_timeout
+            while pending and not receiver.done() and time.perf_counter() < drain_deadline:
+                await asyncio.sleep(0.05)
+            if pending:
+                stats.error(f"{len(pending)} frames unanswered at close")
+
+            receiver.cancel()
+            try:
+                await receiver
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                stats.error(f"receive failed: {e}")
+
+    except Exception as e:
+        stats.error(f"{type(e).__name__}: {e}")
+
+
+def summarize(stats_list, elapsed):
+    latencies = [ms for s in stats_list for ms in s.latencies_ms]
+    received = sum(s.received for s in stats_list)
+    return {
+        "sessions": len(stats_list),
+        "connected": sum(s.connected for s in stats_list),
+        "frames_sent": sum(s.sent for s in stats_list),
+        "frames_received": received,
+        "frames_dropped": sum(s.dropped for s in stats_list),
+        "frames_shed_by_server": sum(s.server_dropped for s in stats_list),
+        "errors": sum(s.errors for s in stats_list),
+        "plates": sum(s.plates for s in stats_list),
+        "throughput_fps": round(received / elapsed, 2) if elapsed else 0.0,
+        "latency": percentiles(latencies),
+        "ocr_latency": percentiles([ms for s in stats_list for ms in s.ocr_latencies_ms]),
+        "ocr_superseded": sum(s.superseded for s in stats_list),
+        "error_samples": [m for s in stats_list for m in s.error_messages][:10],
+    }
+
+
+async def run(args, frames):
+    endpoints = args.endpoints.split(",")
+    sessions = defaultdict(list)
+    tasks = []
+
+    for n in range(args.sessions):
+        endpoint = endpoints[n % len(endpoints)]
+        stats = SessionStats()
+        sessions[endpoint].append(stats)
+        url = f"{args.url.rstrip('/')}/ws/{endpoint}"
+        delay = args.ramp * n / max(1, args.sessions)
+        tasks.append(run_session(url, endpoint, frames, args, stats, delay))
+
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "config": {
+            "url": args.url,
+            "sessions": args.sessions,
+            "target_fps": args.fps,
+            "duration_s": args.duration,
+            "max_in_flight": args.max_in_flight,
+            "mode": args.mode,
+            "frames": len(frames),
+            "avg_frame_kb": round(sum(map(len, frames)) / len(frames) / 1024, 1),
+            "source": args.video or f"synthetic:{args.synthetic}",
+        },
+        "elapsed_s": round(elapsed, 2),
+        "total": summarize([s for group in sessions.values() for s in group], elapsed),
+        "endpoints": {endpoint: summarize(group, elapsed) for endpoint, group in sessions.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://127.0.0.1:8000")
+    parser.add_argument("--endpoints", default="video", help="comma-separated: video,webcam")
+    parser.add_argument("--video", help="video file to replay")
+    parser.add_argument("--synthetic", default="1280x720", help="WxH of generated frames when --video is not given")
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=0, help="downscale replayed frames to this width")
+    parser.add_argument("--quality", type=int, default=85)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--fps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--ramp", type=float, default=2, help="seconds over which sessions connect")
+    parser.add_argument("--max-in-flight", type=int, default=2)
+    parser.add_argument("--mode", choices=["legacy", "two_phase"], default="legacy")
+    parser.add_argument("--ocr-min-conf", type=float, default=0.2, help="server CONF_THRESHOLD (two_phase)")
+    parser.add_argument("--drain-timeout", type=float, default=10)
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.video:
+        frames = load_frames(args.video, args.max_frames, args.width, args.quality)
+    else:
+        frames = synthetic_frames(args.synthetic, min(args.max_frames, 60), args.quality)
+
+    report = asyncio.run(run(args, frames))
+    print(json.dumps(report, indent=2))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
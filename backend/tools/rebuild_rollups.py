@@ -0,0 +1,27 @@
+"""
+Repopulate the `plates` and `hourly_stats` rollup tables from raw history.
+
+    cd backend
+    python -m tools.rebuild_rollups
+"""
+import time
+
+from app.database import SessionLocal, engine
+from app.models import Base
+from app.rollups import rebuild
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        total = rebuild(db)
+        print(f"Rebuilt rollups from {total} detections in {time.perf_counter() - start:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
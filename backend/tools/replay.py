@@ -0,0 +1,206 @@
+"""
+Replay a recorded /ws/video or /ws/webcam session through the detection
+engine and compare the run with a baseline.
+
+    cd backend
+    python -m tools.replay --list
+    python -m tools.replay app/recordings/20261019-101500-video-3fa9c2 --out before.json
+    python -m tools.replay app/recordings/20261019-101500-video-3fa9c2 --speed original \\
+        --baseline before.json --out after.json
+
+Sessions are recorded by the server with RECORD_SESSIONS=requested
+(?record=1&admin_token=... on the websocket URL) or RECORD_SESSIONS=all.
+Frames the recorder dropped under load are counted as "dropped" in the
+session header and are simply missing from the replay. Every frame is
+run, in order, through --profile in this process: no database writes, no
+admission control, no frame dropping. The same recording therefore always
+asks for the same work. --speed max runs frames back to back; --speed
+original waits for each frame's recorded arrival time and reports how far
+processing fell behind it.
+
+The report has the plates read per frame, frame latency percentiles and
+per-stage ms/frame from the engine's cost counters. With --baseline (the
+--out of an earlier run over the same session) it also lists the frames
+whose reads changed and the latency and stage cost deltas.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from app.config import RECORD_DIR
+from app.recorder import RecordedSession
+
+
+def list_sessions(directory):
+    if not os.path.isdir(directory):
+        print(f"No recordings in {directory}")
+        return
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name)) as f:
+            h = json.load(f)
+        print(f"{name[:-5]:<40}{h.get('frames', 0):>7} frames{h.get('duration_sec', 0):>9.1f}s"
+              f"{h.get('bytes', 0) / 2 ** 20:>9.1f} MB  {h.get('params', {})}")
+
+
+def _stage_totals(cost):
+    return {name: (c["frames"], c["ms_per_frame"] * c["frames"]) for name, c in cost.items()}
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    arr = np.asarray(values)
+    return {
+        "mean": round(float(arr.mean()), 2),
+        "p50": round(float(np.percentile(arr, 50)), 2),
+        "p95": round(float(np.percentile(arr, 95)), 2),
+        "max": round(float(arr.max()), 2),
+    }
+
+
+def replay(session, profile="stream", speed="max"):
+    from app.detector.engine import get_detection_pipeline
+
+    pipeline = get_detection_pipeline(profile)
+    # Warm-up outside the measurement: models load lazily on first use
+    pipeline.run([{"data": session.frame(0)}])
+    before = _stage_totals(pipeline.cost())
+
+    frames, latencies = [], []
+    max_lag = 0.0
+    start = time.perf_counter()
+    for i, (arrival, meta_ts, data) in enumerate(session):
+        if speed == "original":
+            ahead = arrival - (time.perf_counter() - start)
+            if ahead > 0:
+                time.sleep(ahead)
+            else:
+                max_lag = max(max_lag, -ahead)
+
+        t0 = time.perf_counter()
+        f = pipeline.run([{"data": data}])[0]
+        latency = (time.perf_counter() - t0) * 1000
+        latencies.append(latency)
+        frames.append({
+            "index": i,
+            "arrival": round(arrival, 3),
+            "meta_ts": meta_ts,
+            "decoded": f["image"] is not None,
+            "latency_ms": round(latency, 2),
+            "plates": [
+                {"text": p.get("text", ""), "bbox": list(p["bbox"]), "confidence": round(p.get("confidence", p["det_conf"]), 4)}
+                for p in f["plates"]
+            ],
+        })
+    elapsed = time.perf_counter() - start
+
+    stages = {}
+    for name, (n, ms) in _stage_totals(pipeline.cost()).items():
+        n0, ms0 = before.get(name, (0, 0.0))
+        stages[name] = round((ms - ms0) / (n - n0), 3) if n > n0 else 0.0
+
+    return {
+        "session": session.path,
+        "header": session.header,
+        "profile": profile,
+        "speed": speed,
+        "frames_replayed": len(frames),
+        "elapsed_sec": round(elapsed, 3),
+        "fps": round(len(frames) / elapsed, 2) if elapsed else 0.0,
+        "max_lag_sec": round(max_lag, 3) if speed == "original" else None,
+        "latency_ms": percentiles(latencies),
+        "stage_ms_per_frame": stages,
+        "frames": frames,
+    }
+
+
+def compare(run, baseline):
+    """Frames whose set of plate texts differs, plus latency and stage cost deltas"""
+    changed = []
+    for cur, base in zip(run["frames"], baseline["frames"]):
+        now = sorted(p["text"] for p in cur["plates"] if p["text"])
+        then = sorted(p["text"] for p in base["plates"] if p["text"])
+        if now != then:
+            changed.append({"index": cur["index"], "meta_ts": cur["meta_ts"], "baseline": then, "current": now})
+
+    stages = {
+        name: {
+            "baseline": baseline["stage_ms_per_frame"].get(name),
+            "current": run["stage_ms_per_frame"].get(name),
+        }
+        for name in {**baseline["stage_ms_per_frame"], **run["stage_ms_per_frame"]}
+    }
+    return {
+        "frames_compared": min(len(run["frames"]), len(baseline["frames"])),
+        "frames_changed": len(changed),
+        "changed": changed,
+        "latency_ms": {"baseline": baseline["latency_ms"], "current": run["latency_ms"]},
+        "fps": {"baseline": baseline["fps"], "current": run["fps"]},
+        "stage_ms_per_frame": stages,
+    }
+
+
+def print_report(run, diff=None):
+    lat = run["latency_ms"]
+    print(f"{run['frames_replayed']} frames in {run['elapsed_sec']:.2f}s ({run['fps']:.2f} fps), "
+          f"latency p50 {lat.get('p50', 0):.1f} / p95 {lat.get('p95', 0):.1f} / max {lat.get('max', 0):.1f} ms")
+    if run["max_lag_sec"] is not None:
+        print(f"fell behind the recorded pace by up to {run['max_lag_sec']:.2f}s")
+
+    print(f"\n{'stage':<12}{'ms/frame':>10}{'baseline':>10}{'delta':>9}")
+    for name, ms in run["stage_ms_per_frame"].items():
+        base = diff["stage_ms_per_frame"][name]["baseline"] if diff else None
+        if base is None:
+            print(f"{name:<12}{ms:>10.3f}")
+        else:
+            print(f"{name:<12}{ms:>10.3f}{base:>10.3f}{ms - base:>+9.3f}")
+
+    if diff:
+        base = diff["latency_ms"]["baseline"]
+        print(f"\nlatency p50 {base.get('p50', 0):.1f} -> {lat.get('p50', 0):.1f} ms, "
+              f"p95 {base.get('p95', 0):.1f} -> {lat.get('p95', 0):.1f} ms")
+        print(f"{diff['frames_changed']} of {diff['frames_compared']} frames read differently")
+        for c in diff["changed"][:20]:
+            print(f"  frame {c['index']} (ts {c['meta_ts']}): {c['baseline']} -> {c['current']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("session", nargs="?", help="recording path (any of its files, or the name without extension)")
+    parser.add_argument("--list", action="store_true", help=f"list recordings in {RECORD_DIR}")
+    parser.add_argument("--profile", default="stream", help="detection profile to replay through")
+    parser.add_argument("--speed", choices=["max", "original"], default="max")
+    parser.add_argument("--baseline", help="report of an earlier run to compare with")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    if args.list:
+        list_sessions(RECORD_DIR)
+        return
+    if not args.session:
+        parser.error("a session is required (see --list)")
+
+    session = RecordedSession(args.session)
+    if not len(session):
+        parser.error(f"{args.session} has no complete frames")
+
+    run = replay(session, args.profile, args.speed)
+    diff = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            diff = compare(run, json.load(f))
+        run["comparison"] = diff
+
+    print_report(run, diff)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(run, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
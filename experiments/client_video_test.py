@@ -1,5 +1,4 @@
 import cv2
-import base64
 import json
 import websocket
 
@@ -16,9 +15,9 @@ def on_open(ws):
             break
 
         _, buffer = cv2.imencode(".jpg", frame)
-        frame_b64 = base64.b64encode(buffer).decode("utf-8")
 
-        ws.send(frame_b64)
+        # The server only processes binary frames (text is for ping/frame_meta)
+        ws.send(buffer.tobytes(), opcode=websocket.ABNF.OPCODE_BINARY)
 
         cv2.imshow("Client Camera", frame)
         if cv2.waitKey(1) & 0xFF == ord("q"):
@@ -30,8 +29,8 @@ def on_open(ws):
 
 def on_message(ws, message):
     detections = json.loads(message)
-    if detections:
-        print("Detections:", detections)
+    if detections.get("plate"):
+        print("Detections:", detections["plate"], detections["confidence"])
 
 def on_error(ws, error):
     print("Error:", error)
@@ -47,4 +46,5 @@ ws = websocket.WebSocketApp(
     on_close=on_close
 )
 
+# For load testing many concurrent sessions use backend/tools/load_ws.py
 ws.run_forever()
@@ -47,20 +47,10 @@ export default function HistoryPage() {
   }
 
   const exportCSV = () => {
-    const csv = [
-      "ID,Plate Number,Confidence,Source,Timestamp",
-      ...filteredRecords.map(r => 
-        `${r.id},${r.plate_number},${(r.confidence * 100).toFixed(1)}%,${r.source},${r.timestamp}`
-      )
-    ].join('\n')
-    
-    const blob = new Blob([csv], { type: 'text/csv' })
-    const url = URL.createObjectURL(blob)
-    const a = document.createElement('a')
-    a.href = url
-    a.download = `history_${new Date().getTime()}.csv`
-    a.click()
-    URL.revokeObjectURL(url)
+    // Streamed by the server, so the export is not limited to what this page loaded
+    const params = new URLSearchParams({ format: "csv" })
+    if (filter !== "all") params.set("source", filter)
+    window.location.href = `${API_BASE}/history/export?${params}`
   }
 
   const filteredRecords = records.filter(r => 
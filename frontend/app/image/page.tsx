@@ -46,8 +46,13 @@ export default function ImagePage() {
       const data = await res.json();
       setResults(data.detections || []);
 
-      if (data.annotated_image) {
+      if (data.image_url) {
+        setAnnotatedImage(`${API_BASE}${data.image_url}`);
+      } else if (data.annotated_image) {
         setAnnotatedImage(`data:image/jpeg;base64,${data.annotated_image}`);
+      } else {
+        // No plates: nothing was drawn or stored, show the upload itself
+        setAnnotatedImage(preview);
       }
     } catch (error) {
       console.error("Detection failed:", error);
@@ -38,6 +38,8 @@ export default function LivePage() {
     ws.onopen = () => {
       console.log("WebSocket connected");
       ws.send(JSON.stringify({ type: "ping" }));
+      // Previews only need to be as wide as the tile they are drawn in
+      ws.send(JSON.stringify({ type: "preview", width: canvasRef.current!.clientWidth }));
     };
 
     ws.binaryType = "arraybuffer";
@@ -58,7 +60,13 @@ export default function LivePage() {
             canvasRef.current!.width,
             canvasRef.current!.height,
           );
-          ctx.drawImage(img, 0, 0);
+          ctx.drawImage(
+            img,
+            0,
+            0,
+            canvasRef.current!.width,
+            canvasRef.current!.height,
+          );
         };
       }
 
@@ -99,6 +99,10 @@ export default function LiveVideoUpload() {
       setConnectionStatus('connected');
       setDebugInfo("✓ WebSocket connected successfully");
       socket.send(JSON.stringify({ type: "ping" }));
+      // Previews only need to be as wide as the canvas they are drawn in
+      if (canvasRef.current) {
+        socket.send(JSON.stringify({ type: "preview", width: canvasRef.current.clientWidth }));
+      }
     };
 
     socket.binaryType = "arraybuffer";